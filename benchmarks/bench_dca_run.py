@@ -0,0 +1,307 @@
+"""
+Benchmark the full handler.main DCA run across account and pair counts.
+
+Every scenario runs the real handler.main path against a simulated Kraken
+exchange (tests/fake_kraken.py) and a moto DynamoDB table, and reports
+wall time, API calls per endpoint, time spent sleeping and peak memory.
+
+Usage, from the repository root:
+    python benchmarks/bench_dca_run.py
+    python benchmarks/bench_dca_run.py --save-baseline
+    python benchmarks/bench_dca_run.py --compare --tolerance 0.25
+    python benchmarks/bench_dca_run.py --order-store sqlite
+"""
+import argparse
+import base64
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Tuple
+from unittest.mock import patch
+
+ROOT_DIRECTORY = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT_DIRECTORY))
+
+# moto needs fake credentials, set them before any boto3 client is made.
+for aws_variable in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY"):
+    os.environ.setdefault(aws_variable, "testing")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+import boto3  # noqa: E402
+import yaml  # noqa: E402
+from moto import mock_dynamodb  # noqa: E402
+
+import handler  # noqa: E402
+from krakendca.store import DEFAULT_ORDERS_TABLE  # noqa: E402
+from tests.fake_kraken import (  # noqa: E402
+    FakeKraken,
+    FakeKrakenServer,
+    fake_pair_names,
+    lognormal_latency,
+    patch_kraken_url,
+    patch_urlopen,
+)
+
+BASELINE_FILE = Path(__file__).resolve().parent / "baselines.json"
+
+# (number of accounts, number of pairs per account)
+SCENARIOS: List[Tuple[int, int]] = [
+    (1, 1),
+    (1, 10),
+    (1, 50),
+    (1, 100),
+    (1, 500),
+    (10, 10),
+    (50, 1),
+    (50, 10),
+]
+
+
+def create_dynamodb_table() -> None:
+    """
+    Create the moto orders table saved to by the default order store.
+    """
+    dynamodb = boto3.resource("dynamodb", region_name="us-east-1")
+    dynamodb.create_table(
+        TableName=DEFAULT_ORDERS_TABLE,
+        KeySchema=[{"AttributeName": "txid", "KeyType": "HASH"}],
+        AttributeDefinitions=[{"AttributeName": "txid", "AttributeType": "S"}],
+        BillingMode="PAY_PER_REQUEST",
+    )
+
+
+def scenario_name(n_accounts: int, n_pairs: int) -> str:
+    return f"{n_accounts}_accounts_{n_pairs}_pairs"
+
+
+def write_configs(
+    directory: Path, n_accounts: int, n_pairs: int, order_store: str = None
+) -> None:
+    """
+    Write one configuration file per account with n_pairs DCA pairs,
+    saving orders to a local order_store backend file if set.
+    """
+    private_key = base64.b64encode(b"benchmark-private-key").decode()
+    dca_pairs = [
+        {"pair": pair, "delay": 1, "amount": 20}
+        for pair in fake_pair_names(n_pairs)
+    ]
+    for account in range(n_accounts):
+        config = {
+            "api": {
+                "user_name": f"bench_user_{account}",
+                "public_key": f"bench-public-key-{account}",
+                "private_key": private_key,
+            },
+            "dca_pairs": dca_pairs,
+        }
+        if order_store is not None:
+            config["order_store"] = {
+                "backend": order_store,
+                "path": str(directory / f"orders.{order_store}"),
+            }
+        config_file = directory / f"config_{account:03d}.yaml"
+        config_file.write_text(yaml.safe_dump(config))
+
+
+class SleepRecorder:
+    """
+    Replacement of time.sleep recording requested sleeps without
+    sleeping, so waits are reported without slowing the benchmark.
+    """
+
+    def __init__(self) -> None:
+        self.total = 0.0
+
+    def __call__(self, seconds: float) -> None:
+        self.total += seconds
+
+
+@contextlib.contextmanager
+def kraken_backend(exchange: FakeKraken, http_latency: float = None):
+    """
+    Serve the exchange in-process, or through a local FakeKrakenServer
+    with lognormal latency when http_latency (median seconds) is set.
+    """
+    if http_latency is None:
+        with patch_urlopen(exchange):
+            yield
+        return
+    latency = lognormal_latency(http_latency, seed=0) if http_latency else None
+    with FakeKrakenServer(exchange, latency=latency) as server:
+        with patch_kraken_url(server.url):
+            yield
+
+
+def run_scenario(
+    n_accounts: int,
+    n_pairs: int,
+    trace_memory: bool = False,
+    http_latency: float = None,
+    order_store: str = None,
+) -> Dict:
+    """
+    Run handler.main once for a scenario and return its measurements.
+    """
+    prices = {pair: 100.0 + i for i, pair in enumerate(fake_pair_names(500))}
+    exchange = FakeKraken(prices)
+    sleeps = SleepRecorder()
+    dynamodb_calls: Counter = Counter()
+
+    def count_dynamodb_call(model, **kwargs) -> None:
+        dynamodb_calls[model.name] += 1
+
+    with tempfile.TemporaryDirectory() as config_directory:
+        write_configs(Path(config_directory), n_accounts, n_pairs, order_store)
+        with mock_dynamodb(), kraken_backend(exchange, http_latency):
+            create_dynamodb_table()
+            boto3.setup_default_session()
+            boto3.DEFAULT_SESSION.events.register(
+                "before-call.dynamodb", count_dynamodb_call
+            )
+            with patch("time.sleep", sleeps), contextlib.redirect_stdout(
+                io.StringIO()
+            ):
+                if trace_memory:
+                    tracemalloc.start()
+                start = time.perf_counter()
+                handler.main(config_directory)
+                wall_time = time.perf_counter() - start
+                peak_memory = 0
+                if trace_memory:
+                    peak_memory = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+    return {
+        "wall_time_s": round(wall_time, 4),
+        "sleep_time_s": round(sleeps.total, 2),
+        "api_calls": dict(sorted(exchange.calls.items())),
+        "dynamodb_calls": dict(sorted(dynamodb_calls.items())),
+        "peak_memory_kb": round(peak_memory / 1024, 1),
+    }
+
+
+def run_benchmarks(
+    scenarios: List[Tuple[int, int]],
+    repeat: int,
+    http_latency: float = None,
+    order_store: str = None,
+) -> Dict:
+    results = {}
+    for n_accounts, n_pairs in scenarios:
+        name = scenario_name(n_accounts, n_pairs)
+        if http_latency is not None:
+            name += f"_http_{http_latency}s"
+        if order_store is not None:
+            name += f"_{order_store}"
+        options = {"http_latency": http_latency, "order_store": order_store}
+        runs = [
+            run_scenario(n_accounts, n_pairs, **options) for _ in range(repeat)
+        ]
+        result = min(runs, key=lambda run: run["wall_time_s"])
+        memory_run = run_scenario(
+            n_accounts, n_pairs, trace_memory=True, **options
+        )
+        result["peak_memory_kb"] = memory_run["peak_memory_kb"]
+        results[name] = result
+        print(
+            f"{name:>26}: {result['wall_time_s']:8.3f}s wall, "
+            f"{result['sleep_time_s']:7.1f}s sleep, "
+            f"{sum(result['api_calls'].values()):6d} API calls, "
+            f"{result['peak_memory_kb']:9.1f}KB peak"
+        )
+    return results
+
+
+def compare_to_baseline(
+    results: Dict, baseline: Dict, tolerance: float
+) -> List[str]:
+    """
+    Return a description of every metric regressing from the baseline.
+    """
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if not reference:
+            continue
+        for metric in ("wall_time_s", "sleep_time_s", "peak_memory_kb"):
+            limit = reference[metric] * (1 + tolerance)
+            if result[metric] > limit and result[metric] > 0.01:
+                regressions.append(
+                    f"{name} {metric}: {result[metric]} > "
+                    f"{reference[metric]} (+{tolerance:.0%})"
+                )
+        for metric in ("api_calls", "dynamodb_calls"):
+            for endpoint, calls in result[metric].items():
+                reference_calls = reference[metric].get(endpoint, 0)
+                if calls > reference_calls:
+                    regressions.append(
+                        f"{name} {metric} {endpoint}: {calls} > "
+                        f"{reference_calls}"
+                    )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        help="Scenario to run as ACCOUNTSxPAIRS, e.g. 1x500 (repeatable).",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--http-latency",
+        type=float,
+        help="Go through a local fake Kraken HTTP server with this median "
+        "latency in seconds instead of the in-process exchange.",
+    )
+    parser.add_argument(
+        "--order-store",
+        choices=("sqlite", "csv", "ndjson"),
+        help="Save orders to this local backend instead of moto DynamoDB.",
+    )
+    parser.add_argument("--baseline-file", type=Path, default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    scenarios = SCENARIOS
+    if args.scenario:
+        scenarios = [
+            tuple(int(n) for n in scenario.split("x"))
+            for scenario in args.scenario
+        ]
+    results = run_benchmarks(
+        scenarios, args.repeat, args.http_latency, args.order_store
+    )
+
+    if args.compare:
+        baseline = json.loads(args.baseline_file.read_text())
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print("No regression against baseline.")
+    if args.save_baseline:
+        baseline = {}
+        if args.baseline_file.exists():
+            baseline = json.loads(args.baseline_file.read_text())
+        baseline.update(results)
+        args.baseline_file.write_text(
+            json.dumps(baseline, indent=2, sort_keys=True) + "\n"
+        )
+        print(f"Baseline saved to {args.baseline_file}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+"""
+Benchmark fixed-point order math: scaled integer units against Decimal
+with quantize, the alternative to binary floats.
+
+Order math on the hot path (Order.buy_limit_order, ladders, history
+columns) works on scaled integer units, Money objects are only built at
+the DynamoDB and CSV boundaries and are reported for reference. Float
+parsing is cached for both, as the same config amounts and ticker
+prices are converted for every order.
+
+Usage, from the repository root:
+    python benchmarks/bench_money.py
+    python benchmarks/bench_money.py --operations 200000 --check
+"""
+import argparse
+import functools
+import random
+import sys
+import time
+from datetime import datetime
+from decimal import ROUND_FLOOR, ROUND_HALF_EVEN, Decimal
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+ROOT_DIRECTORY = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT_DIRECTORY))
+
+from krakendca.money import (  # noqa: E402
+    Money,
+    float_to_units,
+    float_units,
+    rescale_units,
+)
+from krakendca.order import Order  # noqa: E402
+
+LOT_DECIMALS = 8
+QUOTE_DECIMALS = 2
+LOT_QUANTUM = Decimal(1).scaleb(-LOT_DECIMALS)
+QUOTE_QUANTUM = Decimal(1).scaleb(-QUOTE_DECIMALS)
+DECIMAL_FEE = Decimal("0.0026")
+DECIMAL_FEE_FACTOR = Decimal("1.0026")
+DATE = datetime(2021, 1, 1)
+# Operations of the order hot path, the others are reported only:
+# uncached shortest decimals parsing and a lone multiply and round are
+# slower than the C Decimal implementation.
+CHECKED_OPERATIONS = ("buy limit order", "float to 8 decimals", "add")
+
+
+@functools.lru_cache(maxsize=4096)
+def decimal_value(value: float) -> Decimal:
+    # Cached like float_units, for the same config and ticker values.
+    return Decimal(str(value))
+
+
+def decimal_buy_limit_order(amount: float, pair_price: float) -> Order:
+    # Order.buy_limit_order with Decimal and quantize.
+    price = decimal_value(pair_price)
+    volume = (decimal_value(amount) / price).quantize(LOT_QUANTUM, ROUND_FLOOR)
+    volume = (volume / DECIMAL_FEE_FACTOR).quantize(LOT_QUANTUM, ROUND_FLOOR)
+    order_price = volume * price
+    price = order_price.quantize(QUOTE_QUANTUM, ROUND_HALF_EVEN)
+    fee = (order_price * DECIMAL_FEE).quantize(QUOTE_QUANTUM, ROUND_HALF_EVEN)
+    return Order(
+        "bench_user",
+        DATE,
+        "XETHZEUR",
+        "buy",
+        "limit",
+        "fciq",
+        pair_price,
+        float(volume),
+        float(price),
+        float(fee),
+        float(price + fee),
+        lot_decimals=LOT_DECIMALS,
+        quote_decimals=QUOTE_DECIMALS,
+    )
+
+
+def units_buy_limit_order(amount: float, pair_price: float) -> Order:
+    return Order.buy_limit_order(
+        "bench_user",
+        DATE,
+        "XETHZEUR",
+        amount,
+        pair_price,
+        LOT_DECIMALS,
+        QUOTE_DECIMALS,
+    )
+
+
+def seconds(function: Callable, values: List[Tuple], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for value in values:
+            function(*value)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def benchmarks(n_operations: int) -> Dict[str, Dict[str, tuple]]:
+    # Operation name -> implementation -> (function, arguments).
+    generator = random.Random(0)
+    floats = [
+        round(generator.uniform(1, 50000), generator.randint(0, 6))
+        for _ in range(n_operations)
+    ]
+    # One ticker price per pair and a few config amounts.
+    prices = floats[:50]
+    amounts = [15, 20, 25.5, 50, 100]
+    orders = [
+        (generator.choice(amounts), generator.choice(prices))
+        for _ in range(n_operations)
+    ]
+    units = [(float_to_units(value, 8), 12345678) for value in floats]
+    decimals = [
+        (Decimal(str(value)), Decimal("0.12345678")) for value in floats
+    ]
+    moneys = [(Money(a, 8), Money(b, 8)) for a, b in units]
+    return {
+        "buy limit order": {
+            "units": (units_buy_limit_order, orders),
+            "Decimal": (decimal_buy_limit_order, orders),
+        },
+        "shortest decimals": {
+            "units": (float_units.__wrapped__, floats),
+            "Decimal": (lambda value: Decimal(str(value)), floats),
+            "Money": (Money.from_float, floats),
+        },
+        "float to 8 decimals": {
+            "units": (lambda value: float_to_units(value, 8), floats),
+            "Decimal": (
+                lambda value: Decimal(str(value)).quantize(LOT_QUANTUM),
+                floats,
+            ),
+            "Money": (lambda value: Money.from_float(value, 8), floats),
+        },
+        "add": {
+            "units": (lambda a, b: a + b, units),
+            "Decimal": (lambda a, b: a + b, decimals),
+            "Money": (lambda a, b: a + b, moneys),
+        },
+        "multiply and round": {
+            "units": (
+                lambda a, b: rescale_units(a * b, 16, QUOTE_DECIMALS),
+                units,
+            ),
+            "Decimal": (
+                lambda a, b: (a * b).quantize(QUOTE_QUANTUM, ROUND_HALF_EVEN),
+                decimals,
+            ),
+            "Money": (lambda a, b: (a * b).rescale(QUOTE_DECIMALS), moneys),
+        },
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--operations", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Exit with an error if scaled units are slower than Decimal.",
+    )
+    args = parser.parse_args()
+
+    slower = []
+    for name, implementations in benchmarks(args.operations).items():
+        timings = {
+            implementation: seconds(
+                function,
+                [
+                    value if isinstance(value, tuple) else (value,)
+                    for value in values
+                ],
+                args.repeat,
+            )
+            for implementation, (function, values) in implementations.items()
+        }
+        ratio = timings["Decimal"] / timings["units"]
+        print(
+            f"{name:>20}: "
+            + ", ".join(
+                f"{implementation} {timing:.3f}s"
+                for implementation, timing in timings.items()
+            )
+            + f" (units {ratio:.1f}x faster than Decimal)"
+        )
+        if ratio < 1 and name in CHECKED_OPERATIONS:
+            slower.append(name)
+    if args.check and slower:
+        print(f"Scaled units slower than Decimal: {', '.join(slower)}.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
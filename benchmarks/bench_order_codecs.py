@@ -0,0 +1,118 @@
+"""
+Benchmark Order codecs: per-order serialization cost and memory per
+instance.
+
+Each codec converts orders to DynamoDB items, CSV rows or JSON dicts
+and back. The JSON text round trip formerly used to get DynamoDB types
+is measured for comparison, as is the memory of __dict__ instances
+holding the same attributes.
+
+Usage, from the repository root:
+    python benchmarks/bench_order_codecs.py
+    python benchmarks/bench_order_codecs.py --orders 50000
+"""
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List
+
+ROOT_DIRECTORY = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT_DIRECTORY))
+
+from krakendca.order import ORDER_FIELDS, SENT_FIELDS, Order  # noqa: E402
+
+
+def create_orders(n_orders: int) -> List[Order]:
+    start = datetime(2021, 1, 1)
+    orders = []
+    for index in range(n_orders):
+        order = Order.buy_limit_order(
+            "bench_user",
+            start + timedelta(minutes=index),
+            "XETHZEUR",
+            20,
+            1500 + index % 1000 / 100,
+            8,
+            4,
+            0.985,
+        )
+        order.txid = f"O{index:05d}-BENCH-000000"
+        order.description = f"buy {order.volume} ETHEUR @ limit 1500"
+        orders.append(order)
+    return orders
+
+
+def as_namespace(order: Order) -> SimpleNamespace:
+    # Same attribute values in a __dict__ object.
+    fields = ORDER_FIELDS + SENT_FIELDS
+    return SimpleNamespace(**{key: getattr(order, key) for key in fields})
+
+
+def json_text_item(order: Order) -> Dict[str, Any]:
+    # DynamoDB types through JSON text, as done before the codecs.
+    return json.loads(
+        json.dumps(order.to_dict(), default=str), parse_float=Decimal
+    )
+
+
+def time_per_order(
+    function: Callable[[Any], Any], values: List[Any], repeat: int
+) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for value in values:
+            function(value)
+        best = min(best, time.perf_counter() - start)
+    return best / len(values)
+
+
+def memory_per_instance(create: Callable[[], List[Any]]) -> float:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    instances = create()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / len(instances)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--orders", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    orders = create_orders(args.orders)
+    items = [order.to_item() for order in orders]
+    rows = [order.to_row() for order in orders]
+    dicts = [order.to_dict() for order in orders]
+    codecs = {
+        "json text item": (json_text_item, orders),
+        "to_item": (Order.to_item, orders),
+        "from_item": (Order.from_item, items),
+        "to_row": (Order.to_row, orders),
+        "from_row": (Order.from_row, rows),
+        "to_dict": (Order.to_dict, orders),
+        "from_dict": (Order.from_dict, dicts),
+    }
+    for name, (function, values) in codecs.items():
+        seconds = time_per_order(function, values, args.repeat)
+        print(f"{name:>16}: {seconds * 1e6:8.2f}us per order")
+
+    slotted = memory_per_instance(lambda: [Order.from_dict(d) for d in dicts])
+    namespaces = memory_per_instance(
+        lambda: [as_namespace(Order.from_dict(d)) for d in dicts]
+    )
+    print(f"{'slotted Order':>16}: {slotted:8.1f}B per instance")
+    print(f"{'__dict__ object':>16}: {namespaces:8.1f}B per instance")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
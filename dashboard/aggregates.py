@@ -0,0 +1,134 @@
+import pandas as pd
+
+GROUP_COLUMNS = ["user_name", "pair"]
+CUMSUM_COLUMNS = {
+    "fee": "fee_cumsum",
+    "volume": "volume_cumsum",
+    "price": "price_cumsum",
+    "total_price": "total_price_cumsum",
+}
+
+
+class OrderAggregates:
+    """Running totals of the orders of each (user, pair), kept up to date.
+
+    New orders extend the running totals from the last values of their
+    (user, pair) instead of recomputing the whole history, and new prices
+    only recompute the profit of the pairs whose price changed.
+    """
+
+    def __init__(self, formatters=None, price_formatters=None):
+        """
+        :param formatters: Dict of text column to row formatter, applied
+        to new orders only.
+        :param price_formatters: Dict of text column to row formatter
+        using latest_price or profit, applied again when prices change.
+        """
+        self.formatters = formatters or {}
+        self.price_formatters = price_formatters or {}
+        self.orders = pd.DataFrame()
+        groups = pd.MultiIndex.from_tuples([], names=GROUP_COLUMNS)
+        self.totals = pd.DataFrame(
+            index=groups, columns=list(CUMSUM_COLUMNS.values()), dtype=float
+        )
+        self.last_dates = pd.Series(index=groups, dtype=object)
+        self.prices = {}
+
+    def new_orders(self, history):
+        """Return the orders of history not aggregated yet."""
+        if self.orders.empty:
+            return history
+        return history[~history.txid.isin(self.orders.txid)]
+
+    def extend(self, new_orders):
+        """Add new orders and extend their (user, pair) running totals.
+
+        Groups receiving an order older than their last aggregated order
+        are recomputed, other groups start from their last totals.
+        """
+        if new_orders.empty:
+            return
+        new_orders = new_orders.sort_values("date", kind="stable")
+        keys = pd.MultiIndex.from_frame(new_orders[GROUP_COLUMNS])
+        last_dates = self.last_dates.reindex(keys)
+        known = last_dates.notna().values
+        late = keys[known][
+            new_orders.date.values[known] < last_dates.values[known]
+        ].unique()
+        if len(late):
+            old_keys = pd.MultiIndex.from_frame(self.orders[GROUP_COLUMNS])
+            recomputed = old_keys.isin(late)
+            new_orders = pd.concat(
+                [self.orders.loc[recomputed, new_orders.columns], new_orders],
+                ignore_index=True,
+            ).sort_values("date", kind="stable")
+            self.orders = self.orders[~recomputed]
+            self.totals = self.totals.drop(late)
+            keys = pd.MultiIndex.from_frame(new_orders[GROUP_COLUMNS])
+
+        new_orders = new_orders.copy()
+        groups = new_orders.groupby(GROUP_COLUMNS, sort=False)
+        offsets = self.totals.reindex(keys).fillna(0)
+        for column, cumsum_column in CUMSUM_COLUMNS.items():
+            new_orders[cumsum_column] = (
+                groups[column].cumsum().values + offsets[cumsum_column].values
+            )
+        new_orders["latest_price"] = new_orders.pair.map(self.prices)
+        new_orders["profit"] = profit(new_orders)
+        formatters = {**self.formatters, **self.price_formatters}
+        for text_column, formatter in formatters.items():
+            new_orders[text_column] = new_orders.apply(
+                formatter, axis="columns"
+            )
+
+        last_orders = new_orders.groupby(GROUP_COLUMNS, sort=False).last()
+        self.totals = pd.concat(
+            [
+                self.totals.drop(last_orders.index, errors="ignore"),
+                last_orders[self.totals.columns],
+            ]
+        )
+        self.last_dates = pd.concat(
+            [
+                self.last_dates.drop(last_orders.index, errors="ignore"),
+                last_orders.date,
+            ]
+        )
+        if self.orders.empty:
+            self.orders = new_orders.reset_index(drop=True)
+            return
+        in_order = new_orders.date.iloc[0] >= self.orders.date.iloc[-1]
+        self.orders = pd.concat([self.orders, new_orders], ignore_index=True)
+        if not in_order:
+            self.orders.sort_values(
+                "date", kind="stable", ignore_index=True, inplace=True
+            )
+
+    def update_prices(self, prices):
+        """Recompute the profit of the orders whose pair price changed."""
+        changed = {
+            pair: price
+            for pair, price in prices.items()
+            if self.prices.get(pair) != price
+        }
+        self.prices.update(changed)
+        if not changed or self.orders.empty:
+            return
+        rows = self.orders.pair.isin(list(changed))
+        if not rows.any():
+            return
+        changed_orders = self.orders.loc[rows].copy()
+        changed_orders["latest_price"] = changed_orders.pair.map(changed)
+        changed_orders["profit"] = profit(changed_orders)
+        for text_column, formatter in self.price_formatters.items():
+            changed_orders[text_column] = changed_orders.apply(
+                formatter, axis="columns"
+            )
+        columns = ["latest_price", "profit", *self.price_formatters]
+        self.orders.loc[rows, columns] = changed_orders[columns]
+
+
+def profit(orders):
+    return orders.volume_cumsum * orders.latest_price - (
+        orders.total_price_cumsum
+    )
@@ -1,63 +1,40 @@
+import sys
+from pathlib import Path
+
 import plotly.graph_objects as go
-from dash import Dash, dcc, html
+from dash import Dash, ctx, dcc, html
 from dash.dependencies import Input, Output
 from plotly.subplots import make_subplots
 
-from kraken import get_asset_prices, get_order_history, load_all_pairs
-
-app = Dash(__name__)
-
-
-def purchases_formatter(row):
-    return (
-        f"date: {row.date}<br>"
-        f"asset price: {row.pair_price}<br>"
-        f"volume: {row.volume:.6f}<br>"
-        f"price: {row.price}<br>"
-        f"fee: {row.fee:.5f}"
-    )
+# Make the krakendca package importable when run from the dashboard folder
+sys.path.append(str(Path(__file__).resolve().parents[1]))
 
+from data_plane import DataPlaneReader  # noqa: E402
+from kraken import load_all_pairs  # noqa: E402
+from krakendca.profiling import profiled  # noqa: E402
+from loader import REFRESH_INTERVAL, aggregates, load_orders  # noqa: E402
 
-def accumulation_formatter(row):
-    return (
-        f"date: {row.date}<br>"
-        # f"asset price: {row.pair_price}<br>"
-        f"volume: {row.volume_cumsum:.6f}<br>"
-        f"price: {row.price_cumsum}<br>"
-        f"fee: {row.fee_cumsum:.5f}"
-    )
+app = Dash(__name__)
+server = app.server
+# Workers map the orders published by loader.py when set
+data_plane = DataPlaneReader.from_environment()
 
 
-def profits_formatter(row):
-    return (
-        f"date: {row.date}<br>"
-        f"total spent: {row.total_price_cumsum:.2f}<br>"
-        f"valuation: {row.volume_cumsum * row.latest_price:.2f}<br>"
-        f"profit: {row.profit:.2f}"
-    )
+def current_orders(user=None):
+    if data_plane is not None:
+        return data_plane.orders(user)
+    if user is None:
+        return aggregates.orders
+    return aggregates.orders.query(f'user_name == "{user}"')
 
 
 all_pairs = load_all_pairs()
-orders = get_order_history()
-orders.sort_values("date", inplace=True)
-
-orders["fee_cumsum"] = orders.groupby("pair").fee.cumsum()
-orders["volume_cumsum"] = orders.groupby("pair").volume.cumsum()
-orders["price_cumsum"] = orders.groupby("pair").price.cumsum()
-orders["total_price_cumsum"] = orders.groupby("pair").total_price.cumsum()
-
-asset_prices = get_asset_prices(orders.pair.unique())
-orders["latest_price"] = orders.pair.map(asset_prices)
-
-orders["profit"] = (
-    orders.volume_cumsum * orders.latest_price - orders.total_price_cumsum
-)
-
-orders["purchases_text"] = orders.apply(purchases_formatter, axis="columns")
-orders["accumulation_text"] = orders.apply(
-    accumulation_formatter, axis="columns"
-)
-orders["profits_text"] = orders.apply(profits_formatter, axis="columns")
+if data_plane is not None:
+    data_plane.wait()
+    orders = data_plane.orders(columns=["user_name"])
+else:
+    with profiled("dashboard_loader"):
+        orders = load_orders()
 
 orders_user_counts = orders.user_name.value_counts()
 ordered_users = orders_user_counts.index.tolist()
@@ -67,10 +44,17 @@ ordered_users = orders_user_counts.index.tolist()
     Output("dca-graph", "figure"),
     Input("dca-tabs-graph", "value"),
     Input("account-dropdown", "value"),
+    Input("refresh-interval", "n_intervals"),
 )
-def render_content(tab, account, scatter_plot_mode="lines+markers"):
+def render_content(
+    tab, account, n_intervals, scatter_plot_mode="lines+markers"
+):
+    if ctx.triggered_id == "refresh-interval" and data_plane is None:
+        with profiled("dashboard_loader"):
+            load_orders()
+
     # fetch all the orders only from a certain user
-    user_orders = orders.query(f'user_name == "{account}"')
+    user_orders = current_orders(account)
 
     # sort the traded pairs by their total trading volume
     pair_total_spent = user_orders.groupby("pair").price.sum()
@@ -100,7 +84,7 @@ def render_content(tab, account, scatter_plot_mode="lines+markers"):
             figtitle = "Crypto accumulation over time"
             subplot = go.Scatter(
                 x=pair_df.date,
-                y=pair_df.volume.cumsum(),
+                y=pair_df.volume_cumsum,
                 name=pair,
                 text=pair_df.accumulation_text,
                 hoverinfo="text",
@@ -153,6 +137,7 @@ app.layout = html.Div(
             ],
         ),
         dcc.Graph(id="dca-graph"),
+        dcc.Interval(id="refresh-interval", interval=REFRESH_INTERVAL * 1000),
     ]
 )
 
@@ -0,0 +1,121 @@
+import os
+import time
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+DATA_PLANE_ENV = "KRAKEN_DCA_DATA_PLANE"
+VERSION_FILE = "orders.version"
+# Versions kept on disk, so that workers can still map the previous one
+KEEP_VERSIONS = 2
+
+
+def version_path(directory, version):
+    return Path(directory) / f"orders-{version:08d}.arrow"
+
+
+def read_version(directory):
+    try:
+        return int((Path(directory) / VERSION_FILE).read_text())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def write_atomically(path, write):
+    temporary_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    write(temporary_path)
+    os.replace(temporary_path, path)
+
+
+class DataPlanePublisher:
+    """Publish the prepared orders frame as versioned Arrow IPC files.
+
+    Each version is written to its own file, then the version counter
+    file is replaced, so workers never map a partially written frame.
+    Use a directory in /dev/shm to keep the files in shared memory.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.version = read_version(self.directory) or 0
+
+    def publish(self, frame):
+        """Publish a new version of the frame and return its number."""
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        version = self.version + 1
+
+        def write_table(path):
+            with pa.OSFile(str(path), "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+
+        write_atomically(version_path(self.directory, version), write_table)
+        write_atomically(
+            self.directory / VERSION_FILE,
+            lambda path: path.write_text(str(version)),
+        )
+        self.version = version
+        # Workers mapping a removed version keep reading it until they
+        # pick up the new one.
+        for path in self.directory.glob("orders-*.arrow"):
+            if int(path.stem.split("-")[1]) <= version - KEEP_VERSIONS:
+                path.unlink()
+        return version
+
+
+class DataPlaneReader:
+    """Map the latest published orders frame, zero-copy.
+
+    The version counter file is checked on each access and a new version
+    is mapped when published, without loading orders from DynamoDB or
+    Kraken. Frames are built from the mapped table only for the selected
+    rows and columns.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.version = None
+        self.table = None
+
+    @staticmethod
+    def from_environment():
+        """Return the reader of KRAKEN_DCA_DATA_PLANE, None if not set."""
+        directory = os.environ.get(DATA_PLANE_ENV)
+        if not directory:
+            return None
+        return DataPlaneReader(directory)
+
+    def current(self):
+        """Return the latest published table, None before any."""
+        version = read_version(self.directory)
+        if version is not None and version != self.version:
+            try:
+                source = pa.memory_map(
+                    str(version_path(self.directory, version))
+                )
+            except FileNotFoundError:
+                # Already replaced by a newer version, kept for now
+                return self.table
+            self.table = pa.ipc.open_file(source).read_all()
+            self.version = version
+        return self.table
+
+    def wait(self, timeout=None, poll_interval=1.0):
+        """Wait for a published table and return it."""
+        start = time.monotonic()
+        while self.current() is None:
+            if timeout is not None and time.monotonic() - start > timeout:
+                raise TimeoutError(f"No orders published to {self.directory}.")
+            time.sleep(poll_interval)
+        return self.table
+
+    def orders(self, user=None, columns=None):
+        """Return the orders of a user, or all orders, as a DataFrame."""
+        table = self.current()
+        if user is not None:
+            table = table.filter(pc.equal(table["user_name"], user))
+        if columns is not None:
+            table = table.select(columns)
+        return table.to_pandas()
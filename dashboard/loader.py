@@ -0,0 +1,79 @@
+import os
+import sys
+import time
+from pathlib import Path
+
+# Make the krakendca package importable when run from the dashboard folder
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from aggregates import OrderAggregates  # noqa: E402
+from data_plane import DATA_PLANE_ENV, DataPlanePublisher  # noqa: E402
+from kraken import get_asset_prices, get_order_history  # noqa: E402
+from krakendca.profiling import profiled  # noqa: E402
+
+# Orders and prices are cached for 10 minutes by persist_to_file
+REFRESH_INTERVAL = 10 * 60
+
+
+def purchases_formatter(row):
+    return (
+        f"date: {row.date}<br>"
+        f"asset price: {row.pair_price}<br>"
+        f"volume: {row.volume:.6f}<br>"
+        f"price: {row.price}<br>"
+        f"fee: {row.fee:.5f}"
+    )
+
+
+def accumulation_formatter(row):
+    return (
+        f"date: {row.date}<br>"
+        # f"asset price: {row.pair_price}<br>"
+        f"volume: {row.volume_cumsum:.6f}<br>"
+        f"price: {row.price_cumsum}<br>"
+        f"fee: {row.fee_cumsum:.5f}"
+    )
+
+
+def profits_formatter(row):
+    return (
+        f"date: {row.date}<br>"
+        f"total spent: {row.total_price_cumsum:.2f}<br>"
+        f"valuation: {row.volume_cumsum * row.latest_price:.2f}<br>"
+        f"profit: {row.profit:.2f}"
+    )
+
+
+aggregates = OrderAggregates(
+    formatters={
+        "purchases_text": purchases_formatter,
+        "accumulation_text": accumulation_formatter,
+    },
+    price_formatters={"profits_text": profits_formatter},
+)
+
+
+def load_orders():
+    # Extend the (user, pair) running totals with the new orders only,
+    # profits are recomputed for the pairs whose price changed
+    history = get_order_history()
+    aggregates.extend(aggregates.new_orders(history))
+    asset_prices = get_asset_prices(aggregates.orders.pair.unique())
+    aggregates.update_prices(asset_prices)
+    return aggregates.orders
+
+
+def publish_orders(directory, interval=REFRESH_INTERVAL):
+    # Single loader of the dashboard workers: load the orders once and
+    # publish each refresh to the data plane mapped by the workers
+    publisher = DataPlanePublisher(directory)
+    while True:
+        with profiled("dashboard_loader"):
+            orders = load_orders()
+        version = publisher.publish(orders)
+        print(f"Orders version {version} published ({len(orders)} orders).")
+        time.sleep(interval)
+
+
+if __name__ == "__main__":
+    publish_orders(os.environ[DATA_PLANE_ENV])
@@ -1,10 +1,28 @@
+import argparse
+import os
+import signal
 from pathlib import Path
 
 import sentry_sdk
-from krakenapi import KrakenApi
 
+from krakendca import tracing
+from krakendca.api import KrakenClient
+from krakendca.clock import ClockService
 from krakendca.config import Config
+from krakendca.daemon import Daemon
+from krakendca.due_index import DueIndex
+from krakendca.fanout import (
+    WORKER_FUNCTION_ENV,
+    LambdaExecutor,
+    coordinate,
+    plan_shards,
+    run_shard,
+)
+from krakendca.fills import FillTracker, fill_times, print_fill_report
 from krakendca.krakendca import KrakenDCA
+from krakendca.metrics import METRICS, metric_labels
+from krakendca.profiling import profiled
+from krakendca.ticker import TickerFeed
 
 
 def setup_sentry(dsn_file="sentry_dsn.txt"):
@@ -12,31 +30,139 @@ def setup_sentry(dsn_file="sentry_dsn.txt"):
     sentry_sdk.init(dsn=sentry_dsn, traces_sample_rate=1.0)
 
 
-def main():
-    curr_directory = Path(__file__).resolve().parent
+def main(config_directory=None):
+    if config_directory is None:
+        config_directory = Path(__file__).resolve().parent
 
-    # Iterate over the multiple configuration files
-    for config_file in sorted(curr_directory.glob("config*.yaml")):
-        # Read parameters from configuration file
-        config = Config(config_file)
+    # Kraken clock offset is measured once per run
+    clock = None
+    # Optional WebSocket prices, shared between accounts
+    ticker = TickerFeed.from_environment()
+    # Optional last order times, skipping pairs that can't be due
+    due_index = DueIndex.from_environment()
+
+    try:
+        # Iterate over the multiple configuration files
+        for config_file in sorted(Path(config_directory).glob("config*.yaml")):
+            # Read parameters from configuration file
+            with tracing.span("config.load", config_file.name):
+                config = Config(config_file)
+
+            # Skip non-initialized config files
+            if config.api_user_name == "KRAKEN_USER_NAME":
+                continue
+
+            # Initialize the instrumented KrakenAPI object
+            ka = KrakenClient(config.api_public_key, config.api_private_key)
+            if clock is None:
+                clock = ClockService(ka)
+
+            # Initialize KrakenDCA and handle the DCA based on configuration
+            with metric_labels(account=config.api_user_name), tracing.span(
+                "dca.account"
+            ):
+                kdca = KrakenDCA(config, ka, clock, ticker, due_index)
+                kdca.initialize_pairs_dca()
+                kdca.handle_pairs_dca()
+    finally:
+        if ticker is not None:
+            ticker.stop()
+
+
+def run_and_emit_metrics(config_directory=None):
+    # Export API call metrics and traces once per run, even if it failed
+    METRICS.reset()
+    try:
+        with profiled("handler_main"), tracing.span("dca.run"):
+            main(config_directory)
+    finally:
+        METRICS.emit()
+        tracing.flush()
+
+
+def run_daemon(config_directory=None):
+    # Run pairs when due until interrupted, keeping clients and metadata
+    if config_directory is None:
+        config_directory = Path(__file__).resolve().parent
+    ticker = TickerFeed.from_environment()
+    daemon = Daemon(config_directory, ticker, DueIndex.from_environment())
+    signal.signal(signal.SIGTERM, lambda signum, frame: daemon.stop())
+    try:
+        daemon.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if ticker is not None:
+            ticker.stop()
 
-        # Skip non-initialized config files
+
+def track_fills(config_directory=None, orders_table="kraken-dca"):
+    # Update saved orders from Kraken and report their time to fill
+    if config_directory is None:
+        config_directory = Path(__file__).resolve().parent
+    for config_file in sorted(Path(config_directory).glob("config*.yaml")):
+        config = Config(config_file)
         if config.api_user_name == "KRAKEN_USER_NAME":
             continue
+        ka = KrakenClient(config.api_public_key, config.api_private_key)
+        tracker = FillTracker(config.api_user_name, ka, orders_table)
+        print_fill_report(fill_times(tracker.track()))
+
+
+def run(event, context):
+    setup_sentry()
+    run_and_emit_metrics()
 
-        # Initialize the KrakenAPI object
-        ka = KrakenApi(config.api_public_key, config.api_private_key)
 
-        # Initialize KrakenDCA and handle the DCA based on configuration
-        kdca = KrakenDCA(config, ka)
-        kdca.initialize_pairs_dca()
-        kdca.handle_pairs_dca()
+def run_coordinator(event, context):
+    # Fan out accounts, or groups of pairs_per_shard pairs, to workers
+    setup_sentry()
+    config_directory = Path(__file__).resolve().parent
+    shards = plan_shards(config_directory, event.get("pairs_per_shard"))
+    executor = LambdaExecutor(
+        os.environ[WORKER_FUNCTION_ENV], event.get("max_workers", 10)
+    )
+    METRICS.reset()
+    try:
+        results = coordinate(shards, executor)
+    finally:
+        executor.shutdown()
+        METRICS.emit()
+    errors = [result["error"] for result in results if result["error"]]
+    if errors:
+        raise RuntimeError(f"{len(errors)} shards failed: {errors}")
+    return results
 
 
-def run(event, context):
+def run_worker(event, context):
+    # Run one shard and report its result to the coordinator
     setup_sentry()
-    main()
+    config_directory = Path(__file__).resolve().parent
+    METRICS.reset()
+    try:
+        with tracing.span("dca.run"):
+            return run_shard(event, str(config_directory))
+    finally:
+        METRICS.emit()
+        tracing.flush()
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Kraken DCA.")
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Keep running and DCA pairs when due.",
+    )
+    parser.add_argument(
+        "--track-fills",
+        action="store_true",
+        help="Update saved orders fill status and report time to fill.",
+    )
+    args = parser.parse_args()
+    if args.daemon:
+        run_daemon()
+    elif args.track_fills:
+        track_fills()
+    else:
+        run_and_emit_metrics()
@@ -0,0 +1,636 @@
+"""Kraken API client module."""
+import math
+import os
+import random
+import socket
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from urllib.error import URLError
+from urllib.parse import parse_qsl, urlparse
+from urllib.request import Request
+
+from krakenapi import KrakenApi, kraken_api
+
+from .metrics import METRICS
+from .nonce import NonceManager, nonce_manager
+
+RATE_LIMIT_ERROR: str = "EAPI:Rate limit exceeded"
+RATE_LIMIT_WAIT: float = 10
+CONNECTION_ERROR_WAIT: float = 0.5
+INVALID_NONCE_ERROR: str = "EAPI:Invalid nonce"
+INVALID_NONCE_RETRIES: int = 5
+# Maximum number of transaction ids of a QueryOrders call.
+QUERY_ORDERS_MAX_TXIDS: int = 50
+# Number of orders of an AddOrderBatch call.
+ORDER_BATCH_MIN_ORDERS: int = 2
+ORDER_BATCH_MAX_ORDERS: int = 15
+# Endpoints which must not be sent again with a new nonce once they
+# may have reached Kraken.
+NON_IDEMPOTENT_ENDPOINTS: Tuple[str, ...] = (
+    "AddOrder",
+    "AddOrderBatch",
+    "EditOrder",
+    "CancelOrder",
+    "CancelAll",
+    "CancelOrderBatch",
+    "Withdraw",
+)
+# Kraken errors of public calls worth retrying.
+TRANSIENT_ERROR_PREFIXES: Tuple[str, ...] = ("EService:", RATE_LIMIT_ERROR)
+TRANSPORT_ERRORS: Tuple[type, ...] = (
+    ConnectionResetError,
+    URLError,
+    socket.timeout,
+)
+HEDGE_ENV: str = "KRAKEN_DCA_HEDGE"
+LATENCY_WINDOW: int = 200
+# Order endpoints rate limited ahead of Kraken, one token per order.
+# Defaults follow the Kraken starter tier trading rate limit: 60 orders
+# at once, then one per second.
+RATE_LIMITED_ENDPOINTS: Tuple[str, ...] = ("AddOrder", "AddOrderBatch")
+ORDER_RATE_ENV: str = "KRAKEN_DCA_ORDER_RATE"
+ORDER_BURST_ENV: str = "KRAKEN_DCA_ORDER_BURST"
+DEFAULT_ORDER_RATE: float = 1
+DEFAULT_ORDER_BURST: float = 60
+
+
+class LatencyTracker:
+    """
+    Thread-safe sliding window of successful call latencies per
+    endpoint, used to compute hedging delays.
+    """
+
+    def __init__(self, window: int = LATENCY_WINDOW) -> None:
+        self.lock = threading.Lock()
+        self.latencies: Dict[str, Deque[float]] = defaultdict(
+            lambda: deque(maxlen=window)
+        )
+
+    def record(self, endpoint: str, seconds: float) -> None:
+        with self.lock:
+            self.latencies[endpoint].append(seconds)
+
+    def quantile(
+        self, endpoint: str, quantile: float, min_samples: int = 1
+    ) -> Optional[float]:
+        """
+        Return a latency quantile of an endpoint.
+
+        :param endpoint: API method name.
+        :param quantile: Quantile between 0 and 1, e.g. 0.95.
+        :param min_samples: Samples needed to compute the quantile.
+        :return: Latency in seconds, None without enough samples.
+        """
+        with self.lock:
+            samples = sorted(self.latencies[endpoint])
+        if not samples or len(samples) < min_samples:
+            return None
+        index = min(math.ceil(quantile * len(samples)) - 1, len(samples) - 1)
+        return samples[max(index, 0)]
+
+
+LATENCIES: LatencyTracker = LatencyTracker()
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: up to capacity tokens are available at
+    once and tokens are refilled at rate per second.
+    """
+
+    lock: threading.Lock
+    rate: float
+    capacity: float
+    tokens: float
+    updated: float
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        """
+        Initialize the TokenBucket object, full.
+
+        :param rate: Tokens refilled per second.
+        :param capacity: Maximum number of tokens.
+        """
+        self.lock = threading.Lock()
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def acquire(self, tokens: float = 1) -> float:
+        """
+        Take tokens, waiting until they are available. Requests of more
+        than capacity tokens wait for a full bucket.
+
+        :param tokens: Number of tokens.
+        :return: Waited time in seconds.
+        """
+        tokens = min(tokens, self.capacity)
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity,
+                    self.tokens + (now - self.updated) * self.rate,
+                )
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return waited
+                delay = (tokens - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+_order_limiters: Dict[str, TokenBucket] = {}
+_order_limiters_lock = threading.Lock()
+
+
+def float_env(name: str, default: float) -> float:
+    """
+    Read a positive number from an environment variable, falling back
+    to the default when unset or malformed.
+
+    :param name: Environment variable name.
+    :param default: Default value.
+    :return: Value as float.
+    """
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    try:
+        number = float(value)
+    except ValueError:
+        number = 0
+    if not 0 < number < math.inf:
+        print(
+            f"Ignoring {name}={value!r}, must be a number > 0, "
+            f"using {default}."
+        )
+        return default
+    return number
+
+
+def order_limiter(api_key: str) -> TokenBucket:
+    """
+    Return the order TokenBucket shared by every client of an API key.
+    Its rate and capacity are read from the KRAKEN_DCA_ORDER_RATE and
+    KRAKEN_DCA_ORDER_BURST environment variables.
+
+    :param api_key: Kraken API public key.
+    :return: TokenBucket object.
+    """
+    with _order_limiters_lock:
+        limiter = _order_limiters.get(api_key)
+        if limiter is None:
+            limiter = _order_limiters[api_key] = TokenBucket(
+                float_env(ORDER_RATE_ENV, DEFAULT_ORDER_RATE),
+                float_env(ORDER_BURST_ENV, DEFAULT_ORDER_BURST),
+            )
+        return limiter
+
+
+class RequestPolicy:
+    """
+    Deadlines, retries and hedging of idempotent public calls.
+    """
+
+    timeout: float
+    deadline: float
+    max_attempts: int
+    backoff_base: float
+    backoff_max: float
+    hedge: bool
+    hedge_quantile: float
+    hedge_min_samples: int
+
+    def __init__(
+        self,
+        timeout: float = 5,
+        deadline: float = 20,
+        max_attempts: int = 4,
+        backoff_base: float = 0.25,
+        backoff_max: float = 4,
+        hedge: bool = False,
+        hedge_quantile: float = 0.95,
+        hedge_min_samples: int = 20,
+    ) -> None:
+        """
+        Initialize the RequestPolicy object.
+
+        :param timeout: Deadline of one attempt in seconds.
+        :param deadline: Deadline of the call, retries included.
+        :param max_attempts: Maximum number of attempts.
+        :param backoff_base: First retry maximum delay, doubled at each
+        retry ("full jitter": the delay is drawn between 0 and it).
+        :param backoff_max: Maximum retry delay.
+        :param hedge: Send a duplicate request when an attempt is slower
+        than the hedge_quantile latency of the endpoint.
+        :param hedge_quantile: Latency quantile triggering the hedge.
+        :param hedge_min_samples: Latency samples needed to hedge.
+        """
+        self.timeout = timeout
+        self.deadline = deadline
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+
+    @classmethod
+    def from_environment(cls) -> "RequestPolicy":
+        """
+        Default policy, hedging enabled with KRAKEN_DCA_HEDGE=1.
+
+        :return: RequestPolicy object.
+        """
+        hedge = os.environ.get(HEDGE_ENV, "").lower() in ("1", "true", "yes")
+        return cls(hedge=hedge)
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Return the delay before a retry.
+
+        :param attempt: Number of failed attempts.
+        :return: Delay in seconds.
+        """
+        ceiling = min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1))
+        return random.uniform(0, ceiling)
+
+    def hedge_delay(self, endpoint: str) -> Optional[float]:
+        """
+        Return the delay after which an attempt is hedged.
+
+        :param endpoint: API method name.
+        :return: Delay in seconds, None to not hedge.
+        """
+        if not self.hedge:
+            return None
+        return LATENCIES.quantile(
+            endpoint, self.hedge_quantile, self.hedge_min_samples
+        )
+
+
+def request_endpoint(request: Request) -> str:
+    """
+    Return the Kraken API method of a request, e.g. "AddOrder".
+
+    :param request: Request object.
+    :return: API method as string.
+    """
+    return urlparse(request.full_url).path.rsplit("/", 1)[-1]
+
+
+def is_private(request: Request) -> bool:
+    """
+    Tell if a request is an authenticated private API request.
+
+    :param request: Request object.
+    :return: True for private requests.
+    """
+    return "/private/" in urlparse(request.full_url).path
+
+
+def request_inputs(request: Request) -> Dict[str, str]:
+    """
+    Return the POST inputs of a request.
+
+    :param request: Request object.
+    :return: POST inputs as dict.
+    """
+    return dict(parse_qsl(request.data.decode())) if request.data else {}
+
+
+def request_order_count(request: Request) -> int:
+    """
+    Return the number of orders sent by an order request.
+
+    :param request: AddOrder or AddOrderBatch Request object.
+    :return: Number of orders.
+    """
+    indexes = {
+        key.partition("]")[0]
+        for key in request_inputs(request)
+        if key.startswith("orders[")
+    }
+    return len(indexes) or 1
+
+
+def request_nonce(request: Request) -> int:
+    """
+    Return the nonce of a private request.
+
+    :param request: Private Request object.
+    :return: Nonce as int, 0 without nonce.
+    """
+    return int(request_inputs(request).get("nonce", 0))
+
+
+class KrakenClient(KrakenApi):
+    """
+    KrakenApi with every call instrumented: per-endpoint counts,
+    latencies, retries, errors and rate-limit waits are recorded in
+    krakendca.metrics.METRICS.
+    Nonces come from the NonceManager shared by every client of the API
+    key, so private calls can run concurrently. Private requests are
+    signed with their nonce when sent, after orders waited for the
+    order TokenBucket of the API key, so that calls reach Kraken in
+    nonce order.
+    """
+
+    nonces: NonceManager
+    order_limiter: TokenBucket
+    policy: RequestPolicy
+
+    def __init__(
+        self,
+        api_public_key: str = "",
+        api_private_key: str = "",
+        policy: Optional[RequestPolicy] = None,
+    ) -> None:
+        """
+        Initialize the KrakenClient object.
+
+        :param api_public_key: Kraken api key.
+        :param api_private_key: Kraken api secret key.
+        :param policy: RequestPolicy of public calls.
+        """
+        super().__init__(api_public_key, api_private_key)
+        self.nonces = nonce_manager(api_public_key)
+        self.order_limiter = order_limiter(api_public_key)
+        self.policy = policy or RequestPolicy.from_environment()
+
+    def create_api_nonce(self) -> str:
+        """
+        Create the next nonce of the API key.
+
+        :return: Nonce as string.
+        """
+        return str(self.nonces.next_nonce())
+
+    def create_api_request(
+        self, public_method: bool, api_method: str, post_inputs: dict = None
+    ) -> Request:
+        """
+        Given a method, create a request object to send to Kraken API.
+        Private requests are created unsigned, they are signed with a new
+        nonce by send_api_request.
+
+        :param public_method: Is the method a public market data.
+        :param api_method: API method as string.
+        :param post_inputs: POST inputs as dict.
+        :return: Request object.
+        """
+        if public_method:
+            return super().create_api_request(
+                public_method, api_method, post_inputs
+            )
+        return Request(
+            self.create_api_path(public_method, api_method),
+            data=self.create_api_post_data(post_inputs or {}, ""),
+        )
+
+    def renew_request(self, request: Request) -> Request:
+        """
+        Create the same private request with a new nonce and signature.
+
+        :param request: Private Request object.
+        :return: New Request object.
+        """
+        post_inputs = request_inputs(request)
+        post_inputs.pop("nonce", None)
+        return super().create_api_request(
+            False, request_endpoint(request), post_inputs or None
+        )
+
+    def send_api_request(self, request: Request) -> dict:
+        """
+        Request the Kraken API and return the response data.
+        Public requests follow the client RequestPolicy. Private requests
+        have the same retry behaviour as KrakenApi.send_api_request:
+        connection errors are retried after 0.5sc and rate limit errors
+        after 10sc. They are sent again with a new nonce after rate limit
+        and invalid nonce errors, unless a non-idempotent request may
+        already have reached Kraken after a connection error.
+
+        :param request: Request object to send to Kraken API.
+        :return: Kraken API's response as dict.
+        """
+        if not is_private(request):
+            return self.send_public_request(request)
+        endpoint = request_endpoint(request)
+        renewable = True
+        renew = True
+        invalid_nonces = 0
+        attempt = 0
+        while True:
+            if attempt:
+                METRICS.record_retry("kraken", endpoint)
+            attempt += 1
+            if renew:
+                # Wait for the order rate limit before taking a nonce.
+                if endpoint in RATE_LIMITED_ENDPOINTS:
+                    waited = self.order_limiter.acquire(
+                        request_order_count(request)
+                    )
+                    if waited:
+                        METRICS.record_rate_limit_wait(
+                            "kraken", endpoint, waited
+                        )
+                request = self.renew_request(request)
+                renew = False
+            start = time.perf_counter()
+            try:
+                data = kraken_api.urlopen(request).read()
+            except (ConnectionResetError, URLError) as e:
+                METRICS.record_call(
+                    "kraken",
+                    endpoint,
+                    time.perf_counter() - start,
+                    type(e).__name__,
+                )
+                if endpoint in NON_IDEMPOTENT_ENDPOINTS:
+                    renewable = False
+                print("Kraken API connection error. Waiting 0.5sc...")
+                time.sleep(CONNECTION_ERROR_WAIT)
+                continue
+            elapsed = time.perf_counter() - start
+            try:
+                data = self.extract_response_data(data)
+            except ValueError:
+                METRICS.record_call("kraken", endpoint, elapsed, "EFormat")
+                raise
+            if type(data) == str:
+                METRICS.record_call("kraken", endpoint, elapsed, data)
+                if data == RATE_LIMIT_ERROR:
+                    print("Kraken API rate limit exceeded. Waiting 10sc...")
+                    METRICS.record_rate_limit_wait(
+                        "kraken", endpoint, RATE_LIMIT_WAIT
+                    )
+                    time.sleep(RATE_LIMIT_WAIT)
+                    renew = renewable
+                    continue
+                if (
+                    data == INVALID_NONCE_ERROR
+                    and renewable
+                    and invalid_nonces < INVALID_NONCE_RETRIES
+                ):
+                    invalid_nonces += 1
+                    self.nonces.rebuild(request_nonce(request))
+                    renew = True
+                    continue
+                raise ValueError(f"Kraken API error -> {data}")
+            METRICS.record_call("kraken", endpoint, elapsed)
+            return data
+
+    def send_public_request(self, request: Request) -> dict:
+        """
+        Request an idempotent public endpoint within the policy deadline,
+        retrying transport errors, timeouts and transient Kraken errors
+        with exponential backoff and jitter.
+
+        :param request: Public Request object.
+        :return: Kraken API's response as dict.
+        """
+        endpoint = request_endpoint(request)
+        policy = self.policy
+        deadline = time.monotonic() + policy.deadline
+        attempt = 0
+        while True:
+            if attempt:
+                METRICS.record_retry("kraken", endpoint)
+            attempt += 1
+            timeout = min(policy.timeout, deadline - time.monotonic())
+            start = time.perf_counter()
+            try:
+                data = self.fetch(request, endpoint, timeout)
+            except TRANSPORT_ERRORS as e:
+                error = e
+                METRICS.record_call(
+                    "kraken",
+                    endpoint,
+                    time.perf_counter() - start,
+                    type(e).__name__,
+                )
+            else:
+                elapsed = time.perf_counter() - start
+                try:
+                    data = self.extract_response_data(data)
+                except ValueError:
+                    METRICS.record_call("kraken", endpoint, elapsed, "EFormat")
+                    raise
+                if type(data) != str:
+                    METRICS.record_call("kraken", endpoint, elapsed)
+                    LATENCIES.record(endpoint, elapsed)
+                    return data
+                METRICS.record_call("kraken", endpoint, elapsed, data)
+                error = ValueError(f"Kraken API error -> {data}")
+                if not data.startswith(TRANSIENT_ERROR_PREFIXES):
+                    raise error
+            delay = policy.backoff(attempt)
+            if (
+                attempt >= policy.max_attempts
+                or time.monotonic() + delay >= deadline
+            ):
+                if isinstance(error, ValueError):
+                    raise error
+                raise ConnectionError(
+                    f"Kraken API {endpoint} failed after {attempt} "
+                    f"attempts -> {error}"
+                )
+            if str(error).endswith(RATE_LIMIT_ERROR):
+                METRICS.record_rate_limit_wait("kraken", endpoint, delay)
+            print(f"Kraken API {endpoint} error. Retrying in {delay:.2f}sc...")
+            time.sleep(delay)
+
+    def fetch(self, request: Request, endpoint: str, timeout: float) -> bytes:
+        """
+        Send one attempt of a public request, hedged by a duplicate
+        request when slower than the policy hedge delay.
+
+        :param request: Public Request object.
+        :param endpoint: API method name.
+        :param timeout: Attempt deadline in seconds.
+        :return: Response body.
+        """
+
+        def read() -> bytes:
+            return kraken_api.urlopen(request, timeout=timeout).read()
+
+        hedge_delay = self.policy.hedge_delay(endpoint)
+        if hedge_delay is None or hedge_delay >= timeout:
+            return read()
+        end = time.monotonic() + timeout
+        futures = {HEDGE_POOL.submit(read)}
+        done, _ = wait(futures, timeout=hedge_delay)
+        if not done:
+            METRICS.record_hedge("kraken", endpoint)
+            futures.add(HEDGE_POOL.submit(read))
+        error: Exception = socket.timeout("timed out")
+        while futures:
+            done, futures = wait(
+                futures,
+                timeout=max(end - time.monotonic(), 0),
+                return_when=FIRST_COMPLETED,
+            )
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def query_orders(self, txids: List[str]) -> Dict[str, dict]:
+        """
+        Return open or closed orders by transaction id, up to
+        QUERY_ORDERS_MAX_TXIDS per call like Kraken accepts.
+
+        :param txids: List of order transaction ids.
+        :return: Dict of orders with txid as the key.
+        """
+        if len(txids) > QUERY_ORDERS_MAX_TXIDS:
+            raise ValueError(
+                f"QueryOrders accepts up to {QUERY_ORDERS_MAX_TXIDS} txids."
+            )
+        request = self.create_api_request(
+            False, "QueryOrders", {"txid": ",".join(txids)}
+        )
+        return self.send_api_request(request)
+
+    def create_order_batch(
+        self, pair: str, orders: List[Dict[str, Any]]
+    ) -> List[dict]:
+        """
+        Create orders of one pair with a single AddOrderBatch call.
+        Orders are form-encoded as orders[<index>][<key>] inputs.
+
+        :param pair: Orders pair.
+        :param orders: Orders as dicts of AddOrder inputs, e.g. type,
+        ordertype, price, volume and oflags.
+        :return: Result of each order, with txid and descr or error.
+        """
+        if not (
+            ORDER_BATCH_MIN_ORDERS <= len(orders) <= ORDER_BATCH_MAX_ORDERS
+        ):
+            raise ValueError(
+                f"AddOrderBatch accepts {ORDER_BATCH_MIN_ORDERS} to "
+                f"{ORDER_BATCH_MAX_ORDERS} orders."
+            )
+        post_inputs: Dict[str, Any] = {"pair": pair}
+        for index, order in enumerate(orders):
+            for key, value in order.items():
+                post_inputs[f"orders[{index}][{key}]"] = value
+        request = self.create_api_request(False, "AddOrderBatch", post_inputs)
+        return self.send_api_request(request).get("orders")
+
+
+# Threads of hedged requests, the slowest answers are abandoned.
+HEDGE_POOL: ThreadPoolExecutor = ThreadPoolExecutor(
+    max_workers=16, thread_name_prefix="kraken-hedge"
+)
@@ -0,0 +1,108 @@
+"""Kraken clock offset module."""
+import math
+import time
+from datetime import datetime
+from typing import Optional
+
+from krakenapi import KrakenApi
+
+from .utils import utc_unix_time_datetime
+
+MAX_LAG: float = 2
+MAX_SAMPLES: int = 3
+# A sample answered faster is precise enough: Kraken time is truncated
+# to the second.
+GOOD_RTT: float = 0.25
+LAG_ERROR_MSG: str = (
+    "Too much lag -> Check your internet connection speed "
+    "or synchronize your system time."
+)
+
+
+class ClockService:
+    """
+    Offset between Kraken and system clocks, measured once per run
+    like a minimal NTP client: each Time call bounds the offset between
+    Kraken time - answer time and Kraken time + 1 - request time, the
+    estimate is the middle of the intersection of the samples bounds.
+    """
+
+    ka: KrakenApi
+    max_samples: int
+    offset: Optional[float]
+    rtt: Optional[float]
+
+    def __init__(self, ka: KrakenApi, max_samples: int = MAX_SAMPLES) -> None:
+        """
+        Initialize the ClockService object.
+
+        :param ka: KrakenApi object.
+        :param max_samples: Maximum number of Time calls per measure.
+        """
+        self.ka = ka
+        self.max_samples = max_samples
+        self.offset = None
+        self.rtt = None
+
+    def measure(self) -> float:
+        """
+        Measure the Kraken clock offset, sampling until a sample is
+        answered within GOOD_RTT seconds or max_samples is reached.
+
+        :return: Kraken time - system time in seconds.
+        """
+        lower, upper = -math.inf, math.inf
+        best_rtt, best_offset = math.inf, 0.0
+        for _ in range(self.max_samples):
+            request_time = time.time()
+            kraken_time = self.ka.get_time()
+            answer_time = time.time()
+            rtt = answer_time - request_time
+            lower = max(lower, kraken_time - answer_time)
+            upper = min(upper, kraken_time + 1 - request_time)
+            if rtt < best_rtt:
+                middle = (request_time + answer_time) / 2
+                best_rtt, best_offset = rtt, kraken_time + 0.5 - middle
+            if rtt <= GOOD_RTT:
+                break
+        # Bounds don't intersect if a clock jumped meanwhile.
+        self.offset = (lower + upper) / 2 if lower <= upper else best_offset
+        self.rtt = best_rtt
+        system_date = utc_unix_time_datetime(int(answer_time))
+        print(f"It's {self.kraken_now()} on Kraken, {system_date} on system.")
+        print(
+            f"Clock offset: {self.offset:+.3f}s (RTT {best_rtt * 1000:.0f}ms)."
+        )
+        return self.offset
+
+    def kraken_now(self) -> datetime:
+        """
+        Return the current Kraken time, measuring the offset first if
+        needed.
+
+        :return: Offset corrected UTC datetime in seconds precision.
+        """
+        if self.offset is None:
+            self.measure()
+        return utc_unix_time_datetime(int(time.time() + self.offset))
+
+    def check_lag(self) -> None:
+        """
+        Raise an error if the clocks differ by more than MAX_LAG seconds,
+        whatever the sign of the difference.
+
+        :return: None
+        """
+        if self.offset is None:
+            self.measure()
+        if abs(self.offset) > MAX_LAG:
+            raise OSError(LAG_ERROR_MSG)
+
+    def checked_now(self) -> datetime:
+        """
+        Check the lag and return the current Kraken time.
+
+        :return: Offset corrected UTC datetime in seconds precision.
+        """
+        self.check_lag()
+        return self.kraken_now()
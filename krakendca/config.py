@@ -1,8 +1,34 @@
 """Configuration module."""
+import hashlib
+import marshal
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional
+
 import yaml
 from yaml.scanner import ScannerError
 
+from .store import ORDER_STORE_BACKENDS
+
 CONFIG_ERROR_MSG: str = "Configuration file incorrectly formatted"
+DEFAULT_MAX_CONCURRENT_ORDERS: int = 1
+CONFIG_CACHE_ENV: str = "KRAKEN_DCA_CONFIG_CACHE"
+# Bump when the validated configuration attributes change.
+CONFIG_CACHE_VERSION: int = 3
+CONFIG_ATTRIBUTES = (
+    "api_user_name",
+    "api_public_key",
+    "api_private_key",
+    "dca_pairs",
+    "max_concurrent_orders",
+    "order_store",
+)
+# libyaml loader, if PyYAML was built with it.
+FAST_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# Validated configurations by content hash, as marshal bytes so that
+# each Config gets its own copy.
+_compiled_configs: Dict[str, bytes] = {}
 
 
 class Config:
@@ -14,6 +40,8 @@ class Config:
     api_public_key: str
     api_private_key: str
     dca_pairs: list
+    max_concurrent_orders: int
+    order_store: dict
 
     def __init__(self, config_file: str) -> None:
         """
@@ -24,18 +52,52 @@ class Config:
         """
         try:
             with open(config_file, "r") as stream:
-                config = yaml.load(stream, Loader=yaml.SafeLoader)
-            self.api_user_name = config.get("api").get("user_name")
-            self.api_public_key = config.get("api").get("public_key")
-            self.api_private_key = config.get("api").get("private_key")
-            self.dca_pairs = config.get("dca_pairs")
-            self.__check_configuration()
-            for dca_pair in self.dca_pairs:
-                self.__check_dca_pair_configuration(dca_pair)
+                text = stream.read()
         except EnvironmentError:
             raise FileNotFoundError("Configuration file not found.")
-        except ScannerError as e:
-            raise ScannerError(CONFIG_ERROR_MSG + f": {e}")
+        key = self.cache_key(text)
+        attributes = load_compiled_config(key)
+        if attributes is None:
+            try:
+                attributes = self.compile(text)
+            except ScannerError as e:
+                raise ScannerError(CONFIG_ERROR_MSG + f": {e}")
+            store_compiled_config(key, attributes)
+        for name, value in attributes.items():
+            setattr(self, name, value)
+
+    @staticmethod
+    def cache_key(text: str) -> str:
+        """
+        Return the compiled configuration key of a file content.
+
+        :param text: Configuration file content.
+        :return: Hexadecimal hash.
+        """
+        content = f"{CONFIG_CACHE_VERSION}:{marshal.version}:{text}"
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def compile(self, text: str) -> Dict[str, Any]:
+        """
+        Parse and check a configuration file content.
+
+        :param text: Configuration file content.
+        :return: Validated and normalized Config attributes.
+        """
+        config = parse_yaml(text)
+        self.api_user_name = config.get("api").get("user_name")
+        self.api_public_key = config.get("api").get("public_key")
+        self.api_private_key = config.get("api").get("private_key")
+        self.dca_pairs = config.get("dca_pairs")
+        self.max_concurrent_orders = config.get(
+            "max_concurrent_orders", DEFAULT_MAX_CONCURRENT_ORDERS
+        )
+        self.order_store = config.get("order_store") or {}
+        self.__check_configuration()
+        self.__check_order_store_configuration(self.order_store)
+        for dca_pair in self.dca_pairs:
+            self.__check_dca_pair_configuration(dca_pair)
+        return {name: getattr(self, name) for name in CONFIG_ATTRIBUTES}
 
     def __check_configuration(self) -> None:
         """
@@ -52,6 +114,42 @@ class Config:
                 raise ValueError("Please provide your Kraken API private key.")
             if not self.dca_pairs or type(self.dca_pairs) is not list:
                 raise ValueError("No DCA pairs specified.")
+            if (
+                type(self.max_concurrent_orders) is not int
+                or self.max_concurrent_orders <= 0
+            ):
+                raise ValueError("max_concurrent_orders must be a number > 0.")
+        except ValueError as e:
+            raise ValueError(CONFIG_ERROR_MSG + f": {e}")
+
+    @staticmethod
+    def __check_order_store_configuration(order_store: dict) -> None:
+        """
+        Check the order store configuration, DynamoDB kraken-dca table
+        if not set.
+
+        :param order_store: Dictionary with the order store backend and
+        its parameters.
+        :return: None
+        """
+        try:
+            if type(order_store) is not dict:
+                raise ValueError("order_store must be a mapping.")
+            backend = order_store.get("backend", "dynamodb")
+            if backend not in ORDER_STORE_BACKENDS:
+                raise ValueError(
+                    "order_store backend must be one of "
+                    f"{', '.join(ORDER_STORE_BACKENDS)}."
+                )
+            if backend != "dynamodb" and not order_store.get("path"):
+                raise ValueError(
+                    f"Please provide the {backend} order_store path."
+                )
+            batch_size = order_store.get("batch_size", 1)
+            if type(batch_size) is not int or batch_size <= 0:
+                raise ValueError(
+                    "order_store batch_size must be a number > 0."
+                )
         except ValueError as e:
             raise ValueError(CONFIG_ERROR_MSG + f": {e}")
 
@@ -107,5 +205,92 @@ class Config:
                     dca_pair["max_price"]: float = max_price
                 except ValueError:
                     raise ValueError("max_price must be a number.")
+
+            # ladder
+            if dca_pair.get("ladder") is not None:
+                ladder = dca_pair.get("ladder")
+                try:
+                    if type(ladder) is not list or not 2 <= len(ladder) <= 15:
+                        raise ValueError
+                    ladder = [float(offset) for offset in ladder]
+                    if any(not 0 <= offset < 1 for offset in ladder):
+                        raise ValueError
+                    dca_pair["ladder"]: list = ladder
+                except (TypeError, ValueError):
+                    raise ValueError(
+                        "ladder option must be a list of 2 to 15 offsets "
+                        ">= 0 and < 1."
+                    )
         except ValueError as e:
             raise ValueError(CONFIG_ERROR_MSG + f": {e}")
+
+
+def parse_yaml(text: str) -> Any:
+    """
+    Parse YAML with the libyaml loader when available. Errors are
+    raised by the pure Python loader, whose messages quote the line.
+
+    :param text: YAML document.
+    :return: Parsed document.
+    """
+    try:
+        return yaml.load(text, Loader=FAST_LOADER)
+    except yaml.YAMLError:
+        if FAST_LOADER is yaml.SafeLoader:
+            raise
+        return yaml.load(text, Loader=yaml.SafeLoader)
+
+
+def compiled_config_path(key: str) -> Optional[Path]:
+    cache_directory = os.environ.get(CONFIG_CACHE_ENV)
+    if not cache_directory:
+        return None
+    return Path(cache_directory) / f"{key}.marshal"
+
+
+def load_compiled_config(key: str) -> Optional[Dict[str, Any]]:
+    """
+    Return the compiled configuration of a key, from memory or from
+    the KRAKEN_DCA_CONFIG_CACHE directory.
+
+    :param key: Configuration content hash.
+    :return: Config attributes, None if not compiled yet.
+    """
+    compiled = _compiled_configs.get(key)
+    path = compiled_config_path(key)
+    if compiled is None and path is not None:
+        try:
+            compiled = path.read_bytes()
+        except OSError:
+            return None
+    if compiled is None:
+        return None
+    try:
+        attributes = marshal.loads(compiled)
+    except (EOFError, ValueError, TypeError):
+        return None
+    _compiled_configs[key] = compiled
+    return attributes
+
+
+def store_compiled_config(key: str, attributes: Dict[str, Any]) -> None:
+    """
+    Keep a validated configuration in memory and in the
+    KRAKEN_DCA_CONFIG_CACHE directory if set.
+
+    :param key: Configuration content hash.
+    :param attributes: Config attributes.
+    :return: None
+    """
+    compiled = marshal.dumps(attributes)
+    _compiled_configs[key] = compiled
+    path = compiled_config_path(key)
+    if path is None:
+        return
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        temporary_path.write_bytes(compiled)
+        os.replace(temporary_path, path)
+    except OSError as e:
+        print(f"Compiled configuration not cached: {e}.")
@@ -0,0 +1,347 @@
+"""Long-running DCA daemon module."""
+import heapq
+import itertools
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+from . import tracing
+from .api import KrakenClient
+from .clock import ClockService
+from .config import Config
+from .dca import DCA
+from .due_index import DueIndex
+from .krakendca import KrakenDCA
+from .metrics import METRICS, metric_labels
+from .plan import DCAPlan
+from .ticker import TickerFeed
+from .utils import datetime_as_utc_unix
+
+CONFIG_GLOB: str = "config*.yaml"
+# Configuration files are checked for changes at least this often.
+POLL_INTERVAL: float = 60
+# Pairs of a failed account run are retried after this delay.
+RETRY_INTERVAL: float = 900
+
+
+class PairScheduler:
+    """
+    Priority queue of pairs by next due time. Rescheduled and removed
+    pairs leave their previous entries in the heap, skipped when popped.
+    """
+
+    heap: List[Tuple[float, int, Hashable]]
+    due_times: Dict[Hashable, float]
+
+    def __init__(self) -> None:
+        self.heap = []
+        self.due_times = {}
+        self.counter = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self.due_times)
+
+    def schedule(self, key: Hashable, due_time: float) -> None:
+        """
+        Schedule a pair, replacing its previous due time.
+
+        :param key: Pair key.
+        :param due_time: Unix time the pair is due.
+        :return: None
+        """
+        self.due_times[key] = due_time
+        heapq.heappush(self.heap, (due_time, next(self.counter), key))
+
+    def remove(self, key: Hashable) -> None:
+        self.due_times.pop(key, None)
+
+    def next_due_time(self) -> Optional[float]:
+        """
+        Return the earliest due time, None without scheduled pair.
+
+        :return: Unix time.
+        """
+        while self.heap:
+            due_time, _, key = self.heap[0]
+            if self.due_times.get(key) == due_time:
+                return due_time
+            heapq.heappop(self.heap)
+        return None
+
+    def pop_due(self, now: float) -> List[Hashable]:
+        """
+        Unschedule and return the pairs due at now, earliest first.
+
+        :param now: Unix time.
+        :return: Pair keys.
+        """
+        keys = []
+        while True:
+            due_time = self.next_due_time()
+            if due_time is None or due_time > now:
+                return keys
+            _, _, key = heapq.heappop(self.heap)
+            del self.due_times[key]
+            keys.append(key)
+
+
+class Account:
+    """
+    Warm state of a configuration file: Kraken client, pairs metadata
+    and DCA objects, reused by every run of its pairs.
+    """
+
+    config_file: Path
+    mtime: float
+    kdca: Optional[KrakenDCA]
+
+    def __init__(
+        self, config_file: Path, mtime: float, kdca: Optional[KrakenDCA]
+    ) -> None:
+        """
+        Initialize the Account object.
+
+        :param config_file: Configuration file path.
+        :param mtime: Modification time of the loaded file.
+        :param kdca: Initialized KrakenDCA object, None if the file
+        isn't initialized.
+        """
+        self.config_file = config_file
+        self.mtime = mtime
+        self.kdca = kdca
+
+
+class Daemon:
+    """
+    Run every configuration file pairs when due, instead of once a day:
+    each pair is scheduled after its run according to its delay, and
+    configuration files are reloaded when they change on disk.
+    """
+
+    config_directory: Path
+    accounts: Dict[Path, Account]
+    scheduler: PairScheduler
+
+    def __init__(
+        self,
+        config_directory: Path,
+        ticker: Optional[TickerFeed] = None,
+        due_index: Optional[DueIndex] = None,
+        poll_interval: float = POLL_INTERVAL,
+        retry_interval: float = RETRY_INTERVAL,
+        time_function: Callable[[], float] = time.time,
+    ) -> None:
+        """
+        Initialize the Daemon object.
+
+        :param config_directory: Directory of config*.yaml files.
+        :param ticker: TickerFeed shared by every account.
+        :param due_index: DueIndex shared by every account.
+        :param poll_interval: Maximum seconds between configuration
+        files checks.
+        :param retry_interval: Seconds before running again the pairs
+        of a failed account run.
+        :param time_function: Unix time function.
+        """
+        self.config_directory = Path(config_directory)
+        self.ticker = ticker
+        self.due_index = due_index
+        self.poll_interval = poll_interval
+        self.retry_interval = retry_interval
+        self.time_function = time_function
+        self.accounts = {}
+        self.scheduler = PairScheduler()
+        self.clock: Optional[ClockService] = None
+        self.stopped = threading.Event()
+
+    def run(self) -> None:
+        """
+        Reload changed configuration files and run due pairs, sleeping
+        until the next due pair or configuration check, until stopped.
+
+        :return: None
+        """
+        while not self.stopped.is_set():
+            self.reload_configs()
+            self.run_due_pairs()
+            self.stopped.wait(self.next_wait())
+
+    def stop(self) -> None:
+        self.stopped.set()
+
+    def next_wait(self) -> float:
+        """
+        Return the seconds to sleep until the next due pair, at most
+        poll_interval.
+
+        :return: Seconds.
+        """
+        due_time = self.scheduler.next_due_time()
+        if due_time is None:
+            return self.poll_interval
+        wait = due_time - self.time_function()
+        return max(0.0, min(wait, self.poll_interval))
+
+    def reload_configs(self) -> None:
+        """
+        Load new and modified configuration files, and unschedule the
+        pairs of removed ones.
+
+        :return: None
+        """
+        config_files = sorted(self.config_directory.glob(CONFIG_GLOB))
+        for config_file in set(self.accounts) - set(config_files):
+            print(f"Configuration {config_file.name} removed.")
+            self.unschedule(self.accounts.pop(config_file))
+        for config_file in config_files:
+            try:
+                mtime = config_file.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            account = self.accounts.get(config_file)
+            if account is None or account.mtime != mtime:
+                self.load_account(config_file, mtime)
+
+    def load_account(self, config_file: Path, mtime: float) -> None:
+        """
+        Load a configuration file, initialize its pairs and schedule
+        them now. The previous state is kept if the file is invalid.
+
+        :param config_file: Configuration file path.
+        :param mtime: Configuration file modification time.
+        :return: None
+        """
+        previous = self.accounts.get(config_file)
+        try:
+            with tracing.span("config.load", config_file.name):
+                config = Config(config_file)
+        except Exception as e:
+            # Not loaded again until modified.
+            print(f"Configuration {config_file.name} not loaded: {e}")
+            if previous is not None:
+                previous.mtime = mtime
+            else:
+                self.accounts[config_file] = Account(config_file, mtime, None)
+            return
+        kdca = None
+        if config.api_user_name != "KRAKEN_USER_NAME":
+            kdca = self.create_kdca(config, previous)
+            try:
+                with metric_labels(account=config.api_user_name):
+                    kdca.initialize_pairs_dca()
+            except Exception as e:
+                # Loaded again at the next configuration check.
+                print(f"Configuration {config_file.name} not loaded: {e}")
+                return
+        if previous is not None:
+            self.unschedule(previous)
+        account = Account(config_file, mtime, kdca)
+        self.accounts[config_file] = account
+        now = self.time_function()
+        for index in range(len(kdca.dcas_list) if kdca else 0):
+            self.scheduler.schedule((config_file, index), now)
+
+    def create_kdca(
+        self, config: Config, previous: Optional[Account]
+    ) -> KrakenDCA:
+        """
+        Create the KrakenDCA object of a configuration, reusing the
+        Kraken client of the previous configuration with the same keys.
+
+        :param config: Config object.
+        :param previous: Account previously loaded from the file.
+        :return: KrakenDCA object, pairs not initialized.
+        """
+        ka = None
+        if previous is not None and previous.kdca is not None:
+            previous_config = previous.kdca.config
+            if (
+                previous_config.api_public_key == config.api_public_key
+                and previous_config.api_private_key == config.api_private_key
+            ):
+                ka = previous.kdca.ka
+        if ka is None:
+            ka = KrakenClient(config.api_public_key, config.api_private_key)
+        if self.clock is None:
+            self.clock = ClockService(ka)
+        return KrakenDCA(config, ka, self.clock, self.ticker, self.due_index)
+
+    def unschedule(self, account: Account) -> None:
+        for index in range(len(account.kdca.dcas_list) if account.kdca else 0):
+            self.scheduler.remove((account.config_file, index))
+
+    def run_due_pairs(self) -> None:
+        """
+        Run the due pairs of each account with one plan per account and
+        schedule them again. API call metrics and traces are exported
+        after each run.
+
+        :return: None
+        """
+        keys = self.scheduler.pop_due(self.time_function())
+        if not keys:
+            return
+        due_indexes: Dict[Path, List[int]] = {}
+        for config_file, index in keys:
+            due_indexes.setdefault(config_file, []).append(index)
+        METRICS.reset()
+        try:
+            with tracing.span("dca.run"):
+                for config_file in sorted(due_indexes):
+                    self.run_account(
+                        self.accounts[config_file],
+                        sorted(due_indexes[config_file]),
+                    )
+        finally:
+            METRICS.emit()
+            tracing.flush()
+
+    def run_account(self, account: Account, indexes: List[int]) -> None:
+        """
+        Run the due pairs of an account, in configuration order.
+
+        :param account: Account object.
+        :param indexes: Indexes of the due DCA objects.
+        :return: None
+        """
+        kdca = account.kdca
+        dcas = [kdca.dcas_list[index] for index in indexes]
+        try:
+            with metric_labels(account=kdca.config.api_user_name):
+                with tracing.span("dca.account"):
+                    plan = kdca.handle_pairs_dca(dcas)
+        except Exception as e:
+            print(
+                f"DCA of {account.config_file.name} failed: {e}. "
+                f"Retrying in {self.retry_interval}sc..."
+            )
+            retry_time = self.time_function() + self.retry_interval
+            for index in indexes:
+                self.scheduler.schedule(
+                    (account.config_file, index), retry_time
+                )
+            return
+        for index, dca in zip(indexes, dcas):
+            self.scheduler.schedule(
+                (account.config_file, index), next_due_time(dca, plan)
+            )
+
+
+def next_due_time(dca: DCA, plan: DCAPlan) -> float:
+    """
+    Return the next due time of a DCA pair after a run: the first day
+    of the next delay window if an order was placed, the next day
+    otherwise, when the daily orders count may have changed.
+
+    :param dca: DCA object.
+    :param plan: Executed DCAPlan object.
+    :return: Unix time.
+    """
+    ordered = any(
+        item.orders for item in plan.items if item.pair == dca.pair.name
+    )
+    day = plan.date.replace(hour=0, minute=0, second=0, microsecond=0)
+    days = dca.delay if ordered else 1
+    return datetime_as_utc_unix(day + timedelta(days=days))
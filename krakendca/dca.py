@@ -1,10 +1,14 @@
 """Dollar Cost Averaging module."""
 from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
 
 from krakenapi import KrakenApi
 
+from .clock import LAG_ERROR_MSG, MAX_LAG
+from .money import float_units, rescale_units
 from .order import Order
 from .pair import Pair
+from .store import DynamoOrderStore, OrderStore
 from .utils import (
     current_utc_datetime,
     current_utc_day_datetime,
@@ -23,9 +27,10 @@ class DCA:
     pair: Pair
     amount: float
     user_name: str
-    orders_table: str
+    order_store: OrderStore
     limit_factor: float
     max_price: float
+    ladder: List[float]
 
     def __init__(
         self,
@@ -36,7 +41,8 @@ class DCA:
         user_name: str,
         limit_factor: float = 1,
         max_price: float = -1,
-        orders_table: str = "kraken-dca",
+        order_store: Optional[OrderStore] = None,
+        ladder: Optional[List[float]] = None,
     ) -> None:
         """
         Initialize the DCA object.
@@ -48,7 +54,10 @@ class DCA:
         :param user_name: User name of account in Kraken platform.
         :param limit_factor: Price limit factor as float.
         :param max_price: Maximum price as float.
-        :param orders_table: Orders save file path as String.
+        :param order_store: OrderStore saving the orders, the kraken-dca
+        DynamoDB table by default.
+        :param ladder: Offsets below the limit price of a ladder of
+        limit orders splitting the amount, one order without.
         """
         self.ka = ka
         self.delay = delay
@@ -57,7 +66,8 @@ class DCA:
         self.user_name = user_name
         self.limit_factor = float(limit_factor)
         self.max_price = float(max_price)
-        self.orders_table = orders_table
+        self.order_store = order_store or DynamoOrderStore()
+        self.ladder = [float(offset) for offset in ladder or []]
 
     def __str__(self) -> str:
         desc: str = (
@@ -68,41 +78,35 @@ class DCA:
             desc += f", limit_factor: {self.limit_factor}"
         if self.max_price != -1:
             desc += f", max_price: {self.max_price}"
+        if self.ladder:
+            desc += f", ladder: {self.ladder}"
         return desc
 
-    def handle_dca_logic(self) -> None:
+    def check_max_price(self, limit_price: float) -> Optional[str]:
         """
-        Handle DCA logic.
+        Check limit price against the maximum price.
 
-        :return: None
+        :param limit_price: Order limit price.
+        :return: Reason to skip the DCA, None if the price is accepted.
         """
-        # Check current system time.
-        current_date = self.get_system_time()
-        # Check Kraken account balance.
-        self.check_account_balance()
-        # Check if didn't already DCA today
-        if self.count_pair_daily_orders() != 0:
-            print(
-                f"No DCA for {self.pair.name}: Already placed an order today."
-            )
-            return
-        print("Didn't DCA already today.")
-        # Get current pair ask price.
-        pair_ask_price = self.pair.get_pair_ask_price(self.ka, self.pair.name)
-        print(f"Current {self.pair.name} ask price: {pair_ask_price}.")
-        # Get limit price based on limit_factor
-        limit_price = self.get_limit_price(
-            pair_ask_price, self.pair.pair_decimals
-        )
-        # Reject DCA if limit_price greater than max_price
         if self.max_price != -1 and limit_price > self.max_price:
-            print(
+            return (
                 f"No DCA for {self.pair.name}: Limit price ({limit_price}) "
                 f"greater than maximum price ({self.max_price})."
             )
-            return
-        # Create the Order object.
-        order = Order.buy_limit_order(
+        return None
+
+    def create_order(
+        self, current_date: datetime, limit_price: float
+    ) -> Order:
+        """
+        Create the buy limit order of the DCA amount at limit price.
+
+        :param current_date: Order date as datetime.
+        :param limit_price: Order limit price.
+        :return: Order object.
+        """
+        return Order.buy_limit_order(
             self.user_name,
             current_date,
             self.pair.name,
@@ -110,12 +114,57 @@ class DCA:
             limit_price,
             self.pair.lot_decimals,
             self.pair.quote_decimals,
+            self.limit_factor,
         )
-        # Send buy order to Kraken API and print information.
-        self.send_buy_limit_order(order)
-        # Save order information to Dynamo DB.
-        order.save_order_dynamo(self.orders_table)
-        print("Order information saved to Dynamo DB.")
+
+    def create_ladder_orders(
+        self, current_date: datetime, limit_price: float
+    ) -> List[Order]:
+        """
+        Split the DCA amount into a ladder of buy limit orders, one per
+        ladder offset below the limit price. Each rung buys an equal
+        share of the amount, floored to quote decimals, and records its
+        own limit factor.
+
+        :param current_date: Orders date as datetime.
+        :param limit_price: Limit price of the ladder top.
+        :return: List of Order objects.
+        """
+        quote_decimals = self.pair.quote_decimals
+        amount_units, amount_decimals = float_units(self.amount)
+        rung_amount = (amount_units * 10**quote_decimals) // (
+            len(self.ladder) * 10**amount_decimals
+        )
+        price_units, price_decimals = float_units(limit_price)
+        factor_units, factor_decimals = float_units(self.limit_factor)
+        pair_decimals = self.pair.pair_decimals
+        orders = []
+        for offset in self.ladder:
+            offset_units, offset_decimals = float_units(offset)
+            rung_factor = 10**offset_decimals - offset_units
+            rung_price = rescale_units(
+                price_units * rung_factor,
+                price_decimals + offset_decimals,
+                pair_decimals,
+            )
+            rung_limit_factor = rescale_units(
+                factor_units * rung_factor,
+                factor_decimals + offset_decimals,
+                5,
+            )
+            orders.append(
+                Order.buy_limit_order(
+                    self.user_name,
+                    current_date,
+                    self.pair.name,
+                    rung_amount / 10**quote_decimals,
+                    rung_price / 10**pair_decimals,
+                    self.pair.lot_decimals,
+                    quote_decimals,
+                    rung_limit_factor / 10**5,
+                )
+            )
+        return orders
 
     def get_limit_price(
         self, pair_ask_price: float, pair_decimals: int
@@ -130,8 +179,15 @@ class DCA:
         if round(self.limit_factor, 5) == 1.0:
             limit_price = pair_ask_price
         else:
-            limit_price = round(
-                pair_ask_price * self.limit_factor, pair_decimals
+            price_units, price_decimals = float_units(pair_ask_price)
+            factor_units, factor_decimals = float_units(self.limit_factor)
+            limit_price = (
+                rescale_units(
+                    price_units * factor_units,
+                    price_decimals + factor_decimals,
+                    pair_decimals,
+                )
+                / 10**pair_decimals
             )
             print(
                 f"Factor adjusted limit price ({self.limit_factor:.4f})"
@@ -139,36 +195,15 @@ class DCA:
             )
         return limit_price
 
-    def get_system_time(self) -> datetime:
-        """
-        Compare system and Kraken time.
-        Raise an error if too much difference (> 2sc).
-
-        :return: datetime object of current system time
+    def check_balance(self, balance: Dict[str, Any]) -> None:
         """
-        kraken_time: int = self.ka.get_time()
-        kraken_date: datetime = utc_unix_time_datetime(kraken_time)
-        current_date: datetime = current_utc_datetime()
-        print(f"It's {kraken_date} on Kraken, {current_date} on system.")
-        lag_in_seconds: float = (current_date - kraken_date).seconds
-        if lag_in_seconds > 2:
-            raise OSError(
-                "Too much lag -> Check your internet connection speed "
-                "or synchronize your system time."
-            )
-        return current_date
-
-    def check_account_balance(self) -> None:
-        """
-        Check account trade balance, pair base and pair quote balances.
+        Print pair base and pair quote balances.
         Raise an error if quote pair balance
         is too low to DCA specified amount.
 
+        :param balance: Account balance per asset.
         :return: None
         """
-        trade_balance = self.ka.get_trade_balance().get("eb")
-        print(f"Current trade balance: {trade_balance} ZUSD.")
-        balance = self.ka.get_balance()
         try:
             pair_base_balance = float(balance.get(self.pair.base))
         # No pair base balance on Kraken account.
@@ -189,36 +224,45 @@ class DCA:
                 f"{self.pair.quote} of {self.pair.base}"
             )
 
-    def count_pair_daily_orders(self) -> int:
+    def daily_orders_start(self, current_date: datetime = None) -> int:
         """
-        Count current day open and closed orders for the DCA pair.
+        Return the start of the DCA delay window, orders opened since
+        then count as today's orders.
 
+        :param current_date: Current date, defaults to system time.
+        :return: Unix time of the window start.
+        """
+        if current_date is None:
+            current_day = current_utc_day_datetime()
+        else:
+            current_day = current_date.replace(
+                hour=0, minute=0, second=0, microsecond=0
+            )
+        start_day_datetime = current_day - timedelta(days=self.delay - 1)
+        return datetime_as_utc_unix(start_day_datetime)
+
+    def count_daily_orders(
+        self, open_orders: dict, closed_orders: dict
+    ) -> int:
+        """
+        Count the DCA pair orders of open and daily closed orders.
+
+        :param open_orders: Open orders as dictionary.
+        :param closed_orders: Closed orders of the DCA delay window.
         :return: Count of daily orders for the dollar cost averaged pair.
         """
-        # Get current open orders.
-        open_orders = self.ka.get_open_orders()
         daily_open_orders = len(
             self.extract_pair_orders(
                 open_orders, self.pair.name, self.pair.alt_name
             )
         )
-
-        # Get daily closed orders.
-        start_day_datetime = current_utc_day_datetime() - timedelta(
-            days=self.delay - 1
-        )
-        start_day_unix = datetime_as_utc_unix(start_day_datetime)
-        closed_orders = self.ka.get_closed_orders(
-            {"start": start_day_unix, "closetime": "open"}
-        )
         daily_closed_orders = len(
             self.extract_pair_orders(
                 closed_orders, self.pair.name, self.pair.alt_name
             )
         )
         # Sum the count of closed and daily open orders for the DCA pair.
-        pair_daily_orders = daily_closed_orders + daily_open_orders
-        return pair_daily_orders
+        return daily_closed_orders + daily_open_orders
 
     @staticmethod
     def extract_pair_orders(
@@ -241,18 +285,14 @@ class DCA:
         }
         return pair_orders
 
-    def send_buy_limit_order(self, order: Order) -> None:
+    def print_order_information(self, order: Order) -> None:
         """
-        Send a limit order for specified dca pair and amount to Kraken.
+        Check order volume and print the order about to be sent.
 
-        :return: None.
+        :param order: Order object.
+        :return: None
         """
-        if order.volume < self.pair.order_min:
-            raise ValueError(
-                f"Too low volume to buy {self.pair.base}: "
-                f"current {order.volume}, "
-                f"minimum {self.pair.order_min}."
-            )
+        self.check_order_volume(order)
         print(
             f"Create a {order.price}{self.pair.quote} buy limit order of "
             f"{order.volume}{self.pair.base} at "
@@ -263,7 +303,47 @@ class DCA:
             f"Total price expected: {order.volume}{self.pair.base} for "
             f"{order.total_price}{self.pair.quote}."
         )
-        order.send_order(self.ka)
+
+    @staticmethod
+    def print_order_result(order: Order) -> None:
+        """
+        Print TXID and description of a sent order.
+
+        :param order: Order object.
+        :return: None
+        """
         print("Order successfully created.")
         print(f"TXID: {order.txid}")
         print(f"Description: {order.description}")
+
+    def check_order_volume(self, order: Order) -> None:
+        """
+        Raise an error if order volume is lower than pair minimum volume.
+
+        :param order: Order object.
+        :return: None
+        """
+        if order.volume < self.pair.order_min:
+            raise ValueError(
+                f"Too low volume to buy {self.pair.base}: "
+                f"current {order.volume}, "
+                f"minimum {self.pair.order_min}."
+            )
+
+
+def checked_system_time(ka: KrakenApi) -> datetime:
+    """
+    Compare system and Kraken time.
+    Raise an error if too much difference (> 2sc).
+
+    :param ka: KrakenApi object.
+    :return: datetime object of current system time
+    """
+    kraken_time: int = ka.get_time()
+    kraken_date: datetime = utc_unix_time_datetime(kraken_time)
+    current_date: datetime = current_utc_datetime()
+    print(f"It's {kraken_date} on Kraken, {current_date} on system.")
+    lag_in_seconds: float = (current_date - kraken_date).total_seconds()
+    if abs(lag_in_seconds) > MAX_LAG:
+        raise OSError(LAG_ERROR_MSG)
+    return current_date
@@ -0,0 +1,173 @@
+"""DCA pairs due-date index module."""
+import json
+import os
+from pathlib import Path
+from typing import Dict, Optional, Set
+
+import boto3
+
+from .metrics import METRICS
+
+DUE_INDEX_ENV: str = "KRAKEN_DCA_DUE_INDEX"
+DYNAMODB_PREFIX: str = "dynamodb:"
+
+
+class DueIndex:
+    """
+    Last order time of each account pair, as seen on Kraken, to skip
+    pairs that can't be due without calling Kraken private API.
+    Entries of an account are loaded on first use and stored by save().
+    """
+
+    last_orders: Dict[str, Dict[str, int]]
+    modified: Set[str]
+
+    def __init__(self) -> None:
+        self.last_orders = {}
+        self.modified = set()
+
+    @staticmethod
+    def from_environment() -> Optional["DueIndex"]:
+        """
+        Return the index set by KRAKEN_DCA_DUE_INDEX: a JSON file path,
+        or "dynamodb:<table>" for a DynamoDB table keyed by user_name.
+
+        :return: DueIndex object, None if not set.
+        """
+        setting = os.environ.get(DUE_INDEX_ENV)
+        if not setting:
+            return None
+        if setting.startswith(DYNAMODB_PREFIX):
+            table_name = setting.replace(DYNAMODB_PREFIX, "", 1)
+            return DynamoDueIndex(table_name)
+        return FileDueIndex(setting)
+
+    def entries(self, user_name: str) -> Dict[str, int]:
+        if user_name not in self.last_orders:
+            self.last_orders[user_name] = self.load(user_name)
+        return self.last_orders[user_name]
+
+    def last_order_time(self, user_name: str, pair: str) -> Optional[int]:
+        """
+        Return the time of the last known order of an account pair.
+
+        :param user_name: Account user name.
+        :param pair: Pair name.
+        :return: Unix time, None if unknown.
+        """
+        return self.entries(user_name).get(pair)
+
+    def record(self, user_name: str, pair: str, order_time: float) -> None:
+        """
+        Record an order of an account pair, kept if it is the last one.
+
+        :param user_name: Account user name.
+        :param pair: Pair name.
+        :param order_time: Unix time of the order.
+        :return: None
+        """
+        entries = self.entries(user_name)
+        if int(order_time) > entries.get(pair, 0):
+            entries[pair] = int(order_time)
+            self.modified.add(user_name)
+
+    def discard(self, user_name: str, pair: str) -> None:
+        """
+        Remove a suspect entry, the pair is checked on Kraken again.
+
+        :param user_name: Account user name.
+        :param pair: Pair name.
+        :return: None
+        """
+        if self.entries(user_name).pop(pair, None) is not None:
+            self.modified.add(user_name)
+
+    def save(self) -> None:
+        """
+        Store the modified accounts entries.
+
+        :return: None
+        """
+        for user_name in sorted(self.modified):
+            self.store(user_name, self.last_orders[user_name])
+        self.modified.clear()
+
+    def load(self, user_name: str) -> Dict[str, int]:
+        raise NotImplementedError
+
+    def store(self, user_name: str, entries: Dict[str, int]) -> None:
+        raise NotImplementedError
+
+
+class FileDueIndex(DueIndex):
+    """
+    Due-date index of every account in a local JSON file.
+    """
+
+    path: Path
+
+    def __init__(self, path: str) -> None:
+        """
+        Initialize the FileDueIndex object.
+
+        :param path: JSON file path, created on first save.
+        """
+        super().__init__()
+        self.path = Path(path)
+
+    def read(self) -> Dict[str, Dict[str, int]]:
+        try:
+            with open(self.path, "r") as stream:
+                index = json.load(stream)
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            print(f"Due index {self.path} unreadable, checking Kraken.")
+            return {}
+        return index if isinstance(index, dict) else {}
+
+    def load(self, user_name: str) -> Dict[str, int]:
+        return dict(self.read().get(user_name) or {})
+
+    def store(self, user_name: str, entries: Dict[str, int]) -> None:
+        index = self.read()
+        index[user_name] = entries
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = self.path.with_name(self.path.name + ".tmp")
+        with open(temporary_path, "w") as stream:
+            json.dump(index, stream, sort_keys=True)
+        os.replace(temporary_path, self.path)
+
+
+class DynamoDueIndex(DueIndex):
+    """
+    Due-date index with one DynamoDB item per account, keyed by
+    user_name.
+    """
+
+    table_name: str
+
+    def __init__(self, table_name: str) -> None:
+        """
+        Initialize the DynamoDueIndex object.
+
+        :param table_name: DynamoDB table name.
+        """
+        super().__init__()
+        self.table_name = table_name
+
+    def table(self):
+        client = boto3.resource("dynamodb", region_name="us-east-1")
+        return client.Table(self.table_name)
+
+    def load(self, user_name: str) -> Dict[str, int]:
+        with METRICS.timed("dynamodb", "GetItem"):
+            response = self.table().get_item(Key={"user_name": user_name})
+        last_orders = response.get("Item", {}).get("last_orders", {})
+        return {pair: int(value) for pair, value in last_orders.items()}
+
+    def store(self, user_name: str, entries: Dict[str, int]) -> None:
+        with METRICS.timed("dynamodb", "PutItem"):
+            self.table().put_item(
+                Item={"user_name": user_name, "last_orders": entries}
+            )
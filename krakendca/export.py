@@ -0,0 +1,291 @@
+"""
+Order history export module.
+
+Orders are read page by page from the DynamoDB orders table, or line by
+line from an order history CSV file, and written chunk by chunk so that
+memory doesn't grow with the history size.
+
+Usage, from the repository root:
+    python -m krakendca.export orders.parquet --format parquet
+    python -m krakendca.export orders.ndjson --user user_X --pair XETHZEUR
+    python -m krakendca.export orders.csv --start 2022-01-01 \
+        --endpoint-url http://localhost:8000
+"""
+import argparse
+import csv
+import json
+import sys
+from datetime import datetime
+from decimal import Decimal
+from itertools import islice
+from typing import IO, Any, Dict, Iterable, Iterator, List, Mapping, Optional
+
+import boto3
+from boto3.dynamodb.conditions import Attr
+
+from .metrics import METRICS
+from .order import AMOUNT_FIELDS, CSV_FIELDS
+
+EXPORT_FORMATS = ("csv", "ndjson", "parquet")
+CHUNK_SIZE: int = 1000
+# Parquet amount scale, above the 17 decimals of an exact float amount.
+PARQUET_DECIMALS: int = 18
+
+Row = Dict[str, str]
+
+
+def scan_rows(
+    orders_table: str,
+    user: Optional[str] = None,
+    pair: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    page_size: int = CHUNK_SIZE,
+    endpoint_url: Optional[str] = None,
+    region: str = "us-east-1",
+) -> Iterator[Row]:
+    """
+    Yield the order items of the DynamoDB orders table as order history
+    rows, one Scan page at a time. Filters are applied by DynamoDB.
+
+    :param orders_table: DynamoDB orders table name.
+    :param user: User name, all users if None.
+    :param pair: Pair name, all pairs if None.
+    :param start: First date included, unbounded if None.
+    :param end: Last date excluded, unbounded if None.
+    :param page_size: Maximum number of items read per Scan call.
+    :param endpoint_url: DynamoDB endpoint, e.g. DynamoDB Local.
+    :param region: AWS region of the table.
+    :return: Iterator of CSV_FIELDS rows.
+    """
+    client = boto3.resource(
+        "dynamodb", region_name=region, endpoint_url=endpoint_url
+    )
+    table = client.Table(orders_table)
+    scan_inputs: Dict[str, Any] = {"Limit": page_size}
+    conditions = []
+    if user is not None:
+        conditions.append(Attr("user_name").eq(user))
+    if pair is not None:
+        conditions.append(Attr("pair").eq(pair))
+    # Dates are saved as str(datetime), ordered as text.
+    if start is not None:
+        conditions.append(Attr("date").gte(str(start)))
+    if end is not None:
+        conditions.append(Attr("date").lt(str(end)))
+    if conditions:
+        condition = conditions[0]
+        for other in conditions[1:]:
+            condition = condition & other
+        scan_inputs["FilterExpression"] = condition
+    while True:
+        with METRICS.timed("dynamodb", "Scan"):
+            response = table.scan(**scan_inputs)
+        for item in response.get("Items", []):
+            yield item_row(item)
+        if "LastEvaluatedKey" not in response:
+            return
+        scan_inputs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def ledger_rows(
+    csv_file: IO[str],
+    user: Optional[str] = None,
+    pair: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> Iterator[Row]:
+    """
+    Yield the rows of an order history CSV file matching the filters.
+
+    :param csv_file: Order history CSV file, opened with newline="".
+    :param user: User name, all users if None.
+    :param pair: Pair name, all pairs if None.
+    :param start: First date included, unbounded if None.
+    :param end: Last date excluded, unbounded if None.
+    :return: Iterator of CSV_FIELDS rows.
+    """
+    for row in csv.DictReader(csv_file):
+        if user is not None and row.get("user_name") != user:
+            continue
+        if pair is not None and row["pair"] != pair:
+            continue
+        if start is not None and row["date"] < str(start):
+            continue
+        if end is not None and row["date"] >= str(end):
+            continue
+        yield {key: row.get(key) or "" for key in CSV_FIELDS}
+
+
+def item_row(item: Mapping[str, Any]) -> Row:
+    """
+    Return an order item as an order history row, amounts written in
+    fixed-point notation and missing attributes as empty strings.
+
+    :param item: Order item.
+    :return: Dict of CSV_FIELDS values as strings.
+    """
+    row = {}
+    for key in CSV_FIELDS:
+        value = item.get(key)
+        if value is None:
+            row[key] = ""
+        elif isinstance(value, Decimal):
+            row[key] = format(value, "f")
+        else:
+            row[key] = str(value)
+    return row
+
+
+def chunked(rows: Iterable[Row], chunk_size: int) -> Iterator[List[Row]]:
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def export_rows(
+    rows: Iterable[Row],
+    output: str,
+    export_format: str = "csv",
+    chunk_size: int = CHUNK_SIZE,
+) -> int:
+    """
+    Write order history rows to a file, chunk by chunk: a Parquet row
+    group, or a block of CSV or NDJSON lines, per chunk.
+
+    :param rows: Iterable of CSV_FIELDS rows.
+    :param output: Output file path.
+    :param export_format: One of EXPORT_FORMATS.
+    :param chunk_size: Number of rows held in memory.
+    :return: Number of rows written.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(
+            f"Export format must be one of {', '.join(EXPORT_FORMATS)}."
+        )
+    chunks = chunked(rows, chunk_size)
+    if export_format == "parquet":
+        return write_parquet(chunks, output)
+    count = 0
+    with open(output, "w", newline="") as output_file:
+        if export_format == "csv":
+            writer = csv.DictWriter(output_file, fieldnames=CSV_FIELDS)
+            writer.writeheader()
+        for chunk in chunks:
+            if export_format == "csv":
+                writer.writerows(chunk)
+            else:
+                output_file.writelines(json.dumps(row) + "\n" for row in chunk)
+            count += len(chunk)
+    return count
+
+
+def write_parquet(chunks: Iterable[List[Row]], output: str) -> int:
+    """
+    Write chunks of rows as Parquet row groups: dates as timestamps,
+    amounts as decimals and other columns as strings, null if empty.
+
+    :param chunks: Iterable of lists of CSV_FIELDS rows.
+    :param output: Output file path.
+    :return: Number of rows written.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    decimal_type = pa.decimal128(38, PARQUET_DECIMALS)
+    decimal_fields = AMOUNT_FIELDS + ("limit_factor",)
+    fields = []
+    for key in CSV_FIELDS:
+        if key == "date":
+            fields.append(pa.field(key, pa.timestamp("us")))
+        elif key in decimal_fields:
+            fields.append(pa.field(key, decimal_type))
+        else:
+            fields.append(pa.field(key, pa.string()))
+    schema = pa.schema(fields)
+    count = 0
+    with pq.ParquetWriter(output, schema) as writer:
+        for chunk in chunks:
+            columns = {}
+            for key in CSV_FIELDS:
+                if key == "date":
+                    columns[key] = [
+                        datetime.fromisoformat(row[key]) for row in chunk
+                    ]
+                elif key in decimal_fields:
+                    columns[key] = [
+                        Decimal(row[key]) if row[key] else None
+                        for row in chunk
+                    ]
+                else:
+                    columns[key] = [row[key] or None for row in chunk]
+            writer.write_table(pa.table(columns, schema=schema))
+            count += len(chunk)
+    return count
+
+
+def parse_date(value: str) -> datetime:
+    return datetime.fromisoformat(value)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Export Kraken DCA order history."
+    )
+    parser.add_argument("output", help="Output file path.")
+    parser.add_argument(
+        "--format",
+        choices=EXPORT_FORMATS,
+        help="Output format, from the output file extension by default.",
+    )
+    parser.add_argument("--user", help="Only export orders of this user.")
+    parser.add_argument("--pair", help="Only export orders of this pair.")
+    parser.add_argument(
+        "--start", type=parse_date, help="First date included, ISO format."
+    )
+    parser.add_argument(
+        "--end", type=parse_date, help="Last date excluded, ISO format."
+    )
+    parser.add_argument(
+        "--ledger",
+        help="Read this order history CSV file instead of DynamoDB.",
+    )
+    parser.add_argument("--orders-table", default="kraken-dca")
+    parser.add_argument(
+        "--endpoint-url", help="DynamoDB endpoint, e.g. DynamoDB Local."
+    )
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    export_format = args.format or args.output.rsplit(".", 1)[-1]
+    filters = {
+        "user": args.user,
+        "pair": args.pair,
+        "start": args.start,
+        "end": args.end,
+    }
+    if args.ledger:
+        with open(args.ledger, newline="") as csv_file:
+            count = export_rows(
+                ledger_rows(csv_file, **filters),
+                args.output,
+                export_format,
+                args.chunk_size,
+            )
+    else:
+        rows = scan_rows(
+            args.orders_table,
+            page_size=args.chunk_size,
+            endpoint_url=args.endpoint_url,
+            **filters,
+        )
+        count = export_rows(rows, args.output, export_format, args.chunk_size)
+    print(f"{count} orders exported to {args.output}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,266 @@
+"""Coordinator and workers fan-out execution module."""
+import json
+import time
+from concurrent.futures import (
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import boto3
+
+from . import tracing
+from .api import KrakenClient
+from .config import Config
+from .daemon import CONFIG_GLOB
+from .due_index import DueIndex
+from .krakendca import KrakenDCA
+from .metrics import METRICS, metric_labels
+
+WORKER_FUNCTION_ENV: str = "KRAKEN_DCA_WORKER_FUNCTION"
+MAX_ATTEMPTS: int = 2
+
+
+class Shard:
+    """
+    Unit of work sent to a worker: the pairs of one account, all of them
+    or a group of pair indexes.
+    """
+
+    config_file: str
+    pairs: Optional[List[int]]
+    attempt: int
+
+    def __init__(
+        self,
+        config_file: str,
+        pairs: Optional[List[int]] = None,
+        attempt: int = 1,
+    ) -> None:
+        """
+        Initialize the Shard object.
+
+        :param config_file: Configuration file name.
+        :param pairs: Indexes of the account DCA pairs, all if None.
+        :param attempt: Attempt number of the shard.
+        """
+        self.config_file = config_file
+        self.pairs = pairs
+        self.attempt = attempt
+
+    def __str__(self) -> str:
+        if self.pairs is None:
+            return self.config_file
+        return f"{self.config_file}[{','.join(map(str, self.pairs))}]"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "config_file": self.config_file,
+            "pairs": self.pairs,
+            "attempt": self.attempt,
+        }
+
+    @classmethod
+    def from_dict(cls, shard: Dict[str, Any]) -> "Shard":
+        return cls(shard["config_file"], shard.get("pairs"), shard["attempt"])
+
+
+def plan_shards(
+    config_directory: Path, pairs_per_shard: Optional[int] = None
+) -> List[Shard]:
+    """
+    Split the work of the configuration files by account, or by groups
+    of pairs_per_shard pairs of an account. Pairs of an account in
+    different shards are planned with separate balance snapshots and
+    send orders concurrently with the same API key.
+
+    :param config_directory: Directory of config*.yaml files.
+    :param pairs_per_shard: Maximum number of pairs per shard, None to
+    keep the pairs of an account together.
+    :return: List of Shard objects.
+    """
+    shards = []
+    for config_file in sorted(Path(config_directory).glob(CONFIG_GLOB)):
+        config = Config(config_file)
+        if config.api_user_name == "KRAKEN_USER_NAME":
+            continue
+        if pairs_per_shard is None:
+            shards.append(Shard(config_file.name))
+            continue
+        indexes = list(range(len(config.dca_pairs)))
+        for start in range(0, len(indexes), pairs_per_shard):
+            end = start + pairs_per_shard
+            shards.append(Shard(config_file.name, indexes[start:end]))
+    return shards
+
+
+def run_shard(
+    shard: Dict[str, Any], config_directory: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Worker: run the pairs of a shard and report the result instead of
+    raising, so that the coordinator can retry failed shards.
+
+    :param shard: Shard as dict.
+    :param config_directory: Directory of the configuration files.
+    :return: Shard result as dict with error and executed plan JSON.
+    """
+    shard = Shard.from_dict(shard)
+    config_file = Path(config_directory or ".") / shard.config_file
+    result = {"shard": shard.to_dict(), "error": None, "plan": None}
+    try:
+        config = Config(config_file)
+        if shard.pairs is not None:
+            config.dca_pairs = [config.dca_pairs[i] for i in shard.pairs]
+        ka = KrakenClient(config.api_public_key, config.api_private_key)
+        with metric_labels(account=config.api_user_name), tracing.span(
+            "dca.account", str(shard)
+        ):
+            kdca = KrakenDCA(config, ka, due_index=DueIndex.from_environment())
+            kdca.initialize_pairs_dca()
+            plan = kdca.handle_pairs_dca()
+        if plan is not None:
+            result["plan"] = plan.to_json()
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+
+class LocalExecutor:
+    """
+    Workers of the machine: a process pool, or a thread pool.
+    """
+
+    def __init__(
+        self,
+        config_directory: Path,
+        max_workers: int,
+        processes: bool = True,
+        worker: Callable[..., Dict[str, Any]] = run_shard,
+        mp_context: Any = None,
+    ) -> None:
+        """
+        Initialize the LocalExecutor object.
+
+        :param config_directory: Directory of the configuration files.
+        :param max_workers: Number of workers.
+        :param processes: Run workers in processes rather than threads.
+        :param worker: Worker function of a shard dict.
+        :param mp_context: Multiprocessing context of the process pool.
+        """
+        self.config_directory = str(config_directory)
+        self.worker = worker
+        self.pool: Executor
+        if processes:
+            self.pool = ProcessPoolExecutor(max_workers, mp_context)
+        else:
+            self.pool = ThreadPoolExecutor(max_workers)
+
+    def submit(self, shard: Shard) -> Future:
+        return self.pool.submit(
+            self.worker, shard.to_dict(), self.config_directory
+        )
+
+    def shutdown(self) -> None:
+        self.pool.shutdown()
+
+
+class LambdaExecutor:
+    """
+    Workers as Lambda invocations of a worker function, answering with
+    the shard result. Invocations run concurrently from threads.
+    """
+
+    def __init__(
+        self, function_name: str, max_workers: int, client: Any = None
+    ) -> None:
+        """
+        Initialize the LambdaExecutor object.
+
+        :param function_name: Worker Lambda function name.
+        :param max_workers: Number of concurrent invocations.
+        :param client: boto3 Lambda client.
+        """
+        if client is None:
+            client = boto3.client("lambda", region_name="us-east-1")
+        self.function_name = function_name
+        self.client = client
+        self.pool = ThreadPoolExecutor(max_workers)
+
+    def invoke(self, shard: Dict[str, Any]) -> Dict[str, Any]:
+        with METRICS.timed("lambda", "Invoke"):
+            response = self.client.invoke(
+                FunctionName=self.function_name,
+                InvocationType="RequestResponse",
+                Payload=json.dumps(shard).encode(),
+            )
+        payload = json.loads(response["Payload"].read())
+        if response.get("FunctionError"):
+            # Worker crashed, e.g. timeout or out of memory.
+            return {
+                "shard": shard,
+                "error": f"{response['FunctionError']}: "
+                f"{payload.get('errorMessage', payload)}",
+                "plan": None,
+            }
+        return payload
+
+    def submit(self, shard: Shard) -> Future:
+        return self.pool.submit(self.invoke, shard.to_dict())
+
+    def shutdown(self) -> None:
+        self.pool.shutdown()
+
+
+def coordinate(
+    shards: List[Shard], executor: Any, max_attempts: int = MAX_ATTEMPTS
+) -> List[Dict[str, Any]]:
+    """
+    Send shards to workers and retry failed shards, failures of a shard
+    don't stop the others.
+
+    :param shards: Shard objects.
+    :param executor: LocalExecutor or LambdaExecutor object.
+    :param max_attempts: Maximum number of attempts per shard.
+    :return: Last result of each shard, in shards order.
+    """
+    results: Dict[int, Dict[str, Any]] = {}
+    pending = {position: shard for position, shard in enumerate(shards)}
+    start = time.perf_counter()
+    while pending:
+        futures = {
+            position: executor.submit(shard)
+            for position, shard in pending.items()
+        }
+        retries = {}
+        for position, future in futures.items():
+            shard = pending[position]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {
+                    "shard": shard.to_dict(),
+                    "error": f"{type(e).__name__}: {e}",
+                    "plan": None,
+                }
+            results[position] = result
+            if result["error"] is None:
+                continue
+            print(
+                f"Shard {shard} failed (attempt {shard.attempt}): "
+                f"{result['error']}."
+            )
+            if shard.attempt < max_attempts:
+                retries[position] = Shard(
+                    shard.config_file, shard.pairs, shard.attempt + 1
+                )
+        pending = retries
+    failed = sum(1 for result in results.values() if result["error"])
+    print(
+        f"{len(shards)} shards done in {time.perf_counter() - start:.2f}sc, "
+        f"{failed} failed."
+    )
+    return [results[position] for position in range(len(shards))]
@@ -0,0 +1,218 @@
+"""Orders fill status tracking module."""
+import math
+from collections import defaultdict
+from decimal import Decimal
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import boto3
+from boto3.dynamodb.conditions import Attr
+
+from .api import QUERY_ORDERS_MAX_TXIDS, KrakenClient
+from .metrics import METRICS
+
+# Kraken order statuses which can't change anymore.
+FINAL_STATUSES: Tuple[str, ...] = ("closed", "canceled", "expired")
+PERCENTILES: Tuple[int, ...] = (50, 90, 99)
+# Attributes of the order item updated from Kraken, by Kraken key.
+FILL_ATTRIBUTES: Dict[str, str] = {
+    "status": "status",
+    "vol_exec": "vol_exec",
+    "cost": "cost_exec",
+    "fee": "fee_exec",
+    "opentm": "open_time",
+    "closetm": "close_time",
+}
+
+FillKey = Tuple[str, Optional[Decimal]]
+
+
+class FillTracker:
+    """
+    Follow the orders of an account saved in DynamoDB until Kraken
+    closes them: unfilled orders are queried by batches and their items
+    updated with executed volume, cost, fee and close time.
+    """
+
+    user_name: str
+    ka: KrakenClient
+    orders_table: str
+
+    def __init__(
+        self, user_name: str, ka: KrakenClient, orders_table: str
+    ) -> None:
+        """
+        Initialize the FillTracker object.
+
+        :param user_name: Account user name of the orders.
+        :param ka: KrakenClient object of the account.
+        :param orders_table: DynamoDB orders table name.
+        """
+        self.user_name = user_name
+        self.ka = ka
+        self.orders_table = orders_table
+
+    def table(self):
+        client = boto3.resource("dynamodb", region_name="us-east-1")
+        return client.Table(self.orders_table)
+
+    def stored_orders(self) -> List[Dict[str, Any]]:
+        """
+        Return every order item of the account, page by page.
+
+        :return: List of order items.
+        """
+        table = self.table()
+        scan_inputs = {
+            "FilterExpression": Attr("user_name").eq(self.user_name)
+        }
+        items = []
+        while True:
+            with METRICS.timed("dynamodb", "Scan"):
+                response = table.scan(**scan_inputs)
+            items.extend(response.get("Items", []))
+            if "LastEvaluatedKey" not in response:
+                return items
+            scan_inputs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    def query_orders(self, txids: List[str]) -> Iterator[Dict[str, dict]]:
+        """
+        Query orders on Kraken by batches of QUERY_ORDERS_MAX_TXIDS.
+
+        :param txids: List of order transaction ids.
+        :return: Iterator of dicts of orders with txid as the key.
+        """
+        for start in range(0, len(txids), QUERY_ORDERS_MAX_TXIDS):
+            end = start + QUERY_ORDERS_MAX_TXIDS
+            yield self.ka.query_orders(txids[start:end])
+
+    def track(self) -> List[Dict[str, Any]]:
+        """
+        Update the items of unfilled orders from Kraken.
+
+        :return: List of every order item, updated.
+        """
+        items = self.stored_orders()
+        unfilled = {
+            item["txid"]: item
+            for item in items
+            if "txid" in item and item.get("status") not in FINAL_STATUSES
+        }
+        updated = 0
+        for orders in self.query_orders(sorted(unfilled)):
+            for txid, order in orders.items():
+                changes = fill_changes(unfilled[txid], order)
+                if changes and self.update_order(txid, changes):
+                    unfilled[txid].update(changes)
+                    updated += 1
+        print(
+            f"{len(unfilled)} unfilled orders of {self.user_name} checked, "
+            f"{updated} updated."
+        )
+        return items
+
+    def update_order(self, txid: str, changes: Dict[str, Any]) -> bool:
+        """
+        Update an order item, unless its status became final meanwhile,
+        e.g. updated by another tracker.
+
+        :param txid: Order transaction id.
+        :param changes: Attributes to set.
+        :return: True if the item was updated.
+        """
+        names = {f"#{key}": key for key in changes}
+        values = {f":{key}": value for key, value in changes.items()}
+        values.update({f":{status}": status for status in FINAL_STATUSES})
+        final_statuses = ", ".join(f":{status}" for status in FINAL_STATUSES)
+        names["#status"] = "status"
+        table = self.table()
+        try:
+            with METRICS.timed("dynamodb", "UpdateItem"):
+                table.update_item(
+                    Key={"txid": txid},
+                    UpdateExpression="SET "
+                    + ", ".join(f"#{key} = :{key}" for key in changes),
+                    ConditionExpression="attribute_exists(txid) AND ("
+                    "attribute_not_exists(#status) OR NOT #status IN "
+                    f"({final_statuses}))",
+                    ExpressionAttributeNames=names,
+                    ExpressionAttributeValues=values,
+                )
+        except table.meta.client.exceptions.ConditionalCheckFailedException:
+            return False
+        return True
+
+
+def fill_changes(item: Dict[str, Any], order: dict) -> Dict[str, Any]:
+    """
+    Return the attributes of an order item to update from the Kraken
+    order, empty if it didn't change.
+
+    :param item: Order item.
+    :param order: Kraken order as dict.
+    :return: Dict of attributes to set.
+    """
+    if order.get("status") == item.get("status") and Decimal(
+        order.get("vol_exec", 0)
+    ) == item.get("vol_exec"):
+        return {}
+    changes = {}
+    for key, attribute in FILL_ATTRIBUTES.items():
+        if order.get(key) is None:
+            continue
+        if key == "status":
+            changes[attribute] = order[key]
+        else:
+            changes[attribute] = Decimal(str(order[key]))
+    return changes
+
+
+def percentile(values: List[float], rank: int) -> float:
+    """
+    Return the nearest-rank percentile of sorted values.
+
+    :param values: Sorted list of values.
+    :param rank: Percentile rank, from 1 to 100.
+    :return: Percentile value.
+    """
+    index = max(math.ceil(rank / 100 * len(values)) - 1, 0)
+    return values[index]
+
+
+def fill_times(items: List[Dict[str, Any]]) -> Dict[FillKey, List[float]]:
+    """
+    Return the sorted times to fill, from open to close time, of the
+    filled orders by pair and limit factor.
+
+    :param items: List of order items.
+    :return: Dict of fill times in seconds by (pair, limit factor), the
+    limit factor is None for orders saved without it.
+    """
+    times: Dict[FillKey, List[float]] = defaultdict(list)
+    for item in items:
+        if item.get("status") != "closed" or not item.get("vol_exec"):
+            continue
+        key = (item["pair"], item.get("limit_factor"))
+        times[key].append(float(item["close_time"] - item["open_time"]))
+    for values in times.values():
+        values.sort()
+    return dict(times)
+
+
+def print_fill_report(times: Dict[FillKey, List[float]]) -> None:
+    """
+    Print time-to-fill percentiles by pair and limit factor.
+
+    :param times: Dict returned by fill_times.
+    :return: None
+    """
+    for (pair, limit_factor), values in sorted(
+        times.items(), key=lambda entry: (entry[0][0], entry[0][1] or 0)
+    ):
+        factor = "unknown" if limit_factor is None else str(limit_factor)
+        ranks = ", ".join(
+            f"p{rank} {percentile(values, rank):.0f}sc" for rank in PERCENTILES
+        )
+        print(
+            f"Time to fill of {pair} (limit factor {factor}): {ranks} "
+            f"({len(values)} orders)."
+        )
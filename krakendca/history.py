@@ -0,0 +1,391 @@
+"""Columnar order history module."""
+from datetime import datetime
+from decimal import ROUND_HALF_EVEN, Decimal
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from .money import Money, float_to_units
+from .order import AMOUNT_FIELDS, Order
+
+# Fixed decimals of each amount column, stored as int64 units: up to
+# 9.2e8 in quote asset and 9.2e10 in base asset.
+AMOUNT_DECIMALS: Dict[str, int] = {
+    "pair_price": 10,
+    "volume": 8,
+    "price": 10,
+    "fee": 10,
+    "total_price": 10,
+}
+CODE_DTYPE = np.int32
+DATE_DTYPE = "datetime64[ns]"
+
+
+class OrderHistory:
+    """
+    Orders stored as typed column arrays, one row per order: user and
+    pair as categorical codes, dates as datetime64 and amounts as int64
+    fixed-point units at AMOUNT_DECIMALS.
+    Filters and aggregates are vectorized over the columns, selections
+    share the categories of the history they come from.
+    """
+
+    users: List[str]
+    pairs: List[str]
+    user_codes: np.ndarray
+    pair_codes: np.ndarray
+    dates: np.ndarray
+    amounts: Dict[str, np.ndarray]
+    txids: np.ndarray
+
+    def __init__(
+        self,
+        users: List[str],
+        pairs: List[str],
+        user_codes: np.ndarray,
+        pair_codes: np.ndarray,
+        dates: np.ndarray,
+        amounts: Dict[str, np.ndarray],
+        txids: np.ndarray,
+    ) -> None:
+        """
+        Initialize the OrderHistory object.
+
+        :param users: User names, indexed by user codes.
+        :param pairs: Pair names, indexed by pair codes.
+        :param user_codes: User code of each order.
+        :param pair_codes: Pair code of each order.
+        :param dates: Date of each order as datetime64.
+        :param amounts: Units of each order by AMOUNT_DECIMALS column.
+        :param txids: TXID of each order, None if unknown.
+        """
+        self.users = users
+        self.pairs = pairs
+        self.user_codes = user_codes
+        self.pair_codes = pair_codes
+        self.dates = dates
+        self.amounts = amounts
+        self.txids = txids
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    @classmethod
+    def from_columns(
+        cls,
+        users: Iterable[str],
+        pairs: Iterable[str],
+        dates: Iterable[Any],
+        amounts: Mapping[str, List[int]],
+        txids: Iterable[Optional[str]],
+    ) -> "OrderHistory":
+        """
+        Create a history from per-order values, user and pair names are
+        encoded as categorical codes.
+
+        :param users: User name of each order.
+        :param pairs: Pair name of each order.
+        :param dates: Date of each order, datetime or ISO string.
+        :param amounts: Units of each order by AMOUNT_DECIMALS column.
+        :param txids: TXID of each order.
+        :return: Instance of OrderHistory object.
+        """
+        user_categories, user_codes = encode_categories(users)
+        pair_categories, pair_codes = encode_categories(pairs)
+        return cls(
+            user_categories,
+            pair_categories,
+            user_codes,
+            pair_codes,
+            np.array(list(dates), dtype=DATE_DTYPE),
+            {
+                key: np.array(amounts[key], dtype=np.int64)
+                for key in AMOUNT_DECIMALS
+            },
+            np.array(list(txids), dtype=object),
+        )
+
+    @classmethod
+    def from_orders(cls, orders: Iterable[Order]) -> "OrderHistory":
+        """
+        Create a history from Order objects.
+
+        :param orders: Order objects.
+        :return: Instance of OrderHistory object.
+        """
+        orders = list(orders)
+        return cls.from_columns(
+            (order.user_name for order in orders),
+            (order.pair for order in orders),
+            (order.date for order in orders),
+            {
+                key: [
+                    float_to_units(getattr(order, key), decimals)
+                    for order in orders
+                ]
+                for key, decimals in AMOUNT_DECIMALS.items()
+            },
+            (getattr(order, "txid", None) for order in orders),
+        )
+
+    @classmethod
+    def from_items(cls, items: Iterable[Mapping[str, Any]]) -> "OrderHistory":
+        """
+        Create a history from DynamoDB order items, amounts converted
+        from their Decimal value without going through float.
+
+        :param items: Order items.
+        :return: Instance of OrderHistory object.
+        """
+        items = list(items)
+        return cls.from_columns(
+            (item["user_name"] for item in items),
+            (item["pair"] for item in items),
+            (item["date"] for item in items),
+            {
+                key: [decimal_units(item[key], decimals) for item in items]
+                for key, decimals in AMOUNT_DECIMALS.items()
+            },
+            (item.get("txid") for item in items),
+        )
+
+    def take(self, rows: np.ndarray) -> "OrderHistory":
+        """
+        Return the selected orders, sharing the categories.
+
+        :param rows: Boolean mask or indexes of the orders.
+        :return: OrderHistory object.
+        """
+        return OrderHistory(
+            self.users,
+            self.pairs,
+            self.user_codes[rows],
+            self.pair_codes[rows],
+            self.dates[rows],
+            {key: values[rows] for key, values in self.amounts.items()},
+            self.txids[rows],
+        )
+
+    def mask(
+        self,
+        user: Optional[str] = None,
+        pair: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> np.ndarray:
+        """
+        Return the mask of orders of a user, a pair and a date range.
+
+        :param user: User name, all users if None.
+        :param pair: Pair name, all pairs if None.
+        :param start: First date included, unbounded if None.
+        :param end: Last date excluded, unbounded if None.
+        :return: Boolean array.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if user is not None:
+            mask &= self.user_codes == category_code(self.users, user)
+        if pair is not None:
+            mask &= self.pair_codes == category_code(self.pairs, pair)
+        if start is not None:
+            mask &= self.dates >= np.datetime64(start, "ns")
+        if end is not None:
+            mask &= self.dates < np.datetime64(end, "ns")
+        return mask
+
+    def filter(
+        self,
+        user: Optional[str] = None,
+        pair: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> "OrderHistory":
+        """
+        Return the orders of a user, a pair and a date range.
+
+        :param user: User name, all users if None.
+        :param pair: Pair name, all pairs if None.
+        :param start: First date included, unbounded if None.
+        :param end: Last date excluded, unbounded if None.
+        :return: OrderHistory object.
+        """
+        return self.take(self.mask(user, pair, start, end))
+
+    def sort_by_date(self) -> "OrderHistory":
+        """
+        Return the orders sorted by date, keeping the order of orders
+        of the same date.
+
+        :return: OrderHistory object.
+        """
+        return self.take(np.argsort(self.dates, kind="stable"))
+
+    def group_codes(self, by: Tuple[str, ...]) -> np.ndarray:
+        """
+        Return a group code of each order, by pair, user or both.
+
+        :param by: Grouping columns, "user" and/or "pair".
+        :return: Group code array.
+        """
+        codes = np.zeros(len(self), dtype=np.int64)
+        for column in by:
+            if column == "user":
+                codes = codes * len(self.users) + self.user_codes
+            elif column == "pair":
+                codes = codes * len(self.pairs) + self.pair_codes
+            else:
+                raise ValueError(f"Unknown group column: {column}.")
+        return codes
+
+    def cumsum(
+        self, column: str, by: Tuple[str, ...] = ("pair",)
+    ) -> np.ndarray:
+        """
+        Return the running total of an amount column in date order,
+        per pair by default, aligned with the orders.
+
+        :param column: Amount column name.
+        :param by: Grouping columns, "user" and/or "pair".
+        :return: Running totals as int64 units.
+        """
+        groups = self.group_codes(by)
+        order = np.lexsort((self.dates, groups))
+        values = self.amounts[column][order]
+        totals = np.cumsum(values)
+        sorted_groups = groups[order]
+        # Index of the first row of the group of each row.
+        is_start = np.ones(len(self), dtype=bool)
+        is_start[1:] = sorted_groups[1:] != sorted_groups[:-1]
+        rows = np.arange(len(self))
+        starts = np.maximum.accumulate(np.where(is_start, rows, 0))
+        # Subtract the running total before the group start.
+        totals -= totals[starts] - values[starts]
+        result = np.empty_like(totals)
+        result[order] = totals
+        return result
+
+    def totals(self, column: str) -> Dict[str, Decimal]:
+        """
+        Return the total of an amount column per pair.
+
+        :param column: Amount column name.
+        :return: Dict of totals by pair name.
+        """
+        sums = np.zeros(len(self.pairs), dtype=np.int64)
+        np.add.at(sums, self.pair_codes, self.amounts[column])
+        decimals = AMOUNT_DECIMALS[column]
+        present = np.unique(self.pair_codes)
+        return {
+            self.pairs[code]: Money(int(sums[code]), decimals).to_decimal()
+            for code in present
+        }
+
+    def amount(self, column: str) -> np.ndarray:
+        """
+        Return an amount column as float64 values.
+
+        :param column: Amount column name.
+        :return: Float array.
+        """
+        return self.amounts[column] / 10 ** AMOUNT_DECIMALS[column]
+
+    def to_pandas(self, float_amounts: bool = True) -> Any:
+        """
+        Return the orders as a pandas DataFrame. User and pair columns
+        are categoricals over the code arrays, and dates and amount
+        units columns are not copied.
+
+        :param float_amounts: Convert amounts to float64, keep int64
+        units otherwise.
+        :return: pandas DataFrame.
+        """
+        import pandas as pd
+
+        columns = {
+            "user_name": pd.Categorical.from_codes(
+                self.user_codes, self.users
+            ),
+            "pair": pd.Categorical.from_codes(self.pair_codes, self.pairs),
+            "date": self.dates,
+        }
+        for key in AMOUNT_FIELDS:
+            if float_amounts:
+                columns[key] = self.amount(key)
+            else:
+                columns[key] = self.amounts[key]
+        columns["txid"] = self.txids
+        frame = pd.DataFrame(columns, copy=False)
+        if not float_amounts:
+            frame.attrs["decimals"] = dict(AMOUNT_DECIMALS)
+        return frame
+
+    def to_arrow(self) -> Any:
+        """
+        Return the orders as a pyarrow Table without copying the code,
+        date and amount units arrays. User and pair are dictionary
+        columns, amounts int64 units with their decimals as field
+        metadata.
+
+        :return: pyarrow Table.
+        """
+        import pyarrow as pa
+
+        arrays = [
+            pa.DictionaryArray.from_arrays(
+                pa.array(self.user_codes), pa.array(self.users, pa.string())
+            ),
+            pa.DictionaryArray.from_arrays(
+                pa.array(self.pair_codes), pa.array(self.pairs, pa.string())
+            ),
+            pa.array(self.dates),
+        ]
+        fields = [
+            pa.field("user_name", arrays[0].type),
+            pa.field("pair", arrays[1].type),
+            pa.field("date", arrays[2].type),
+        ]
+        for key in AMOUNT_FIELDS:
+            arrays.append(pa.array(self.amounts[key]))
+            fields.append(
+                pa.field(
+                    key,
+                    pa.int64(),
+                    metadata={"decimals": str(AMOUNT_DECIMALS[key])},
+                )
+            )
+        arrays.append(pa.array(self.txids, pa.string()))
+        fields.append(pa.field("txid", pa.string()))
+        return pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+
+
+def encode_categories(values: Iterable[str]) -> Tuple[List[str], np.ndarray]:
+    """
+    Encode values as codes into their categories, in first seen order.
+
+    :param values: Category of each row.
+    :return: Categories list and codes array.
+    """
+    categories: Dict[str, int] = {}
+    codes = [categories.setdefault(value, len(categories)) for value in values]
+    return list(categories), np.array(codes, dtype=CODE_DTYPE)
+
+
+def category_code(categories: List[str], value: str) -> int:
+    try:
+        return categories.index(value)
+    except ValueError:
+        # Unknown category, no order matches.
+        return -1
+
+
+def decimal_units(value: Any, decimals: int) -> int:
+    """
+    Return the units of a DynamoDB number at fixed decimals.
+
+    :param value: Decimal, or number.
+    :param decimals: Number of decimals of the units.
+    :return: Units as int.
+    """
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value))
+    return int(value.scaleb(decimals).to_integral_value(ROUND_HALF_EVEN))
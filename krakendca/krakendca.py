@@ -1,12 +1,26 @@
 """Main KrakenDCA object module."""
-import time
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 from krakenapi import KrakenApi
 
+from .api import KrakenClient
+from .clock import MAX_LAG, ClockService
 from .config import Config
 from .dca import DCA
+from .due_index import DueIndex
+from .metrics import metric_labels
 from .pair import Pair
+from .plan import (
+    DCAPlan,
+    MarketSnapshot,
+    PlannedOrder,
+    execute_plan,
+    plan_dcas,
+)
+from .store import OrderStore
+from .ticker import TickerFeed
+from .tracing import span
+from .utils import datetime_as_utc_unix
 
 
 class KrakenDCA:
@@ -17,18 +31,36 @@ class KrakenDCA:
     config: Config
     ka: KrakenApi
     dcas_list: List[DCA]
+    order_store: OrderStore
+    clock: ClockService
+    ticker: Optional[TickerFeed]
+    due_index: Optional[DueIndex]
 
-    def __init__(self, config: Config, ka: KrakenApi) -> None:
+    def __init__(
+        self,
+        config: Config,
+        ka: KrakenApi,
+        clock: Optional[ClockService] = None,
+        ticker: Optional[TickerFeed] = None,
+        due_index: Optional[DueIndex] = None,
+    ) -> None:
         """
         Instantiate the KrakenDCA object.
 
         :param config: Config object.
         :param ka: KrakenAPI object.
+        :param clock: ClockService of the run, shared between accounts.
+        :param ticker: TickerFeed of the run, subscribed to DCA pairs.
+        :param due_index: DueIndex skipping pairs that can't be due.
         :return: None
         """
         self.config = config
         self.ka = ka
         self.dcas_list = []
+        self.order_store = OrderStore.from_config(config.order_store)
+        self.clock = clock or ClockService(ka)
+        self.ticker = ticker
+        self.due_index = due_index
 
     def initialize_pairs_dca(self) -> None:
         """
@@ -38,11 +70,15 @@ class KrakenDCA:
         """
         user_name = self.config.api_user_name
         print(f"Hi {user_name}, current configuration:")
-        asset_pairs: Dict[str, Any] = self.ka.get_asset_pairs()
+        with metric_labels(account=user_name), span("metadata.asset_pairs"):
+            asset_pairs: Dict[str, Any] = self.ka.get_asset_pairs()
         for dca_pair in self.config.dca_pairs:
-            pair: Pair = Pair.get_pair_from_kraken(
-                self.ka, asset_pairs, dca_pair.get("pair")
-            )
+            with metric_labels(
+                account=user_name, pair=dca_pair.get("pair")
+            ), span("metadata.pair"):
+                pair: Pair = Pair.get_pair_from_kraken(
+                    self.ka, asset_pairs, dca_pair.get("pair")
+                )
             dca: DCA = DCA(
                 self.ka,
                 dca_pair.get("delay"),
@@ -51,23 +87,157 @@ class KrakenDCA:
                 user_name,
                 limit_factor=dca_pair.get("limit_factor", 1),
                 max_price=dca_pair.get("max_price", -1),
+                ladder=dca_pair.get("ladder"),
+                order_store=self.order_store,
             )
             print(dca)
             self.dcas_list.append(dca)
+        if self.ticker is not None:
+            self.ticker.subscribe(
+                (dca.pair.name, dca.pair.ws_name) for dca in self.dcas_list
+            )
 
-    def handle_pairs_dca(self) -> None:
+    def handle_pairs_dca(
+        self, dcas: Optional[List[DCA]] = None
+    ) -> Optional[DCAPlan]:
         """
-        Iterate though DCA objects list and execute DCA logic.
+        Plan the orders of every DCA pair from one snapshot of the
+        account and market, then execute the plan.
         Handle pairs Dollar Cost Averaging.
-        :return: None
+
+        :param dcas: DCA objects to handle, all DCA pairs by default.
+        :return: Executed DCAPlan object, None without DCA pair.
         """
+        if dcas is None:
+            dcas = self.dcas_list
         pair: str = "pair"
-        n_dca: int = len(self.dcas_list)
+        n_dca: int = len(dcas)
         if n_dca > 1:
             pair += "s"
 
         print(f"DCA ({n_dca} {pair}):")
-        for dca in self.dcas_list:
+        if not dcas:
+            return None
+        skipped = self.skip_not_due_dcas(dcas)
+        due_dcas = [dca for dca in dcas if dca.pair.name not in skipped]
+        if not due_dcas:
+            self.save_due_index()
+            return DCAPlan(
+                self.config.api_user_name,
+                self.clock.kraken_now(),
+                list(skipped.values()),
+            )
+        plan = None
+        try:
+            plan = self.plan_pairs_dca(due_dcas)
+            with metric_labels(account=self.config.api_user_name), span(
+                "dca.execute"
+            ):
+                execute_plan(plan, due_dcas, self.max_concurrent_orders())
+        finally:
+            self.save_due_index(plan)
+        planned = {item.pair: item for item in plan.items}
+        plan.items = [
+            skipped.get(dca.pair.name) or planned[dca.pair.name]
+            for dca in dcas
+            if dca.pair.name in skipped or dca.pair.name in planned
+        ]
+        return plan
+
+    def skip_not_due_dcas(self, dcas: List[DCA]) -> Dict[str, PlannedOrder]:
+        """
+        Skip the pairs that already have an order in their delay window
+        according to the due index, before any private API call.
+        Pairs missing from the index, or with an order in the future,
+        are checked on Kraken.
+
+        :param dcas: DCA objects.
+        :return: Skipped PlannedOrder by pair name.
+        """
+        if self.due_index is None:
+            return {}
+        user_name = self.config.api_user_name
+        now = self.clock.checked_now()
+        skipped = {}
+        for dca in dcas:
+            name = dca.pair.name
+            last_order = self.due_index.last_order_time(user_name, name)
+            if last_order is None:
+                continue
+            if last_order > datetime_as_utc_unix(now) + MAX_LAG:
+                self.due_index.discard(user_name, name)
+                continue
+            if last_order < dca.daily_orders_start(now):
+                continue
             print(dca)
-            dca.handle_dca_logic()
-            time.sleep(2)
+            skip_reason = f"No DCA for {name}: Already placed an order today."
+            print(skip_reason)
+            skipped[name] = PlannedOrder(name, skip_reason=skip_reason)
+        return skipped
+
+    def record_last_orders(
+        self, dcas: List[DCA], snapshot: MarketSnapshot
+    ) -> None:
+        """
+        Record the last order of each pair seen in the snapshot.
+
+        :param dcas: DCA objects.
+        :param snapshot: MarketSnapshot object.
+        :return: None
+        """
+        for dca in dcas:
+            for orders in (snapshot.open_orders, snapshot.closed_orders):
+                pair_orders = dca.extract_pair_orders(
+                    orders, dca.pair.name, dca.pair.alt_name
+                )
+                for order_infos in pair_orders.values():
+                    self.due_index.record(
+                        self.config.api_user_name,
+                        dca.pair.name,
+                        order_infos.get("opentm", 0),
+                    )
+
+    def save_due_index(self, plan: Optional[DCAPlan] = None) -> None:
+        if self.due_index is None:
+            return
+        if plan is not None:
+            for order in plan.orders:
+                if hasattr(order, "txid"):
+                    self.due_index.record(
+                        self.config.api_user_name,
+                        order.pair,
+                        datetime_as_utc_unix(order.date),
+                    )
+        self.due_index.save()
+
+    def max_concurrent_orders(self) -> int:
+        """
+        Return the configured number of concurrent order submissions,
+        1 if the Kraken client doesn't share nonces between threads.
+
+        :return: Maximum number of concurrent AddOrder calls.
+        """
+        if not isinstance(self.ka, KrakenClient):
+            return 1
+        return self.config.max_concurrent_orders
+
+    def plan_pairs_dca(self, dcas: Optional[List[DCA]] = None) -> DCAPlan:
+        """
+        Read a snapshot of the account and market and plan the orders
+        of every DCA pair.
+
+        :param dcas: DCA objects to plan, all DCA pairs by default.
+        :return: DCAPlan object.
+        """
+        if dcas is None:
+            dcas = self.dcas_list
+        user_name = self.config.api_user_name
+        with metric_labels(account=user_name):
+            with span("dca.snapshot"):
+                snapshot = MarketSnapshot.fetch(
+                    self.ka, dcas, self.clock, self.ticker
+                )
+            if self.due_index is not None:
+                self.record_last_orders(dcas, snapshot)
+            with span("dca.plan"):
+                return plan_dcas(user_name, dcas, snapshot)
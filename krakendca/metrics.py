@@ -0,0 +1,311 @@
+"""API call instrumentation and metrics export module."""
+import bisect
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+METRICS_ENV: str = "KRAKEN_DCA_METRICS"
+PROMETHEUS_FILE_ENV: str = "KRAKEN_DCA_PROMETHEUS_FILE"
+EMF_NAMESPACE: str = "KrakenDCA"
+LABEL_NAMES: Tuple[str, ...] = ("service", "endpoint", "account", "pair")
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+)
+# CloudWatch EMF accepts at most 100 values per metric.
+MAX_EMF_VALUES: int = 100
+
+_labels: contextvars.ContextVar = contextvars.ContextVar(
+    "metric_labels", default={}
+)
+
+
+@contextmanager
+def metric_labels(**labels: str) -> Iterator[None]:
+    """
+    Label every call recorded in the block, e.g. with account and pair.
+
+    :param labels: Labels to add to the current ones.
+    :return: Context manager.
+    """
+    token = _labels.set({**_labels.get(), **labels})
+    try:
+        yield
+    finally:
+        _labels.reset(token)
+
+
+def current_labels() -> Dict[str, str]:
+    """
+    Return the labels set by the enclosing metric_labels blocks.
+
+    :return: Dict of labels.
+    """
+    return dict(_labels.get())
+
+
+class _Series:
+    """
+    Metrics of one label set.
+    """
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.retries = 0
+        self.hedges = 0
+        self.rate_limit_wait = 0.0
+        self.latency_sum = 0.0
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.samples: List[float] = []
+
+
+class Metrics:
+    """
+    Thread-safe registry of per-endpoint call counts, latency
+    histograms, retries, errors and rate-limit waits.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.series: Dict[Tuple[str, ...], _Series] = {}
+
+    def _series(self, service: str, endpoint: str) -> _Series:
+        labels = _labels.get()
+        key = (
+            service,
+            endpoint,
+            labels.get("account", ""),
+            labels.get("pair", ""),
+        )
+        series = self.series.get(key)
+        if series is None:
+            series = self.series.setdefault(key, _Series())
+        return series
+
+    def record_call(
+        self,
+        service: str,
+        endpoint: str,
+        seconds: float,
+        error: Optional[str] = None,
+    ) -> None:
+        """
+        Record a finished call, successful if error is None.
+
+        :param service: Called service, "kraken" or "dynamodb".
+        :param endpoint: Called endpoint, e.g. "AddOrder".
+        :param seconds: Call latency.
+        :param error: Error message or type of failed calls.
+        :return: None
+        """
+        with self.lock:
+            series = self._series(service, endpoint)
+            series.calls += 1
+            series.latency_sum += seconds
+            series.bucket_counts[
+                bisect.bisect_left(LATENCY_BUCKETS, seconds)
+            ] += 1
+            if len(series.samples) < MAX_EMF_VALUES:
+                series.samples.append(seconds)
+            if error is not None:
+                series.errors[error] += 1
+
+    def record_retry(self, service: str, endpoint: str) -> None:
+        with self.lock:
+            self._series(service, endpoint).retries += 1
+
+    def record_hedge(self, service: str, endpoint: str) -> None:
+        with self.lock:
+            self._series(service, endpoint).hedges += 1
+
+    def record_rate_limit_wait(
+        self, service: str, endpoint: str, seconds: float
+    ) -> None:
+        with self.lock:
+            self._series(service, endpoint).rate_limit_wait += seconds
+
+    @contextmanager
+    def timed(self, service: str, endpoint: str) -> Iterator[None]:
+        """
+        Record the block as a call, failed if it raises.
+
+        :param service: Called service.
+        :param endpoint: Called endpoint.
+        :return: Context manager.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            elapsed = time.perf_counter() - start
+            self.record_call(service, endpoint, elapsed, type(e).__name__)
+            raise
+        self.record_call(service, endpoint, time.perf_counter() - start)
+
+    def reset(self) -> None:
+        with self.lock:
+            self.series.clear()
+
+    def to_emf(self, timestamp: Optional[float] = None) -> List[str]:
+        """
+        Return one CloudWatch Embedded Metric Format line per series.
+
+        :param timestamp: Unix time of the metrics, defaults to now.
+        :return: List of JSON lines.
+        """
+        timestamp_ms = int((timestamp or time.time()) * 1000)
+        lines = []
+        with self.lock:
+            for labels, series in sorted(self.series.items()):
+                label_values = {
+                    name: value
+                    for name, value in zip(LABEL_NAMES, labels)
+                    if value
+                }
+                record = {
+                    "_aws": {
+                        "Timestamp": timestamp_ms,
+                        "CloudWatchMetrics": [
+                            {
+                                "Namespace": EMF_NAMESPACE,
+                                "Dimensions": [list(label_values)],
+                                "Metrics": [
+                                    {"Name": "Calls", "Unit": "Count"},
+                                    {"Name": "Errors", "Unit": "Count"},
+                                    {"Name": "Retries", "Unit": "Count"},
+                                    {"Name": "Hedges", "Unit": "Count"},
+                                    {
+                                        "Name": "RateLimitWait",
+                                        "Unit": "Seconds",
+                                    },
+                                    {
+                                        "Name": "Latency",
+                                        "Unit": "Milliseconds",
+                                    },
+                                ],
+                            }
+                        ],
+                    },
+                    **label_values,
+                    "Calls": series.calls,
+                    "Errors": sum(series.errors.values()),
+                    "Retries": series.retries,
+                    "Hedges": series.hedges,
+                    "RateLimitWait": series.rate_limit_wait,
+                    "Latency": [
+                        round(sample * 1000, 3) for sample in series.samples
+                    ],
+                }
+                if series.errors:
+                    record["ErrorTypes"] = dict(series.errors)
+                lines.append(json.dumps(record, sort_keys=True))
+        return lines
+
+    def to_prometheus(self) -> str:
+        """
+        Return the metrics in Prometheus text exposition format.
+
+        :return: Metrics as string.
+        """
+        counters = {
+            "krakendca_api_calls_total": "Number of API calls.",
+            "krakendca_api_errors_total": "Number of failed API calls.",
+            "krakendca_api_retries_total": "Number of retried API calls.",
+            "krakendca_api_hedges_total": "Number of hedged API calls.",
+            "krakendca_api_rate_limit_wait_seconds_total": (
+                "Time spent waiting on rate limits."
+            ),
+        }
+        lines = []
+        with self.lock:
+            items = sorted(self.series.items())
+            for name, help_text in counters.items():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} counter")
+                for labels, series in items:
+                    label_text = _prometheus_labels(labels)
+                    if name == "krakendca_api_errors_total":
+                        for error, count in sorted(series.errors.items()):
+                            error_labels = _prometheus_labels(
+                                labels, error=error
+                            )
+                            lines.append(f"{name}{error_labels} {count}")
+                        continue
+                    value = {
+                        "krakendca_api_calls_total": series.calls,
+                        "krakendca_api_retries_total": series.retries,
+                        "krakendca_api_hedges_total": series.hedges,
+                        "krakendca_api_rate_limit_wait_seconds_total": (
+                            series.rate_limit_wait
+                        ),
+                    }[name]
+                    lines.append(f"{name}{label_text} {value}")
+            name = "krakendca_api_latency_seconds"
+            lines.append(f"# HELP {name} API call latency.")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, series in items:
+                cumulative = 0
+                for bound, count in zip(
+                    LATENCY_BUCKETS + ("+Inf",), series.bucket_counts
+                ):
+                    cumulative += count
+                    bucket_labels = _prometheus_labels(labels, le=str(bound))
+                    lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+                label_text = _prometheus_labels(labels)
+                lines.append(f"{name}_sum{label_text} {series.latency_sum}")
+                lines.append(f"{name}_count{label_text} {series.calls}")
+        return "\n".join(lines) + "\n"
+
+    def emit(self, exporters: Optional[str] = None) -> None:
+        """
+        Export metrics as configured by the KRAKEN_DCA_METRICS environment
+        variable: comma separated "emf" (lines printed to stdout, parsed
+        by CloudWatch on Lambda) and/or "prometheus" (text file written to
+        KRAKEN_DCA_PROMETHEUS_FILE, default krakendca.prom).
+
+        :param exporters: Exporters overriding the environment variable.
+        :return: None
+        """
+        if exporters is None:
+            exporters = os.environ.get(METRICS_ENV, "")
+        exporters = {e.strip().lower() for e in exporters.split(",") if e}
+        if "emf" in exporters:
+            for line in self.to_emf():
+                print(line)
+        if "prometheus" in exporters:
+            prometheus_file = os.environ.get(
+                PROMETHEUS_FILE_ENV, "krakendca.prom"
+            )
+            temporary_file = prometheus_file + ".tmp"
+            with open(temporary_file, "w") as stream:
+                stream.write(self.to_prometheus())
+            os.replace(temporary_file, prometheus_file)
+
+
+def _prometheus_labels(labels: Tuple[str, ...], **extra: str) -> str:
+    pairs = list(zip(LABEL_NAMES, labels)) + list(extra.items())
+    text = ",".join(
+        f'{name}="{_escape(value)}"' for name, value in pairs if value
+    )
+    return "{" + text + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+METRICS: Metrics = Metrics()
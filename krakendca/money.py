@@ -0,0 +1,392 @@
+"""Integer fixed-point money module."""
+import functools
+import math
+import operator
+from decimal import ROUND_FLOOR, ROUND_HALF_EVEN, ROUND_HALF_UP, Decimal
+from fractions import Fraction
+from typing import Callable, Tuple, TypeVar, Union
+
+T = TypeVar("T", bound="Money")
+
+# Maximum number of decimals needed to represent any float exactly enough
+# to round-trip it (shortest repr of a double has at most 17 digits).
+MAX_FLOAT_DECIMALS: int = 17
+# Largest power of ten exactly represented by a float.
+MAX_EXACT_POWER: int = 22
+# Floats below this bound represent every integer and half-integer.
+FLOAT_EXACT_LIMIT: float = 2.0**52
+# Powers of ten of the usual order decimals, faster than 10**n.
+POWERS_OF_TEN: Tuple[int, ...] = tuple(
+    10**exponent for exponent in range(64)
+)
+
+
+def divide_integers(numerator: int, denominator: int, rounding: str) -> int:
+    """
+    Divide two integers and round the quotient with the specified
+    decimal module rounding mode.
+
+    :param numerator: Dividend as int.
+    :param denominator: Divisor as int, must not be 0.
+    :param rounding: ROUND_FLOOR, ROUND_HALF_EVEN or ROUND_HALF_UP.
+    :return: Rounded quotient as int.
+    """
+    if denominator < 0:
+        numerator, denominator = -numerator, -denominator
+    quotient, remainder = divmod(numerator, denominator)
+    if rounding == ROUND_FLOOR or not remainder:
+        return quotient
+    doubled_remainder = 2 * remainder
+    if doubled_remainder > denominator:
+        return quotient + 1
+    if doubled_remainder < denominator:
+        return quotient
+    # Exactly half way between quotient and quotient + 1.
+    if rounding == ROUND_HALF_UP:
+        return quotient + 1
+    if rounding == ROUND_HALF_EVEN:
+        return quotient + (quotient & 1)
+    raise ValueError(f"Unsupported rounding mode: {rounding}.")
+
+
+def rescale_units(
+    units: int,
+    decimals: int,
+    new_decimals: int,
+    rounding: str = ROUND_HALF_EVEN,
+) -> int:
+    """
+    Return scaled integer units with another number of decimals.
+
+    :param units: Integer amount of 10**-decimals units.
+    :param decimals: Number of decimals of units.
+    :param new_decimals: Wanted number of decimals.
+    :param rounding: Rounding mode used when decimals are removed.
+    :return: Integer amount of 10**-new_decimals units.
+    """
+    shift = decimals - new_decimals
+    if shift <= 0:
+        return units * 10**-shift
+    if shift < len(POWERS_OF_TEN):
+        factor = POWERS_OF_TEN[shift]
+    else:
+        factor = 10**shift
+    if rounding != ROUND_HALF_EVEN:
+        return divide_integers(units, factor, rounding)
+    # Inlined ROUND_HALF_EVEN division, the hot path of order amounts.
+    quotient, remainder = divmod(units, factor)
+    remainder += remainder
+    if remainder > factor or (remainder == factor and quotient & 1):
+        return quotient + 1
+    return quotient
+
+
+@functools.lru_cache(maxsize=4096)
+def float_units(value: Union[float, int]) -> Tuple[int, int]:
+    """
+    Return the shortest decimal value of a float as scaled integer
+    units, e.g. 2083.16 -> (208316, 2).
+
+    Finding the shortest decimals of a float costs more than
+    Decimal(str(value)), results are cached as the same config amounts,
+    limit factors and ticker prices are converted for every order.
+
+    :param value: Float or int to convert.
+    :return: Tuple of units and number of decimals.
+    """
+    # The shortest repr of a float is also its smallest number of
+    # decimals rounding back to it.
+    integer, point, fraction = repr(value).partition(".")
+    if fraction == "0":
+        return int(integer), 0
+    if not point or "e" in fraction:
+        if isinstance(value, int):
+            return value, 0
+        money = Money.from_float_ratio(value)
+        return money.units, money.decimals
+    return int(integer + fraction), len(fraction)
+
+
+def float_to_units(
+    value: Union[float, int], decimals: int, rounding: str = ROUND_HALF_EVEN
+) -> int:
+    """
+    Return the exact binary value of a float rounded to decimals, as
+    scaled integer units.
+
+    The float product is used when no rounding boundary can lie between
+    it and the exact product: integers and half-integers below 2**52 are
+    floats, so the product is only ambiguous when it is an integer
+    (floor) or a half-integer (ties). Other values are rounded from
+    their exact integer ratio.
+
+    :param value: Float or int to convert.
+    :param decimals: Number of decimals to keep.
+    :param rounding: ROUND_FLOOR, ROUND_HALF_EVEN or ROUND_HALF_UP.
+    :return: Integer amount of 10**-decimals units.
+    """
+    if isinstance(value, int):
+        return value * 10**decimals
+    if decimals <= MAX_EXACT_POWER:
+        scaled = value * POWERS_OF_TEN[decimals]
+        if -FLOAT_EXACT_LIMIT < scaled < FLOAT_EXACT_LIMIT:
+            floor = math.floor(scaled)
+            fraction = scaled - floor
+            if rounding == ROUND_FLOOR:
+                if fraction:
+                    return floor
+            elif fraction != 0.5:
+                return floor + (fraction > 0.5)
+    if not math.isfinite(value):
+        raise ValueError(f"Money value must be finite, got {value}.")
+    numerator, denominator = value.as_integer_ratio()
+    return divide_integers(numerator * 10**decimals, denominator, rounding)
+
+
+class Money:
+    """
+    Immutable integer fixed-point number: value = units / 10**decimals.
+
+    Arithmetic between Money objects is exact, precision is only lost
+    through explicit rescaling with a rounding mode, as Kraken does with
+    lot and quote decimals. Money objects are the exact value of amounts
+    at the DynamoDB and CSV boundaries, order math on the hot path works
+    on the scaled integer units directly (see rescale_units and
+    float_to_units), which is faster than Decimal.
+    Comparisons with floats are exact, arithmetic with floats raises
+    TypeError.
+    """
+
+    __slots__ = ("units", "decimals")
+
+    units: int
+    decimals: int
+
+    def __init__(self, units: int, decimals: int) -> None:
+        """
+        Initialize the Money object.
+
+        :param units: Integer amount of 10**-decimals units.
+        :param decimals: Number of decimals of the value, >= 0.
+        """
+        if decimals < 0:
+            raise ValueError("Money decimals must be >= 0.")
+        object.__setattr__(self, "units", int(units))
+        object.__setattr__(self, "decimals", int(decimals))
+
+    def __setattr__(self, name: str, value: object) -> None:
+        raise AttributeError("Money objects are immutable.")
+
+    @classmethod
+    def from_float(
+        cls,
+        value: Union[float, int],
+        decimals: int = None,
+        rounding: str = ROUND_HALF_EVEN,
+    ) -> T:
+        """
+        Create a Money object from the exact binary value of a float.
+
+        :param value: Float or int to convert.
+        :param decimals: Number of decimals to keep, if None the smallest
+        number of decimals representing the float is used.
+        :param rounding: Rounding mode used when value has more decimals.
+        :return: Instance of Money object.
+        """
+        if decimals is not None:
+            return cls(float_to_units(value, decimals, rounding), decimals)
+        return cls(*float_units(value))
+
+    @classmethod
+    def from_float_ratio(cls, value: float) -> T:
+        """
+        Create a Money object from the smallest number of decimals
+        rounding back to the float, e.g. for 1e-05.
+
+        :param value: Float to convert.
+        :return: Instance of Money object.
+        """
+        if not math.isfinite(value):
+            raise ValueError(f"Money value must be finite, got {value}.")
+        numerator, denominator = value.as_integer_ratio()
+        for decimals in range(MAX_FLOAT_DECIMALS + 1):
+            units = divide_integers(
+                numerator * 10**decimals, denominator, ROUND_HALF_EVEN
+            )
+            if units / 10**decimals == value:
+                return cls(units, decimals)
+        return cls(units, decimals)
+
+    @classmethod
+    def from_decimal(
+        cls, value: Decimal, decimals: int = None, rounding=ROUND_HALF_EVEN
+    ) -> T:
+        """
+        Create a Money object from a Decimal, e.g. a DynamoDB number.
+
+        :param value: Decimal to convert.
+        :param decimals: Number of decimals to keep, defaults to the
+        Decimal exponent.
+        :param rounding: Rounding mode used when value has more decimals.
+        :return: Instance of Money object.
+        """
+        sign, digits, exponent = value.as_tuple()
+        units = 0
+        for digit in digits:
+            units = units * 10 + digit
+        if sign:
+            units = -units
+        money = cls(units * 10 ** max(exponent, 0), max(-exponent, 0))
+        if decimals is None:
+            return money
+        return money.rescale(decimals, rounding)
+
+    def rescale(self, decimals: int, rounding: str = ROUND_HALF_EVEN) -> T:
+        """
+        Return the value with another number of decimals.
+
+        :param decimals: Wanted number of decimals.
+        :param rounding: Rounding mode used when decimals are removed.
+        :return: Rescaled Money object.
+        """
+        return Money(
+            rescale_units(self.units, self.decimals, decimals, rounding),
+            decimals,
+        )
+
+    def divide(
+        self, other: T, decimals: int, rounding: str = ROUND_HALF_EVEN
+    ) -> T:
+        """
+        Divide by another Money object keeping the specified decimals.
+
+        :param other: Divisor as Money object.
+        :param decimals: Number of decimals of the quotient.
+        :param rounding: Rounding mode of the quotient.
+        :return: Quotient as Money object.
+        """
+        if not other.units:
+            raise ZeroDivisionError("Money division by zero.")
+        numerator = self.units * 10 ** (decimals + other.decimals)
+        denominator = other.units * 10**self.decimals
+        return Money(
+            divide_integers(numerator, denominator, rounding), decimals
+        )
+
+    def to_fraction(self) -> Fraction:
+        """
+        Return the exact value as Fraction.
+
+        :return: Value as Fraction.
+        """
+        return Fraction(self.units, 10**self.decimals)
+
+    def to_decimal(self) -> Decimal:
+        """
+        Return the exact value as Decimal, as expected by DynamoDB.
+
+        :return: Value as Decimal.
+        """
+        return Decimal(self.units).scaleb(-self.decimals)
+
+    @staticmethod
+    def _coerce(other: object) -> "Money":
+        if isinstance(other, Money):
+            return other
+        if isinstance(other, int):
+            return Money(other, 0)
+        return NotImplemented
+
+    def _align(self, other: "Money") -> tuple:
+        decimals = max(self.decimals, other.decimals)
+        return (
+            self.units * 10 ** (decimals - self.decimals),
+            other.units * 10 ** (decimals - other.decimals),
+            decimals,
+        )
+
+    def __add__(self, other: object) -> T:
+        other = self._coerce(other)
+        if other is NotImplemented:
+            return other
+        units, other_units, decimals = self._align(other)
+        return Money(units + other_units, decimals)
+
+    __radd__ = __add__
+
+    def __sub__(self, other: object) -> T:
+        other = self._coerce(other)
+        if other is NotImplemented:
+            return other
+        units, other_units, decimals = self._align(other)
+        return Money(units - other_units, decimals)
+
+    def __rsub__(self, other: object) -> T:
+        other = self._coerce(other)
+        if other is NotImplemented:
+            return other
+        return other - self
+
+    def __mul__(self, other: object) -> T:
+        other = self._coerce(other)
+        if other is NotImplemented:
+            return other
+        return Money(self.units * other.units, self.decimals + other.decimals)
+
+    __rmul__ = __mul__
+
+    def __neg__(self) -> T:
+        return Money(-self.units, self.decimals)
+
+    def __abs__(self) -> T:
+        return Money(abs(self.units), self.decimals)
+
+    def __bool__(self) -> bool:
+        return bool(self.units)
+
+    def _compare(self, other: object, compare: Callable) -> bool:
+        # Floats are compared exactly, as Decimal and Fraction do.
+        if isinstance(other, float):
+            return compare(self.to_fraction(), other)
+        other = self._coerce(other)
+        if other is NotImplemented:
+            return other
+        units, other_units, _ = self._align(other)
+        return compare(units, other_units)
+
+    def __eq__(self, other: object) -> bool:
+        return self._compare(other, operator.eq)
+
+    def __lt__(self, other: object) -> bool:
+        return self._compare(other, operator.lt)
+
+    def __le__(self, other: object) -> bool:
+        return self._compare(other, operator.le)
+
+    def __gt__(self, other: object) -> bool:
+        return self._compare(other, operator.gt)
+
+    def __ge__(self, other: object) -> bool:
+        return self._compare(other, operator.ge)
+
+    def __hash__(self) -> int:
+        # Equal numbers must hash the same, whatever their type.
+        if not self.decimals:
+            return hash(self.units)
+        return hash(self.to_fraction())
+
+    def __float__(self) -> float:
+        return self.units / 10**self.decimals
+
+    def __str__(self) -> str:
+        sign = "-" if self.units < 0 else ""
+        digits = str(abs(self.units)).rjust(self.decimals + 1, "0")
+        if not self.decimals:
+            return sign + digits
+        return f"{sign}{digits[:-self.decimals]}.{digits[-self.decimals:]}"
+
+    def __repr__(self) -> str:
+        return f"Money('{self}')"
+
+    def __reduce__(self) -> tuple:
+        return Money, (self.units, self.decimals)
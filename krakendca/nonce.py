@@ -0,0 +1,122 @@
+"""Kraken API nonce management module."""
+import hashlib
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: nonces are only shared in-process.
+    fcntl = None
+
+NONCE_DIR_ENV: str = "KRAKEN_DCA_NONCE_DIR"
+
+
+class NonceManager:
+    """
+    Strictly increasing millisecond nonces of one API key, shared by
+    every thread and, with a nonce file, every process using the key.
+    """
+
+    lock: threading.Lock
+    last_nonce: int
+    nonce_file: Optional[Path]
+
+    def __init__(self, nonce_file: Optional[str] = None) -> None:
+        """
+        Initialize the NonceManager object.
+
+        :param nonce_file: File holding the last nonce, locked while
+        creating a nonce so that processes share the same sequence.
+        """
+        self.lock = threading.Lock()
+        self.last_nonce = 0
+        self.nonce_file = Path(nonce_file) if nonce_file else None
+        if self.nonce_file:
+            self.nonce_file.parent.mkdir(parents=True, exist_ok=True)
+
+    def next_nonce(self) -> int:
+        """
+        Return a nonce greater than every nonce returned before.
+        Nonces follow the unix time in milliseconds like KrakenApi ones,
+        and the last nonce + 1 when several are created the same
+        millisecond.
+
+        :return: Nonce as int.
+        """
+        with self.lock:
+            return self.update_last_nonce(
+                max(self.now(), self.last_nonce + 1), 1
+            )
+
+    def rebuild(self, rejected_nonce: int = 0) -> None:
+        """
+        Resynchronize the sequence after Kraken rejected a nonce: the
+        shared nonce file is read again and next nonces start after the
+        rejected nonce, the nonce file and the current time.
+
+        :param rejected_nonce: Nonce of the rejected request.
+        :return: None
+        """
+        with self.lock:
+            self.update_last_nonce(
+                max(self.now(), self.last_nonce, rejected_nonce), 0
+            )
+
+    def update_last_nonce(self, nonce: int, shared_increment: int) -> int:
+        """
+        Set the last nonce, at least the nonce of the shared nonce file
+        plus shared_increment, and save it to the file.
+        Must be called with the lock acquired.
+
+        :param nonce: New last nonce.
+        :param shared_increment: Minimum gap with the shared nonce.
+        :return: Last nonce as int.
+        """
+        if self.nonce_file is None or fcntl is None:
+            self.last_nonce = nonce
+            return self.last_nonce
+        with open(self.nonce_file, "a+") as stream:
+            fcntl.flock(stream, fcntl.LOCK_EX)
+            try:
+                stream.seek(0)
+                shared_nonce = int(stream.read().strip() or 0)
+                self.last_nonce = max(nonce, shared_nonce + shared_increment)
+                stream.seek(0)
+                stream.truncate()
+                stream.write(str(self.last_nonce))
+                stream.flush()
+            finally:
+                fcntl.flock(stream, fcntl.LOCK_UN)
+        return self.last_nonce
+
+    @staticmethod
+    def now() -> int:
+        return int(time.time() * 1000)
+
+
+_managers: Dict[str, NonceManager] = {}
+_managers_lock = threading.Lock()
+
+
+def nonce_manager(api_key: str) -> NonceManager:
+    """
+    Return the NonceManager shared by every client of an API key.
+    Nonces are shared across processes through a file of the
+    KRAKEN_DCA_NONCE_DIR directory when this environment variable is set.
+
+    :param api_key: Kraken API public key.
+    :return: NonceManager object.
+    """
+    with _managers_lock:
+        manager = _managers.get(api_key)
+        if manager is None:
+            nonce_dir = os.environ.get(NONCE_DIR_ENV)
+            nonce_file = None
+            if nonce_dir:
+                key_hash = hashlib.sha256(api_key.encode()).hexdigest()
+                nonce_file = os.path.join(nonce_dir, f"{key_hash[:16]}.nonce")
+            manager = _managers[api_key] = NonceManager(nonce_file)
+        return manager
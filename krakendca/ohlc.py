@@ -0,0 +1,320 @@
+"""Local OHLC price history store module."""
+import bisect
+import csv
+import json
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, NamedTuple, Optional, Union
+
+# Fixed-width little-endian record, in Kraken OHLC order:
+# time, open, high, low, close, vwap, volume, count.
+BAR_STRUCT: struct.Struct = struct.Struct("<qddddddq")
+BAR_SIZE: int = BAR_STRUCT.size
+TIME_STRUCT: struct.Struct = struct.Struct("<q")
+
+
+class OHLCBar(NamedTuple):
+    """
+    OHLC bar as returned by Kraken OHLC endpoint.
+    """
+
+    time: int
+    open: float
+    high: float
+    low: float
+    close: float
+    vwap: float
+    volume: float
+    count: int
+
+    @classmethod
+    def from_kraken(cls, bar: Iterable) -> "OHLCBar":
+        """
+        Create a bar from a Kraken OHLC list (values as strings).
+
+        :param bar: Kraken OHLC bar as list.
+        :return: OHLCBar object.
+        """
+        time, open, high, low, close, vwap, volume, count = bar
+        return cls(
+            int(time),
+            float(open),
+            float(high),
+            float(low),
+            float(close),
+            float(vwap),
+            float(volume),
+            int(count),
+        )
+
+
+class _BarTimes:
+    """
+    Lazy sequence of bar timestamps used to bisect a memory map.
+    """
+
+    def __init__(self, buffer: memoryview, start: int, stop: int) -> None:
+        self.buffer = buffer
+        self.start = start
+        self.stop = stop
+
+    def __len__(self) -> int:
+        return self.stop - self.start
+
+    def __getitem__(self, index: int) -> int:
+        offset = (self.start + index) * BAR_SIZE
+        return TIME_STRUCT.unpack_from(self.buffer, offset)[0]
+
+
+class OHLCSeries:
+    """
+    Read-only, memory-mapped view over stored OHLC bars of a pair.
+    Bars are only decoded when accessed, so the file doesn't have to fit
+    in memory.
+    """
+
+    def __init__(
+        self,
+        buffer: Optional[memoryview],
+        start: int = 0,
+        stop: int = 0,
+        mapping: Optional[mmap.mmap] = None,
+    ) -> None:
+        """
+        Initialize the OHLCSeries object.
+
+        :param buffer: Memory view of the store file, None if empty.
+        :param start: Index of the first bar of the view.
+        :param stop: Index after the last bar of the view.
+        :param mapping: Memory map owned by the series, closed on close().
+        """
+        self._buffer = buffer
+        self._start = start
+        self._stop = stop
+        self._mapping = mapping
+
+    def __len__(self) -> int:
+        return self._stop - self._start
+
+    def __getitem__(self, index: int) -> OHLCBar:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("OHLCSeries index out of range.")
+        offset = (self._start + index) * BAR_SIZE
+        return OHLCBar(*BAR_STRUCT.unpack_from(self._buffer, offset))
+
+    def __iter__(self) -> Iterator[OHLCBar]:
+        if not len(self):
+            return
+        first, last = self._start * BAR_SIZE, self._stop * BAR_SIZE
+        view = self._buffer[first:last]
+        try:
+            for bar in BAR_STRUCT.iter_unpack(view):
+                yield OHLCBar(*bar)
+        finally:
+            view.release()
+
+    def between(
+        self, start: Optional[int] = None, end: Optional[int] = None
+    ) -> "OHLCSeries":
+        """
+        Return bars with start <= time < end using binary search.
+        The returned series shares the memory map, nothing is copied.
+
+        :param start: Range start unix time, None for no lower bound.
+        :param end: Range end unix time (excluded), None for no bound.
+        :return: OHLCSeries of the range.
+        """
+        if not len(self):
+            return OHLCSeries(None)
+        times = _BarTimes(self._buffer, self._start, self._stop)
+        first = 0 if start is None else bisect.bisect_left(times, start)
+        last = len(times) if end is None else bisect.bisect_left(times, end)
+        last = max(first, last)
+        return OHLCSeries(
+            self._buffer, self._start + first, self._start + last
+        )
+
+    def close(self) -> None:
+        """
+        Release the memory map owned by the series.
+
+        :return: None
+        """
+        if self._mapping is not None:
+            self._buffer.release()
+            self._mapping.close()
+            self._mapping = None
+            self._buffer = None
+
+    def __enter__(self) -> "OHLCSeries":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class OHLCStore:
+    """
+    Per-pair OHLC bars store, one fixed-width binary file per pair and
+    interval, sorted by bar time.
+    """
+
+    directory: Path
+    interval: int
+
+    def __init__(self, directory: Union[str, Path], interval: int = 1):
+        """
+        Initialize the OHLCStore object.
+
+        :param directory: Directory where bar files are stored.
+        :param interval: Bars interval in minutes, as in Kraken API.
+        """
+        self.directory = Path(directory)
+        self.interval = interval
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def path(self, pair: str) -> Path:
+        """
+        Return the bars file path of a pair.
+
+        :param pair: Pair name.
+        :return: File path.
+        """
+        return self.directory / f"{pair}_{self.interval}.ohlc"
+
+    def count(self, pair: str) -> int:
+        """
+        Return the number of stored bars of a pair.
+
+        :param pair: Pair name.
+        :return: Number of bars.
+        """
+        try:
+            return os.path.getsize(self.path(pair)) // BAR_SIZE
+        except FileNotFoundError:
+            return 0
+
+    def last_time(self, pair: str) -> Optional[int]:
+        """
+        Return the time of the last stored bar, to fetch new bars since.
+
+        :param pair: Pair name.
+        :return: Last bar unix time, None if no bars stored.
+        """
+        count = self.count(pair)
+        if not count:
+            return None
+        with open(self.path(pair), "rb") as bars_file:
+            # Bars are read from the start, a partial bar may follow.
+            bars_file.seek((count - 1) * BAR_SIZE)
+            return TIME_STRUCT.unpack(bars_file.read(TIME_STRUCT.size))[0]
+
+    def append(self, pair: str, bars: Iterable) -> int:
+        """
+        Append bars to a pair file. Bars older than the last stored bar
+        are skipped and a bar with the same time replaces it, as Kraken
+        last OHLC bar is not committed yet. A partial bar at the end of
+        the file, left by an interrupted write, is truncated first so
+        that new bars stay aligned.
+
+        :param pair: Pair name.
+        :param bars: OHLCBar or Kraken OHLC lists, sorted by time.
+        :return: Number of bars written.
+        """
+        written = 0
+        path = self.path(pair)
+        with open(path, "r+b" if path.exists() else "wb") as f:
+            size = f.seek(0, os.SEEK_END)
+            if size % BAR_SIZE:
+                size -= size % BAR_SIZE
+                print(f"Truncating partial OHLC bar at the end of {path}.")
+                f.truncate(size)
+                f.seek(size)
+            last_time = None
+            if size:
+                f.seek(size - BAR_SIZE)
+                last_time = TIME_STRUCT.unpack(f.read(TIME_STRUCT.size))[0]
+                f.seek(size)
+            for bar in bars:
+                if not isinstance(bar, OHLCBar):
+                    bar = OHLCBar.from_kraken(bar)
+                if last_time is not None:
+                    if bar.time < last_time:
+                        continue
+                    if bar.time == last_time:
+                        f.seek(-BAR_SIZE, os.SEEK_END)
+                f.write(BAR_STRUCT.pack(*bar))
+                last_time = bar.time
+                written += 1
+        return written
+
+    def read(self, pair: str) -> OHLCSeries:
+        """
+        Memory-map the bars of a pair. Close the returned series, or use
+        it as a context manager, to release the file.
+
+        :param pair: Pair name.
+        :return: OHLCSeries of all stored bars.
+        """
+        count = self.count(pair)
+        if not count:
+            return OHLCSeries(None)
+        with open(self.path(pair), "rb") as bars_file:
+            mapping = mmap.mmap(
+                bars_file.fileno(), count * BAR_SIZE, access=mmap.ACCESS_READ
+            )
+        return OHLCSeries(memoryview(mapping), 0, count, mapping)
+
+    def import_kraken_json(self, json_file: Union[str, Path]) -> Dict:
+        """
+        Import a Kraken OHLC endpoint response dump, with or without
+        the error/result envelope.
+
+        :param json_file: Kraken OHLC JSON file path.
+        :return: Dict of number of bars written per pair.
+        """
+        with open(json_file, "r") as stream:
+            data = json.load(stream)
+        data = data.get("result", data)
+        return {
+            pair: self.append(pair, bars)
+            for pair, bars in data.items()
+            if pair != "last"
+        }
+
+    def import_csv(self, csv_file: Union[str, Path], pair: str) -> int:
+        """
+        Import bars from a CSV file with time, open, high, low, close,
+        vwap, volume and count columns, with or without header.
+
+        :param csv_file: CSV file path.
+        :param pair: Pair name.
+        :return: Number of bars written.
+        """
+        with open(csv_file, "r", newline="") as stream:
+            rows = csv.reader(stream)
+            first_row = next(rows, None)
+            if first_row is None:
+                return 0
+            if not first_row[0].strip().isdigit():
+                header = [column.strip().lower() for column in first_row]
+                indexes = [header.index(field) for field in OHLCBar._fields]
+                bars = (
+                    OHLCBar.from_kraken(row[i] for i in indexes)
+                    for row in rows
+                )
+            else:
+                bars = (
+                    OHLCBar.from_kraken(row)
+                    for row in _prepend(first_row, rows)
+                )
+            return self.append(pair, bars)
+
+
+def _prepend(first: object, iterable: Iterable) -> Iterator:
+    yield first
+    yield from iterable
@@ -1,21 +1,55 @@
 """Order object module."""
-import json
-import math
 from datetime import datetime
 from decimal import Decimal
-from typing import TypeVar
+from typing import Any, Callable, Dict, List, Mapping, Tuple, TypeVar
 
-import boto3
 from krakenapi import KrakenApi
 
+from .api import KrakenClient
+from .money import POWERS_OF_TEN, Money, float_units, rescale_units
+
 T = TypeVar("T", bound="Order")
 
+# Kraken 0.26% taker fee and the matching volume adjustment factor.
+TAKER_FEE: Money = Money(26, 4)
+TAKER_FEE_FACTOR: Money = Money(10026, 4)
+
+# Order attributes, in constructor order.
+ORDER_FIELDS: Tuple[str, ...] = (
+    "user_name",
+    "date",
+    "pair",
+    "type",
+    "order_type",
+    "o_flags",
+    "pair_price",
+    "volume",
+    "price",
+    "fee",
+    "total_price",
+    "lot_decimals",
+    "quote_decimals",
+    "limit_factor",
+)
+# Attributes set once the order is accepted by Kraken.
+SENT_FIELDS: Tuple[str, ...] = ("txid", "description")
+TEXT_FIELDS: Tuple[str, ...] = ORDER_FIELDS[:6]
+AMOUNT_FIELDS: Tuple[str, ...] = ORDER_FIELDS[6:11]
+# Order history CSV columns.
+CSV_FIELDS: Tuple[str, ...] = (
+    TEXT_FIELDS + AMOUNT_FIELDS + ("limit_factor",) + SENT_FIELDS
+)
+
 
 class Order:
     """
     Kraken order encapsulation.
+    Orders are slotted, and converted to DynamoDB items, CSV rows and
+    JSON dicts by explicit codecs.
     """
 
+    __slots__ = ORDER_FIELDS + SENT_FIELDS
+
     user_name: str
     date: datetime
     pair: str
@@ -29,6 +63,9 @@ class Order:
     total_price: float
     txid: str
     description: str
+    lot_decimals: int
+    quote_decimals: int
+    limit_factor: float
 
     def __init__(
         self,
@@ -43,6 +80,9 @@ class Order:
         price: float,
         fee: float,
         total_price: float,
+        lot_decimals: int = None,
+        quote_decimals: int = None,
+        limit_factor: float = None,
     ) -> None:
         """
         Initialize the Order object.
@@ -61,6 +101,9 @@ class Order:
         :param fee: Order fee.
         :param pair_price: Order pair price.
         :param total_price: Total price of the order (order price + fee).
+        :param lot_decimals: Pair lot decimals of volume, if known.
+        :param quote_decimals: Quote asset decimals of prices, if known.
+        :param limit_factor: DCA limit factor of the price, if known.
         """
         self.user_name = user_name
         self.date = date
@@ -73,6 +116,9 @@ class Order:
         self.price = price
         self.fee = fee
         self.total_price = total_price
+        self.lot_decimals = lot_decimals
+        self.quote_decimals = quote_decimals
+        self.limit_factor = limit_factor
 
     @classmethod
     def buy_limit_order(
@@ -84,6 +130,7 @@ class Order:
         pair_price: float,
         lot_decimals: int,
         quote_decimals: int,
+        limit_factor: float = None,
     ) -> T:
         """
         Create a limit order for specified dca pair and amount.
@@ -95,16 +142,29 @@ class Order:
         :param pair_price: Limit order pair price.
         :param lot_decimals: Pair lot decimals.
         :param quote_decimals: Pair quote asset decimals.
+        :param limit_factor: DCA limit factor of the pair price.
         :return: Instance of Order object.
         """
-        volume = cls.set_order_volume(amount, pair_price, lot_decimals)
-        price = cls.estimate_order_price(volume, pair_price, quote_decimals)
-        fee = cls.estimate_order_fee(volume, pair_price, quote_decimals)
+        # Amounts are scaled integer units, the order price has the
+        # decimals of volume times pair price.
+        price_units, price_decimals = float_units(pair_price)
+        volume = cls.fixed_order_volume(
+            *float_units(amount), price_units, price_decimals, lot_decimals
+        )
+        order_price = volume * price_units
+        order_decimals = lot_decimals + price_decimals
+        price = rescale_units(order_price, order_decimals, quote_decimals)
+        fee = rescale_units(
+            order_price * TAKER_FEE.units,
+            order_decimals + TAKER_FEE.decimals,
+            quote_decimals,
+        )
+        quote_factor = POWERS_OF_TEN[quote_decimals]
         type = "buy"
         order_type = "limit"
         # Pay fee in quote asset.
         o_flags = "fciq"
-        total_price = round(price + fee, quote_decimals)
+        total_price = price + fee
         return cls(
             user_name,
             date,
@@ -113,10 +173,13 @@ class Order:
             order_type,
             o_flags,
             pair_price,
-            volume,
-            price,
-            fee,
-            total_price,
+            volume / POWERS_OF_TEN[lot_decimals],
+            price / quote_factor,
+            fee / quote_factor,
+            total_price / quote_factor,
+            lot_decimals=lot_decimals,
+            quote_decimals=quote_decimals,
+            limit_factor=limit_factor,
         )
 
     def send_order(self, ka: KrakenApi) -> None:
@@ -138,21 +201,214 @@ class Order:
         self.txid = response.get("txid")[0]
         self.description = response.get("descr").get("order")
 
-    def save_order_dynamo(self, orders_table: str) -> None:
+    def to_batch_order(self) -> Dict[str, Any]:
+        """
+        Return the order inputs of an AddOrderBatch call.
+
+        :return: Order inputs as dict.
         """
-        Save Order object attributes to Dynamo DB.
+        return {
+            "type": self.type,
+            "ordertype": self.order_type,
+            "price": self.pair_price,
+            "volume": self.volume,
+            "oflags": self.o_flags,
+        }
 
+    @staticmethod
+    def send_order_batch(ka: KrakenClient, orders: List["Order"]) -> None:
+        """
+        Execute orders of one pair with a single AddOrderBatch call.
+        Add the returned TXID and description to each accepted Order
+        object, rejected orders raise an error once every answer is
+        read.
+
+        :param ka: KrakenClient object.
+        :param orders: Order objects of the same pair.
         :return: None
         """
-        client = boto3.resource("dynamodb", region_name="us-east-1")
-        table = client.Table(orders_table)
-        order_json = json.dumps(self.__dict__, default=str)
-        order_item = json.loads(order_json, parse_float=Decimal)
-        table.put_item(Item=order_item)
+        results = ka.create_order_batch(
+            orders[0].pair, [order.to_batch_order() for order in orders]
+        )
+        errors = []
+        for order, result in zip(orders, results):
+            if result.get("error"):
+                errors.append(result["error"])
+                continue
+            order.txid = result.get("txid")
+            order.description = result.get("descr").get("order")
+        if errors:
+            raise ValueError(f"Kraken AddOrderBatch errors: {errors}")
+
+    def amounts(self) -> Dict[str, Money]:
+        """
+        Return order amounts as fixed-point values: volume at lot
+        decimals, prices and fee at quote decimals when known.
+        Limit factor is only set if known, fill times are reported per
+        pair and limit factor.
+
+        :return: Dict of Money objects by attribute name.
+        """
+        amounts = {
+            "pair_price": Money.from_float(self.pair_price),
+            "volume": Money.from_float(self.volume, self.lot_decimals),
+        }
+        for key in ("price", "fee", "total_price"):
+            amounts[key] = Money.from_float(
+                getattr(self, key), self.quote_decimals
+            )
+        if self.limit_factor is not None:
+            amounts["limit_factor"] = Money.from_float(self.limit_factor)
+        return amounts
+
+    def sent_fields(self) -> Dict[str, str]:
+        return {
+            key: getattr(self, key)
+            for key in SENT_FIELDS
+            if hasattr(self, key)
+        }
+
+    def to_item(self) -> Dict[str, Any]:
+        """
+        Return Order attributes as a DynamoDB item.
+        Amounts are converted to Decimal from their fixed-point value,
+        without going through JSON text.
+
+        :return: Order item as dict.
+        """
+        item: Dict[str, Any] = {key: getattr(self, key) for key in TEXT_FIELDS}
+        item["date"] = str(self.date)
+        for key, value in self.amounts().items():
+            item[key] = value.to_decimal()
+        item.update(self.sent_fields())
+        return item
+
+    @classmethod
+    def from_item(cls, item: Mapping[str, Any]) -> T:
+        """
+        Create an Order from a DynamoDB item. Other item attributes,
+        e.g. fill status, are ignored.
+
+        :param item: Order item with Decimal amounts.
+        :return: Instance of Order object.
+        """
+        return cls.from_fields(item, float)
+
+    def to_row(self) -> Dict[str, str]:
+        """
+        Return Order attributes as an order history CSV row, amounts
+        written in fixed-point notation.
+
+        :return: Dict of CSV_FIELDS values as strings.
+        """
+        row = {key: getattr(self, key) for key in TEXT_FIELDS}
+        row["date"] = str(self.date)
+        for key, value in self.amounts().items():
+            row[key] = str(value)
+        row.update(self.sent_fields())
+        return {key: row.get(key, "") for key in CSV_FIELDS}
+
+    @classmethod
+    def from_row(cls, row: Mapping[str, str]) -> T:
+        """
+        Create an Order from an order history CSV row. Lot and quote
+        decimals are those written in volume and total price.
+
+        :param row: Dict of CSV_FIELDS values as strings.
+        :return: Instance of Order object.
+        """
+        instance = cls.from_fields(row, float)
+        instance.lot_decimals = Money.from_decimal(
+            Decimal(row["volume"])
+        ).decimals
+        instance.quote_decimals = Money.from_decimal(
+            Decimal(row["total_price"])
+        ).decimals
+        return instance
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Return Order attributes as a JSON serializable dict.
+
+        :return: Order as dict.
+        """
+        order = {key: getattr(self, key) for key in ORDER_FIELDS}
+        order["date"] = self.date.isoformat()
+        order.update(self.sent_fields())
+        return order
+
+    @classmethod
+    def from_dict(cls, order: Dict[str, Any]) -> T:
+        """
+        Create an Order from a dict returned by to_dict.
+
+        :param order: Order as dict.
+        :return: Instance of Order object.
+        """
+        instance = cls.from_fields(order, float)
+        instance.lot_decimals = order.get("lot_decimals")
+        instance.quote_decimals = order.get("quote_decimals")
+        return instance
+
+    @classmethod
+    def from_fields(
+        cls, fields: Mapping[str, Any], to_float: Callable[[Any], float]
+    ) -> T:
+        """
+        Create an Order from the fields of an item, row or dict.
+
+        :param fields: Order attributes by name, missing or empty
+        optional attributes are not set.
+        :param to_float: Conversion of amounts to float.
+        :return: Instance of Order object.
+        """
+        texts = [fields[key] for key in TEXT_FIELDS]
+        texts[1] = datetime.fromisoformat(str(texts[1]))
+        limit_factor = fields.get("limit_factor")
+        instance = cls(
+            *texts,
+            *(to_float(fields[key]) for key in AMOUNT_FIELDS),
+            limit_factor=to_float(limit_factor) if limit_factor else None,
+        )
+        for key in SENT_FIELDS:
+            if fields.get(key):
+                setattr(instance, key, fields[key])
+        return instance
+
+    @staticmethod
+    def fixed_order_volume(
+        amount_units: int,
+        amount_decimals: int,
+        price_units: int,
+        price_decimals: int,
+        lot_decimals: int,
+    ) -> int:
+        """
+        Fixed-point version of set_order_volume on scaled integer units.
+
+        :param amount_units: DCA amount in 10**-amount_decimals units.
+        :param amount_decimals: DCA amount decimals.
+        :param price_units: Pair price in 10**-price_decimals units.
+        :param price_decimals: Pair price decimals.
+        :param lot_decimals: Lot decimals as int.
+        :return: Fee adjusted order volume in 10**-lot_decimals units.
+        """
+        if not price_units:
+            raise ZeroDivisionError(
+                "Order set_order_volume -> pair_price must not be 0."
+            )
+        # Floor divisions, // rounds towards negative infinity.
+        order_volume = (
+            amount_units * POWERS_OF_TEN[lot_decimals + price_decimals]
+        ) // (price_units * POWERS_OF_TEN[amount_decimals])
+        # Adjust amount to the 0.26% taker fee on Kraken
+        return (
+            order_volume * POWERS_OF_TEN[TAKER_FEE_FACTOR.decimals]
+        ) // TAKER_FEE_FACTOR.units
 
     @staticmethod
     def set_order_volume(
-        amount: float, pair_price: float, lot_decimals: float
+        amount: float, pair_price: float, lot_decimals: int
     ) -> float:
         """
         Define order volume for specified DCA amount,
@@ -163,23 +419,13 @@ class Order:
 
         :param amount: DCA amount.
         :param pair_price: Pair price.
-        :param lot_decimals: Lot decimals as float.
-        :return: Fee adjusted order volume as flat.
+        :param lot_decimals: Lot decimals as int.
+        :return: Fee adjusted order volume as float.
         """
-        decimals = 10**lot_decimals
-        try:
-            order_volume = (
-                math.floor(amount / pair_price * decimals) / decimals
-            )
-            # Adjust amount to the 0.26% taker fee on Kraken
-            order_volume_fee_adjusted = (
-                math.floor(order_volume / 1.0026 * decimals) / decimals
-            )
-        except ZeroDivisionError:
-            raise ZeroDivisionError(
-                "Order set_order_volume -> pair_price must not be 0."
-            )
-        return order_volume_fee_adjusted
+        order_volume = Order.fixed_order_volume(
+            *float_units(amount), *float_units(pair_price), lot_decimals
+        )
+        return order_volume / 10**lot_decimals
 
     @staticmethod
     def estimate_order_price(
@@ -195,8 +441,14 @@ class Order:
         :param quote_decimals: Quote asset decimals as float.
         :return: Adjusted order price as float.
         """
-        order_price = volume * pair_price
-        return round(order_price, quote_decimals)
+        volume_units, volume_decimals = float_units(volume)
+        price_units, price_decimals = float_units(pair_price)
+        price = rescale_units(
+            volume_units * price_units,
+            volume_decimals + price_decimals,
+            quote_decimals,
+        )
+        return price / 10**quote_decimals
 
     @staticmethod
     def estimate_order_fee(
@@ -212,6 +464,11 @@ class Order:
         :param quote_decimals: Quote asset decimals as float.
         :return: Order fees as float.
         """
-        order_price = volume * pair_price
-        fees = order_price * 0.0026
-        return round(fees, quote_decimals)
+        volume_units, volume_decimals = float_units(volume)
+        price_units, price_decimals = float_units(pair_price)
+        fees = rescale_units(
+            volume_units * price_units * TAKER_FEE.units,
+            volume_decimals + price_decimals + TAKER_FEE.decimals,
+            quote_decimals,
+        )
+        return fees / 10**quote_decimals
@@ -1,5 +1,5 @@
 """Pair object module."""
-from typing import TypeVar
+from typing import Any, Dict, Optional, Tuple, TypeVar
 
 from krakenapi import KrakenApi
 
@@ -7,12 +7,27 @@ from .utils import find_nested_dictionary
 
 T = TypeVar("T", bound="Pair")
 
+# Pair attributes, in constructor order.
+PAIR_FIELDS: Tuple[str, ...] = (
+    "name",
+    "alt_name",
+    "base",
+    "quote",
+    "pair_decimals",
+    "lot_decimals",
+    "quote_decimals",
+    "order_min",
+    "ws_name",
+)
+
 
 class Pair:
     """
     Kraken pair encapsulation.
     """
 
+    __slots__ = PAIR_FIELDS
+
     name: str
     alt_name: str
     base: str
@@ -21,6 +36,7 @@ class Pair:
     lot_decimals: int
     quote_decimals: int
     order_min: float
+    ws_name: Optional[str]
 
     def __init__(
         self,
@@ -32,6 +48,7 @@ class Pair:
         lot_decimals: int,
         quote_decimals: int,
         order_min: float,
+        ws_name: Optional[str] = None,
     ) -> None:
         """
         Initialize the Pair object.
@@ -44,6 +61,7 @@ class Pair:
         :param lot_decimals: Pair lot decimals.
         :param quote_decimals: Pair quote asset decimals.
         :param order_min: Pair minimum order size.
+        :param ws_name: Pair name on Kraken WebSocket API.
         """
         self.name = name
         self.alt_name = alt_name
@@ -53,6 +71,35 @@ class Pair:
         self.lot_decimals = lot_decimals
         self.quote_decimals = quote_decimals
         self.order_min = order_min
+        self.ws_name = ws_name
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Return Pair attributes as a JSON serializable dict.
+
+        :return: Pair as dict.
+        """
+        return {key: getattr(self, key) for key in PAIR_FIELDS}
+
+    @classmethod
+    def from_dict(cls, pair: Dict[str, Any]) -> T:
+        """
+        Create a Pair from a dict returned by to_dict.
+
+        :param pair: Pair as dict.
+        :return: Instance of Pair object.
+        """
+        return cls(
+            str(pair["name"]),
+            str(pair["alt_name"]),
+            str(pair["base"]),
+            str(pair["quote"]),
+            int(pair["pair_decimals"]),
+            int(pair["lot_decimals"]),
+            int(pair["quote_decimals"]),
+            float(pair["order_min"]),
+            pair.get("ws_name"),
+        )
 
     @classmethod
     def get_pair_from_kraken(
@@ -85,6 +132,7 @@ class Pair:
             lot_decimals,
             quote_decimals,
             order_min,
+            pair_information.get("wsname"),
         )
 
     @staticmethod
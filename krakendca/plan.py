@@ -0,0 +1,471 @@
+"""Plan-then-execute DCA pipeline module."""
+import contextvars
+import json
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from krakenapi import KrakenApi
+
+from .clock import ClockService
+from .dca import DCA, checked_system_time
+from .metrics import metric_labels
+from .order import Order
+from .pair import Pair
+from .ticker import TickerFeed
+from .tracing import span
+
+# Kraken returns closed orders by pages of 50 orders.
+CLOSED_ORDERS_PAGE: int = 50
+
+
+class MarketSnapshot:
+    """
+    Consistent view of an account and of the market at planning time:
+    system time checked against Kraken, balances, open orders, closed
+    orders of the longest DCA delay window and pairs ask prices.
+    """
+
+    date: datetime
+    balance: Dict[str, Any]
+    open_orders: dict
+    closed_orders: dict
+    ask_prices: Dict[str, float]
+
+    def __init__(
+        self,
+        date: datetime,
+        balance: Dict[str, Any],
+        open_orders: dict,
+        closed_orders: dict,
+        ask_prices: Dict[str, float],
+    ) -> None:
+        """
+        Initialize the MarketSnapshot object.
+
+        :param date: Current system date as datetime.
+        :param balance: Account balance per asset.
+        :param open_orders: Open orders as dictionary.
+        :param closed_orders: Closed orders as dictionary.
+        :param ask_prices: Ask price per pair name.
+        """
+        self.date = date
+        self.balance = balance
+        self.open_orders = open_orders
+        self.closed_orders = closed_orders
+        self.ask_prices = ask_prices
+
+    @classmethod
+    def fetch(
+        cls,
+        ka: KrakenApi,
+        dcas: List[DCA],
+        clock: Optional[ClockService] = None,
+        ticker: Optional[TickerFeed] = None,
+    ) -> "MarketSnapshot":
+        """
+        Read the snapshot from Kraken with one call per endpoint:
+        closed orders are fetched once for the longest delay window and
+        ask prices with a single ticker call for all pairs.
+
+        :param ka: KrakenApi object.
+        :param dcas: DCA objects to snapshot.
+        :param clock: Run ClockService, Kraken time is requested without.
+        :param ticker: TickerFeed, fresh prices aren't requested.
+        :return: Instance of MarketSnapshot object.
+        """
+        if clock is not None:
+            date = clock.checked_now()
+        else:
+            date = checked_system_time(ka)
+        trade_balance = ka.get_trade_balance().get("eb")
+        print(f"Current trade balance: {trade_balance} ZUSD.")
+        balance = ka.get_balance()
+        open_orders = ka.get_open_orders()
+        start = min(dca.daily_orders_start(date) for dca in dcas)
+        closed_orders = cls.fetch_closed_orders(ka, start)
+        ask_prices = cls.fetch_ask_prices(
+            ka, [dca.pair for dca in dcas], ticker
+        )
+        return cls(date, balance, open_orders, closed_orders, ask_prices)
+
+    @staticmethod
+    def fetch_closed_orders(ka: KrakenApi, start: int) -> dict:
+        """
+        Get every closed order opened since start, page by page.
+
+        :param ka: KrakenApi object.
+        :param start: Unix time of the first order.
+        :return: Closed orders as dictionary.
+        """
+        closed_orders: dict = {}
+        while True:
+            page = ka.get_closed_orders(
+                {
+                    "start": start,
+                    "closetime": "open",
+                    "ofs": len(closed_orders),
+                }
+            )
+            closed_orders.update(page)
+            if len(page) < CLOSED_ORDERS_PAGE:
+                return closed_orders
+
+    @staticmethod
+    def fetch_ask_prices(
+        ka: KrakenApi, pairs: List[Pair], ticker: Optional[TickerFeed] = None
+    ) -> Dict[str, float]:
+        """
+        Get pairs ask prices from the ticker feed when fresh, others
+        with one ticker call. Pairs missing from the answer, also looked
+        up by alternative name, are fetched one by one.
+
+        :param ka: KrakenApi object.
+        :param pairs: Pair objects.
+        :param ticker: TickerFeed object.
+        :return: Ask price per pair name.
+        """
+        ask_prices = {}
+        if ticker is not None:
+            for pair in pairs:
+                ask_price = ticker.ask_price(pair.name)
+                if ask_price is not None:
+                    ask_prices[pair.name] = ask_price
+        pairs = [pair for pair in pairs if pair.name not in ask_prices]
+        if not pairs:
+            return ask_prices
+        names = list(dict.fromkeys(pair.name for pair in pairs))
+        ticker_information = ka.get_pair_ticker(",".join(names))
+        for pair in pairs:
+            information = ticker_information.get(
+                pair.name
+            ) or ticker_information.get(pair.alt_name)
+            if information is None:
+                ask_prices[pair.name] = Pair.get_pair_ask_price(ka, pair.name)
+            else:
+                ask_prices[pair.name] = float(information.get("a")[0])
+        return ask_prices
+
+    def closed_orders_since(self, start: int) -> dict:
+        """
+        Filter closed orders opened since start.
+
+        :param start: Unix time.
+        :return: Closed orders as dictionary.
+        """
+        return {
+            order_id: order_infos
+            for order_id, order_infos in self.closed_orders.items()
+            if order_infos.get("opentm", 0) >= start
+        }
+
+
+class PlannedOrder:
+    """
+    Planning decision of one DCA pair: an order or a ladder of orders
+    to submit, a reason to skip the pair or an error aborting the
+    execution at this pair.
+    """
+
+    pair: str
+    order: Optional[Order]
+    skip_reason: Optional[str]
+    error: Optional[str]
+    ladder: List[Order]
+
+    def __init__(
+        self,
+        pair: str,
+        order: Optional[Order] = None,
+        skip_reason: Optional[str] = None,
+        error: Optional[str] = None,
+        ladder: Optional[List[Order]] = None,
+    ) -> None:
+        """
+        Initialize the PlannedOrder object.
+
+        :param pair: DCA pair name.
+        :param order: Order to submit.
+        :param skip_reason: Reason of not buying the pair.
+        :param error: Error message of the pair.
+        :param ladder: Orders of a ladder, submitted in one batch.
+        """
+        self.pair = pair
+        self.order = order
+        self.skip_reason = skip_reason
+        self.error = error
+        self.ladder = ladder or []
+
+    @property
+    def orders(self) -> List[Order]:
+        return [self.order] if self.order else list(self.ladder)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "pair": self.pair,
+            "order": self.order.to_dict() if self.order else None,
+            "skip_reason": self.skip_reason,
+            "error": self.error,
+            "ladder": [order.to_dict() for order in self.ladder],
+        }
+
+    @classmethod
+    def from_dict(cls, item: Dict[str, Any]) -> "PlannedOrder":
+        order = item.get("order")
+        return cls(
+            item["pair"],
+            Order.from_dict(order) if order else None,
+            item.get("skip_reason"),
+            item.get("error"),
+            [Order.from_dict(order) for order in item.get("ladder", [])],
+        )
+
+
+class DCAPlan:
+    """
+    Serializable list of planned orders of an account, in DCA order.
+    """
+
+    user_name: str
+    date: datetime
+    items: List[PlannedOrder]
+
+    def __init__(
+        self, user_name: str, date: datetime, items: List[PlannedOrder]
+    ) -> None:
+        self.user_name = user_name
+        self.date = date
+        self.items = items
+
+    @property
+    def orders(self) -> List[Order]:
+        return [order for item in self.items for order in item.orders]
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                "user_name": self.user_name,
+                "date": self.date.isoformat(),
+                "items": [item.to_dict() for item in self.items],
+            }
+        )
+
+    @classmethod
+    def from_json(cls, plan: str) -> "DCAPlan":
+        plan = json.loads(plan)
+        return cls(
+            plan["user_name"],
+            datetime.fromisoformat(plan["date"]),
+            [PlannedOrder.from_dict(item) for item in plan["items"]],
+        )
+
+
+def plan_dca(
+    dca: DCA, snapshot: MarketSnapshot, balance: Dict[str, Any]
+) -> PlannedOrder:
+    """
+    Decide the order of a DCA pair from a snapshot, without any API call.
+
+    :param dca: DCA object.
+    :param snapshot: MarketSnapshot object.
+    :param balance: Account balance left by previously planned orders.
+    :return: PlannedOrder object.
+    """
+    pair = dca.pair
+    try:
+        dca.check_balance(balance)
+    except ValueError as e:
+        return PlannedOrder(pair.name, error=str(e))
+    closed_orders = snapshot.closed_orders_since(
+        dca.daily_orders_start(snapshot.date)
+    )
+    if dca.count_daily_orders(snapshot.open_orders, closed_orders) != 0:
+        return PlannedOrder(
+            pair.name,
+            skip_reason=(
+                f"No DCA for {pair.name}: Already placed an order today."
+            ),
+        )
+    print("Didn't DCA already today.")
+    pair_ask_price = snapshot.ask_prices[pair.name]
+    print(f"Current {pair.name} ask price: {pair_ask_price}.")
+    limit_price = dca.get_limit_price(pair_ask_price, pair.pair_decimals)
+    skip_reason = dca.check_max_price(limit_price)
+    if skip_reason:
+        return PlannedOrder(pair.name, skip_reason=skip_reason)
+    if dca.ladder:
+        orders = dca.create_ladder_orders(snapshot.date, limit_price)
+    else:
+        orders = [dca.create_order(snapshot.date, limit_price)]
+    try:
+        for order in orders:
+            dca.check_order_volume(order)
+    except ValueError as e:
+        return PlannedOrder(pair.name, error=str(e))
+    if dca.ladder:
+        return PlannedOrder(pair.name, ladder=orders)
+    return PlannedOrder(pair.name, order=orders[0])
+
+
+def plan_dcas(
+    user_name: str, dcas: List[DCA], snapshot: MarketSnapshot
+) -> DCAPlan:
+    """
+    Plan the orders of every DCA pair from one snapshot. The quote
+    balance of each planned order is deducted for the next pairs.
+
+    :param user_name: User name of the account.
+    :param dcas: DCA objects.
+    :param snapshot: MarketSnapshot object.
+    :return: DCAPlan object.
+    """
+    balance = dict(snapshot.balance)
+    items = []
+    for dca in dcas:
+        print(dca)
+        item = plan_dca(dca, snapshot, balance)
+        if item.skip_reason:
+            print(item.skip_reason)
+        if item.orders:
+            quote = dca.pair.quote
+            balance[quote] = float(balance.get(quote) or 0) - sum(
+                order.total_price for order in item.orders
+            )
+        items.append(item)
+    return DCAPlan(user_name, snapshot.date, items)
+
+
+def execute_plan(
+    plan: DCAPlan, dcas: List[DCA], max_concurrent_orders: int = 1
+) -> None:
+    """
+    Submit planned orders and save them to Dynamo DB.
+    Ladders are sent with one AddOrderBatch call and saved with batch
+    writes.
+    Up to max_concurrent_orders AddOrder calls run concurrently, which
+    requires a client with a shared nonce sequence (KrakenClient) and
+    preferably a nonce window on the API key: calls may reach Kraken
+    out of nonce order, a call rejected for its nonce is sent again
+    with a new one.
+    Results are printed and saved in plan order, each Order object
+    holding the TXID and description of its own AddOrder answer.
+    Orders after a planned error are not submitted and the error is
+    raised after saving the submitted orders, as is the first
+    submission error.
+
+    :param plan: DCAPlan object.
+    :param dcas: DCA objects of the plan pairs.
+    :param max_concurrent_orders: Maximum number of concurrent AddOrder
+    calls.
+    :return: None
+    """
+    dcas_by_pair = {dca.pair.name: dca for dca in dcas}
+    # Errors by plan position, the first one is raised.
+    errors: Dict[int, Exception] = {}
+    items = []
+    for position, item in enumerate(plan.items):
+        if item.error:
+            errors[position] = ValueError(item.error)
+            break
+        if item.orders:
+            items.append((position, item))
+    submitted: List[Future] = []
+    saves: List[Future] = []
+    # Set by the first failed submission: orders not sent yet are not
+    # sent anymore.
+    stop = threading.Event()
+    with ThreadPoolExecutor(max_workers=1) as persistence:
+        try:
+            with ThreadPoolExecutor(
+                max_workers=max_concurrent_orders
+            ) as submission:
+                for position, item in items:
+                    dca = dcas_by_pair[item.pair]
+                    with metric_labels(pair=item.pair):
+                        try:
+                            for order in item.orders:
+                                dca.print_order_information(order)
+                        except ValueError as e:
+                            errors[position] = e
+                            break
+                        context = contextvars.copy_context()
+                    submitted.append(
+                        submission.submit(
+                            context.run,
+                            send_planned_order,
+                            dca,
+                            item,
+                            stop,
+                        )
+                    )
+                for (position, item), future in zip(items, submitted):
+                    if future.exception() is not None:
+                        errors[position] = future.exception()
+                    elif not future.result():
+                        continue
+                    # Rungs of a ladder accepted by Kraken are saved
+                    # even if others were rejected.
+                    orders = [
+                        order
+                        for order in item.orders
+                        if hasattr(order, "txid")
+                    ]
+                    if not orders:
+                        continue
+                    dca = dcas_by_pair[item.pair]
+                    for order in orders:
+                        dca.print_order_result(order)
+                    with metric_labels(pair=item.pair):
+                        context = contextvars.copy_context()
+                    saves.append(
+                        persistence.submit(
+                            context.run, save_orders, dca, orders
+                        )
+                    )
+        finally:
+            for save in saves:
+                save.result()
+    if errors:
+        raise errors[min(errors)]
+
+
+def send_planned_order(
+    dca: DCA, item: PlannedOrder, stop: threading.Event
+) -> bool:
+    """
+    Send the order or the ladder of a planned item unless a previous
+    submission failed.
+
+    :param dca: DCA object of the order.
+    :param item: PlannedOrder object.
+    :param stop: Event set when a submission failed.
+    :return: True if the order was sent.
+    """
+    if stop.is_set():
+        return False
+    try:
+        if item.ladder:
+            submit_ladder(dca, item.ladder)
+        else:
+            submit_order(dca, item.order)
+    except Exception:
+        stop.set()
+        raise
+    return True
+
+
+def submit_order(dca: DCA, order: Order) -> None:
+    with span("dca.order_submit"):
+        order.send_order(dca.ka)
+
+
+def submit_ladder(dca: DCA, orders: List[Order]) -> None:
+    with span("dca.order_submit"):
+        Order.send_order_batch(dca.ka, orders)
+
+
+def save_orders(dca: DCA, orders: List[Order]) -> None:
+    with span("dca.persistence"):
+        dca.order_store.save_orders(orders)
+    print(f"Order information saved to {dca.order_store}.")
@@ -0,0 +1,193 @@
+"""Opt-in CPU and memory profiling module."""
+import cProfile
+import io
+import os
+import pstats
+import shutil
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+
+PROFILE_ENV: str = "KRAKEN_DCA_PROFILE"
+PROFILE_EVERY_ENV: str = "KRAKEN_DCA_PROFILE_EVERY"
+PROFILE_OUTPUT_ENV: str = "KRAKEN_DCA_PROFILE_OUTPUT"
+PROFILE_TOP_ENV: str = "KRAKEN_DCA_PROFILE_TOP"
+DEFAULT_OUTPUT: str = "profiles"
+DEFAULT_EVERY: int = 1
+DEFAULT_TOP: int = 25
+TRACEMALLOC_FRAMES: int = 10
+
+# Invocations per profiled name, kept across warm Lambda invocations.
+_invocations: Counter = Counter()
+
+
+def positive_int_env(name: str, default: int) -> int:
+    """
+    Return a positive integer environment variable, or the default with
+    a warning if it is malformed, so profiling never aborts a run.
+
+    :param name: Environment variable name.
+    :param default: Value if not set or malformed.
+    :return: Integer value >= 1.
+    """
+    value = os.environ.get(name)
+    if not value:
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        print(
+            f"Ignoring {name}={value!r}, must be an integer >= 1,"
+            f" using {default}."
+        )
+        return default
+    return number
+
+
+def profiling_enabled(name: str) -> bool:
+    """
+    Count an invocation and tell if it must be profiled: profiling is
+    enabled with KRAKEN_DCA_PROFILE=1 and samples every Nth invocation
+    with KRAKEN_DCA_PROFILE_EVERY=N (default 1).
+
+    :param name: Profiled code name.
+    :return: True if this invocation is profiled.
+    """
+    if os.environ.get(PROFILE_ENV, "").lower() not in ("1", "true", "yes"):
+        return False
+    _invocations[name] += 1
+    every = positive_int_env(PROFILE_EVERY_ENV, DEFAULT_EVERY)
+    return (_invocations[name] - 1) % every == 0
+
+
+def allocation_report(
+    snapshot: tracemalloc.Snapshot, peak: int, top: int
+) -> str:
+    """
+    Return the top allocation sites of a tracemalloc snapshot as text.
+
+    :param snapshot: tracemalloc snapshot.
+    :param peak: Peak traced memory in bytes.
+    :param top: Number of allocation sites.
+    :return: Report as string.
+    """
+    snapshot = snapshot.filter_traces(
+        (
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        )
+    )
+    statistics = snapshot.statistics("traceback")
+    total = sum(statistic.size for statistic in statistics)
+    lines = [
+        f"Peak traced memory: {peak / 1024:.1f} KiB",
+        f"Traced memory at end: {total / 1024:.1f} KiB",
+        f"Top {top} allocation sites:",
+    ]
+    for index, statistic in enumerate(statistics[:top], start=1):
+        lines.append(
+            f"#{index}: {statistic.size / 1024:.1f} KiB "
+            f"in {statistic.count} blocks"
+        )
+        lines.extend(f"    {line}" for line in statistic.traceback.format())
+    return "\n".join(lines) + "\n"
+
+
+def write_output(directory: Path, output: str) -> str:
+    """
+    Copy profile files of a local directory to the output location:
+    a local directory or s3://bucket/prefix (S3-compatible storage,
+    endpoint set with AWS_ENDPOINT_URL_S3 if not AWS).
+
+    :param directory: Directory holding the profile files.
+    :param output: Output location.
+    :return: Output location of the files.
+    """
+    if output.startswith("s3://"):
+        import boto3
+
+        bucket, _, prefix = output.split("://", 1)[1].partition("/")
+        client = boto3.client(
+            "s3", endpoint_url=os.environ.get("AWS_ENDPOINT_URL_S3")
+        )
+        for path in sorted(directory.iterdir()):
+            key = f"{prefix.rstrip('/')}/{path.name}".lstrip("/")
+            client.upload_file(str(path), bucket, key)
+        return output
+    output_directory = Path(output)
+    output_directory.mkdir(parents=True, exist_ok=True)
+    for path in directory.iterdir():
+        shutil.move(str(path), str(output_directory / path.name))
+    return str(output_directory)
+
+
+@contextmanager
+def profiled(name: str, output: Optional[str] = None) -> Iterator[None]:
+    """
+    Profile the block with cProfile and tracemalloc when enabled by the
+    environment, and write <name>-<time>-<pid>.pstats and
+    <name>-<time>-<pid>-report.txt (top functions by cumulative time and top
+    allocation sites) to KRAKEN_DCA_PROFILE_OUTPUT
+    (default ./profiles). Writing errors never fail the profiled code.
+
+    :param name: Profiled code name.
+    :param output: Output location overriding the environment variable.
+    :return: Context manager.
+    """
+    if not profiling_enabled(name):
+        yield
+        return
+    started_tracemalloc = not tracemalloc.is_tracing()
+    if started_tracemalloc:
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+    elif hasattr(tracemalloc, "reset_peak"):  # Python >= 3.9
+        tracemalloc.reset_peak()
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        snapshot = tracemalloc.take_snapshot()
+        peak = tracemalloc.get_traced_memory()[1]
+        if started_tracemalloc:
+            tracemalloc.stop()
+        try:
+            save_profile(name, profile, snapshot, peak, output)
+        except Exception as e:
+            print(f"Profiling output of {name} not saved: {e}")
+
+
+def save_profile(
+    name: str,
+    profile: cProfile.Profile,
+    snapshot: tracemalloc.Snapshot,
+    peak: int,
+    output: Optional[str] = None,
+) -> str:
+    """
+    Write the pstats and allocation report of a profiled run.
+
+    :return: Output location of the files.
+    """
+    output = output or os.environ.get(PROFILE_OUTPUT_ENV, DEFAULT_OUTPUT)
+    top = positive_int_env(PROFILE_TOP_ENV, DEFAULT_TOP)
+    stem = f"{name}-{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        profile.dump_stats(str(directory / f"{stem}.pstats"))
+        report = io.StringIO()
+        stats = pstats.Stats(profile, stream=report)
+        stats.sort_stats("cumulative").print_stats(top)
+        report.write("\n")
+        report.write(allocation_report(snapshot, peak, top))
+        (directory / f"{stem}-report.txt").write_text(report.getvalue())
+        location = write_output(directory, output)
+    print(f"Profile of {name} saved to {location}.")
+    return location
@@ -0,0 +1,389 @@
+"""Order store backends module."""
+import csv
+import json
+import os
+import sqlite3
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import boto3
+
+from .export import chunked, ledger_rows, scan_rows
+from .metrics import METRICS
+from .order import CSV_FIELDS, Order
+
+ORDER_STORE_BACKENDS = ("dynamodb", "sqlite", "csv", "ndjson")
+# DynamoDB BatchWriteItem accepts up to 25 items.
+DEFAULT_BATCH_SIZE: int = 25
+DEFAULT_ORDERS_TABLE: str = "kraken-dca"
+DEFAULT_REGION: str = "us-east-1"
+
+
+class OrderStore:
+    """
+    Storage of the orders sent to Kraken.
+    Orders are written by batches of batch_size, either right away by
+    save_orders, or buffered by add and written in the background by
+    flush.
+    """
+
+    batch_size: int
+    pending: List[Order]
+
+    def __init__(self, batch_size: int = DEFAULT_BATCH_SIZE) -> None:
+        self.batch_size = batch_size
+        self.pending = []
+        self._lock = threading.Lock()
+        self._writer: Optional[ThreadPoolExecutor] = None
+
+    @staticmethod
+    def from_config(options: Optional[Dict[str, Any]]) -> "OrderStore":
+        """
+        Return the order store of the order_store configuration: the
+        kraken-dca DynamoDB table in us-east-1 by default.
+
+        :param options: order_store configuration, with backend, table,
+        region and endpoint_url for DynamoDB, path for other backends
+        and batch_size.
+        :return: OrderStore object.
+        """
+        options = options or {}
+        backend = options.get("backend", "dynamodb")
+        batch_size = options.get("batch_size", DEFAULT_BATCH_SIZE)
+        if backend == "dynamodb":
+            return DynamoOrderStore(
+                options.get("table", DEFAULT_ORDERS_TABLE),
+                options.get("region", DEFAULT_REGION),
+                options.get("endpoint_url"),
+                batch_size,
+            )
+        stores = {
+            "sqlite": SQLiteOrderStore,
+            "csv": CSVOrderStore,
+            "ndjson": NDJSONOrderStore,
+        }
+        if backend not in stores:
+            raise ValueError(
+                "order_store backend must be one of "
+                f"{', '.join(ORDER_STORE_BACKENDS)}."
+            )
+        return stores[backend](options["path"], batch_size)
+
+    def save_orders(self, orders: List[Order]) -> None:
+        """
+        Write orders now, by batches of batch_size.
+
+        :param orders: Order objects.
+        :return: None
+        """
+        for batch in chunked(orders, self.batch_size):
+            self.write_batch(batch)
+
+    def add(self, orders: List[Order]) -> Optional[Future]:
+        """
+        Buffer orders, flushed once batch_size orders are pending.
+
+        :param orders: Order objects.
+        :return: Future of the flush if one was started, None otherwise.
+        """
+        with self._lock:
+            self.pending.extend(orders)
+            if len(self.pending) < self.batch_size:
+                return None
+        return self.flush()
+
+    def flush(self) -> Future:
+        """
+        Write the pending orders from a background thread. Flushes are
+        written in order.
+
+        :return: Future of the write, its result is None.
+        """
+        with self._lock:
+            orders, self.pending = self.pending, []
+            if self._writer is None:
+                self._writer = ThreadPoolExecutor(max_workers=1)
+            return self._writer.submit(self.save_orders, orders)
+
+    def close(self) -> None:
+        """
+        Write the pending orders and wait for every flush.
+
+        :return: None
+        """
+        if self.pending:
+            self.flush()
+        if self._writer is not None:
+            self._writer.shutdown(wait=True)
+            self._writer = None
+
+    def write_batch(self, orders: List[Order]) -> None:
+        raise NotImplementedError
+
+    def read_orders(
+        self,
+        user: Optional[str] = None,
+        pair: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> Iterator[Order]:
+        """
+        Read the stored orders of a user, a pair and a date range.
+
+        :param user: User name, all users if None.
+        :param pair: Pair name, all pairs if None.
+        :param start: First date included, unbounded if None.
+        :param end: Last date excluded, unbounded if None.
+        :return: Iterator of Order objects.
+        """
+        raise NotImplementedError
+
+
+class DynamoOrderStore(OrderStore):
+    """
+    Orders in a DynamoDB table keyed by txid, one item per order.
+    """
+
+    table_name: str
+    region: str
+    endpoint_url: Optional[str]
+
+    def __init__(
+        self,
+        table_name: str = DEFAULT_ORDERS_TABLE,
+        region: str = DEFAULT_REGION,
+        endpoint_url: Optional[str] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> None:
+        """
+        Initialize the DynamoOrderStore object.
+
+        :param table_name: DynamoDB orders table name.
+        :param region: AWS region of the table.
+        :param endpoint_url: DynamoDB endpoint, e.g. DynamoDB Local.
+        :param batch_size: Number of orders per batch write.
+        """
+        super().__init__(batch_size)
+        self.table_name = table_name
+        self.region = region
+        self.endpoint_url = endpoint_url
+
+    def __str__(self) -> str:
+        return "Dynamo DB"
+
+    def table(self):
+        client = boto3.resource(
+            "dynamodb",
+            region_name=self.region,
+            endpoint_url=self.endpoint_url,
+        )
+        return client.Table(self.table_name)
+
+    def write_batch(self, orders: List[Order]) -> None:
+        table = self.table()
+        if len(orders) == 1:
+            with METRICS.timed("dynamodb", "PutItem"):
+                table.put_item(Item=orders[0].to_item())
+            return
+        with METRICS.timed("dynamodb", "BatchWriteItem"):
+            with table.batch_writer() as batch:
+                for order in orders:
+                    batch.put_item(Item=order.to_item())
+
+    def read_orders(
+        self,
+        user: Optional[str] = None,
+        pair: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> Iterator[Order]:
+        rows = scan_rows(
+            self.table_name,
+            user,
+            pair,
+            start,
+            end,
+            endpoint_url=self.endpoint_url,
+            region=self.region,
+        )
+        return (Order.from_row(row) for row in rows)
+
+
+class SQLiteOrderStore(OrderStore):
+    """
+    Orders in a local SQLite database, one row per order keyed by txid
+    with amounts in fixed-point text.
+    """
+
+    path: Path
+
+    def __init__(
+        self, path: str, batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> None:
+        """
+        Initialize the SQLiteOrderStore object.
+
+        :param path: SQLite database path, created on first use.
+        :param batch_size: Number of orders per transaction.
+        """
+        super().__init__(batch_size)
+        self.path = Path(path)
+
+    def __str__(self) -> str:
+        return f"SQLite {self.path}"
+
+    def connect(self) -> sqlite3.Connection:
+        # One connection per call, orders are saved from worker threads.
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(str(self.path))
+        columns = ", ".join(
+            f"{key} TEXT PRIMARY KEY" if key == "txid" else f"{key} TEXT"
+            for key in CSV_FIELDS
+        )
+        connection.execute(f"CREATE TABLE IF NOT EXISTS orders ({columns})")
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS orders_user_pair_date "
+            "ON orders (user_name, pair, date)"
+        )
+        return connection
+
+    def write_batch(self, orders: List[Order]) -> None:
+        rows = [order.to_row() for order in orders]
+        placeholders = ", ".join(f":{key}" for key in CSV_FIELDS)
+        with closing(self.connect()) as connection, connection:
+            connection.executemany(
+                f"INSERT OR REPLACE INTO orders ({', '.join(CSV_FIELDS)}) "
+                f"VALUES ({placeholders})",
+                rows,
+            )
+
+    def read_orders(
+        self,
+        user: Optional[str] = None,
+        pair: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> Iterator[Order]:
+        conditions = []
+        parameters: Dict[str, str] = {}
+        if user is not None:
+            conditions.append("user_name = :user")
+            parameters["user"] = user
+        if pair is not None:
+            conditions.append("pair = :pair")
+            parameters["pair"] = pair
+        # Dates are saved as str(datetime), ordered as text.
+        if start is not None:
+            conditions.append("date >= :start")
+            parameters["start"] = str(start)
+        if end is not None:
+            conditions.append("date < :end")
+            parameters["end"] = str(end)
+        query = f"SELECT {', '.join(CSV_FIELDS)} FROM orders"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        with closing(self.connect()) as connection:
+            cursor = connection.execute(query + " ORDER BY date", parameters)
+            for values in cursor:
+                yield Order.from_row(dict(zip(CSV_FIELDS, values)))
+
+
+class FileOrderStore(OrderStore):
+    """
+    Orders appended to a local file, one line per order.
+    """
+
+    path: Path
+
+    def __init__(
+        self, path: str, batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> None:
+        """
+        Initialize the FileOrderStore object.
+
+        :param path: File path, created on first write.
+        :param batch_size: Number of orders per append.
+        """
+        super().__init__(batch_size)
+        self.path = Path(path)
+        self._file_lock = threading.Lock()
+
+    def write_batch(self, orders: List[Order]) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._file_lock, open(self.path, "a", newline="") as stream:
+            self.append(stream, orders)
+            stream.flush()
+            os.fsync(stream.fileno())
+
+    def append(self, stream: Any, orders: List[Order]) -> None:
+        raise NotImplementedError
+
+
+class CSVOrderStore(FileOrderStore):
+    """
+    Orders appended to an order history CSV file.
+    """
+
+    def __str__(self) -> str:
+        return f"CSV {self.path}"
+
+    def append(self, stream: Any, orders: List[Order]) -> None:
+        writer = csv.DictWriter(stream, fieldnames=CSV_FIELDS)
+        if stream.tell() == 0:
+            writer.writeheader()
+        writer.writerows(order.to_row() for order in orders)
+
+    def read_orders(
+        self,
+        user: Optional[str] = None,
+        pair: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> Iterator[Order]:
+        if not self.path.exists():
+            return
+        with open(self.path, newline="") as stream:
+            for row in ledger_rows(stream, user, pair, start, end):
+                yield Order.from_row(row)
+
+
+class NDJSONOrderStore(FileOrderStore):
+    """
+    Orders appended to a newline delimited JSON file, one Order.to_dict
+    object per line.
+    """
+
+    def __str__(self) -> str:
+        return f"NDJSON {self.path}"
+
+    def append(self, stream: Any, orders: List[Order]) -> None:
+        stream.writelines(
+            json.dumps(order.to_dict()) + "\n" for order in orders
+        )
+
+    def read_orders(
+        self,
+        user: Optional[str] = None,
+        pair: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> Iterator[Order]:
+        if not self.path.exists():
+            return
+        with open(self.path) as stream:
+            for line in stream:
+                order = json.loads(line)
+                if user is not None and order["user_name"] != user:
+                    continue
+                if pair is not None and order["pair"] != pair:
+                    continue
+                # Dates are saved in ISO format, ordered as text.
+                if start is not None and order["date"] < start.isoformat():
+                    continue
+                if end is not None and order["date"] >= end.isoformat():
+                    continue
+                yield Order.from_dict(order)
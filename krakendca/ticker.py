@@ -0,0 +1,229 @@
+"""Kraken WebSocket ticker feed module."""
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+TICKER_FEED_ENV: str = "KRAKEN_DCA_TICKER_FEED"
+PUBLIC_WS_URL: str = "wss://ws.kraken.com"
+# Ticker messages are only sent on trades: older prices of quiet pairs
+# are requested from the REST ticker.
+DEFAULT_MAX_AGE: float = 10
+RECONNECT_WAIT: float = 5
+
+
+class Quote:
+    """
+    Best ask and bid prices of a pair at reception time.
+    """
+
+    ask: float
+    bid: float
+    received: float
+
+    def __init__(self, ask: float, bid: float, received: float) -> None:
+        """
+        Initialize the Quote object.
+
+        :param ask: Best ask price.
+        :param bid: Best bid price.
+        :param received: time.monotonic() of the ticker message.
+        """
+        self.ask = ask
+        self.bid = bid
+        self.received = received
+
+    def age(self) -> float:
+        return time.monotonic() - self.received
+
+
+class TickerFeed:
+    """
+    Best ask/bid table kept up to date in background by Kraken public
+    WebSocket ticker channel. Needs the websocket-client package.
+    """
+
+    url: str
+    max_age: float
+    ws_names: Dict[str, str]
+    quotes: Dict[str, Quote]
+
+    def __init__(
+        self, url: str = PUBLIC_WS_URL, max_age: float = DEFAULT_MAX_AGE
+    ) -> None:
+        """
+        Initialize the TickerFeed object.
+
+        :param url: Kraken public WebSocket URL.
+        :param max_age: Seconds after which a quote is not fresh anymore.
+        """
+        self.url = url
+        self.max_age = max_age
+        self.ws_names = {}
+        self.quotes = {}
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.connection = None
+        self.thread = None
+
+    @classmethod
+    def from_environment(cls) -> Optional["TickerFeed"]:
+        """
+        Start a TickerFeed if KRAKEN_DCA_TICKER_FEED is set to 1 or to
+        a WebSocket URL.
+
+        :return: Started TickerFeed object, None if disabled.
+        """
+        setting = os.environ.get(TICKER_FEED_ENV, "")
+        if setting in ("", "0"):
+            return None
+        feed = cls(setting if "://" in setting else PUBLIC_WS_URL)
+        feed.start()
+        return feed
+
+    def start(self) -> None:
+        """
+        Connect and receive ticker messages in a daemon thread.
+
+        :return: None
+        """
+        import websocket  # noqa: F401 Fail now if not installed.
+
+        self.thread = threading.Thread(
+            target=self.run, name="ticker-feed", daemon=True
+        )
+        self.thread.start()
+
+    def stop(self) -> None:
+        """
+        Close the connection and wait for the feed thread.
+
+        :return: None
+        """
+        self.stopped.set()
+        connection = self.connection
+        if connection is not None:
+            connection.close()
+        if self.thread is not None:
+            self.thread.join(RECONNECT_WAIT)
+
+    def subscribe(self, pairs: Iterable[Tuple[str, str]]) -> None:
+        """
+        Subscribe to the ticker of pairs, also after reconnections.
+
+        :param pairs: Pair name and WebSocket name couples.
+        :return: None
+        """
+        new_pairs = {
+            name: ws_name
+            for name, ws_name in pairs
+            if ws_name and name not in self.ws_names
+        }
+        if not new_pairs:
+            return
+        with self.lock:
+            self.ws_names.update(new_pairs)
+            connection = self.connection
+        if connection is not None:
+            self.send_subscription(connection, new_pairs.values())
+
+    def ask_price(self, pair_name: str) -> Optional[float]:
+        """
+        Return the pair best ask price if received less than max_age
+        seconds ago.
+
+        :param pair_name: Pair name.
+        :return: Ask price, None without fresh quote.
+        """
+        quote = self.quotes.get(pair_name)
+        if quote is None or quote.age() > self.max_age:
+            return None
+        return quote.ask
+
+    def wait_for_prices(
+        self, pair_names: Iterable[str], timeout: float
+    ) -> bool:
+        """
+        Wait until every pair has a fresh quote.
+
+        :param pair_names: Pair names.
+        :param timeout: Maximum wait in seconds.
+        :return: True if every price is fresh.
+        """
+        deadline = time.monotonic() + timeout
+        pair_names = list(pair_names)
+        while True:
+            if all(self.ask_price(name) for name in pair_names):
+                return True
+            if time.monotonic() >= deadline or self.stopped.is_set():
+                return False
+            time.sleep(0.01)
+
+    def run(self) -> None:
+        """
+        Receive ticker messages, reconnecting after connection errors
+        until stopped.
+
+        :return: None
+        """
+        import websocket
+
+        while not self.stopped.is_set():
+            try:
+                connection = websocket.create_connection(self.url, timeout=30)
+                with self.lock:
+                    self.connection = connection
+                    ws_names = list(self.ws_names.values())
+                if ws_names:
+                    self.send_subscription(connection, ws_names)
+                while not self.stopped.is_set():
+                    self.handle_message(connection.recv())
+            except Exception as e:
+                if self.stopped.is_set():
+                    break
+                print(
+                    f"Ticker feed error: {e!r}. "
+                    f"Reconnecting in {RECONNECT_WAIT}sc..."
+                )
+                self.stopped.wait(RECONNECT_WAIT)
+            finally:
+                with self.lock:
+                    connection, self.connection = self.connection, None
+                if connection is not None:
+                    connection.close()
+
+    @staticmethod
+    def send_subscription(connection: Any, ws_names: Iterable[str]) -> None:
+        connection.send(
+            json.dumps(
+                {
+                    "event": "subscribe",
+                    "pair": list(ws_names),
+                    "subscription": {"name": "ticker"},
+                }
+            )
+        )
+
+    def handle_message(self, message: str) -> None:
+        """
+        Update the quote table from a ticker message, events such as
+        heartbeats are ignored.
+
+        :param message: WebSocket text message.
+        :return: None
+        """
+        data = json.loads(message)
+        if isinstance(data, dict):
+            if data.get("status") == "error":
+                print(f"Ticker feed error: {data.get('errorMessage')}.")
+            return
+        if len(data) < 4 or data[-2] != "ticker":
+            return
+        ws_name, ticker = data[-1], data[1]
+        quote = Quote(
+            float(ticker["a"][0]), float(ticker["b"][0]), time.monotonic()
+        )
+        for name, pair_ws_name in list(self.ws_names.items()):
+            if pair_ws_name == ws_name:
+                self.quotes[name] = quote
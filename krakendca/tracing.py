@@ -0,0 +1,197 @@
+"""DCA run phases tracing module."""
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from .metrics import current_labels
+
+TRACING_ENV: str = "KRAKEN_DCA_TRACING"
+TRACE_FILE_ENV: str = "KRAKEN_DCA_TRACE_FILE"
+DEFAULT_TRACE_FILE: str = "krakendca-trace.jsonl"
+
+
+class NoopBackend:
+    """
+    Tracing disabled.
+    """
+
+    @contextmanager
+    def span(self, op: str, description: str, tags: Dict[str, Any]):
+        yield
+
+
+class SentryBackend:
+    """
+    Sentry performance spans, a transaction is started for root spans.
+    """
+
+    def __init__(self) -> None:
+        import sentry_sdk
+
+        self.sentry_sdk = sentry_sdk
+
+    @contextmanager
+    def span(self, op: str, description: str, tags: Dict[str, Any]):
+        scope_span = self.sentry_sdk.Hub.current.scope.span
+        if scope_span is None:
+            context = self.sentry_sdk.start_transaction(
+                op=op, name=description or op
+            )
+        else:
+            context = scope_span.start_child(op=op, description=description)
+        with context as sentry_span:
+            for key, value in tags.items():
+                sentry_span.set_tag(key, value)
+            yield
+
+
+class OpenTelemetryBackend:
+    """
+    OpenTelemetry spans of the globally configured tracer provider.
+    """
+
+    def __init__(self) -> None:
+        from opentelemetry import trace
+
+        self.tracer = trace.get_tracer("krakendca")
+
+    @contextmanager
+    def span(self, op: str, description: str, tags: Dict[str, Any]):
+        attributes = {key: str(value) for key, value in tags.items()}
+        if description:
+            attributes["description"] = description
+        with self.tracer.start_as_current_span(op, attributes=attributes):
+            yield
+
+
+class LocalBackend:
+    """
+    Network-free exporter keeping finished spans in memory and writing
+    them as JSON lines with flush().
+    """
+
+    def __init__(self, trace_file: Optional[str] = None) -> None:
+        self.trace_file = trace_file or os.environ.get(
+            TRACE_FILE_ENV, DEFAULT_TRACE_FILE
+        )
+        self.lock = threading.Lock()
+        self.spans: List[Dict[str, Any]] = []
+        self.ids = itertools.count(1)
+        self.current: contextvars.ContextVar = contextvars.ContextVar(
+            "local_span", default=None
+        )
+
+    @contextmanager
+    def span(self, op: str, description: str, tags: Dict[str, Any]):
+        parent = self.current.get()
+        span_id = next(self.ids)
+        token = self.current.set(span_id)
+        record = {
+            "span_id": span_id,
+            "parent_id": parent,
+            "op": op,
+            "description": description,
+            "tags": tags,
+            "start": time.time(),
+        }
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            record["duration_s"] = round(time.perf_counter() - start, 6)
+            self.current.reset(token)
+            with self.lock:
+                self.spans.append(record)
+
+    def flush(self) -> None:
+        """
+        Append finished spans to the trace file and forget them.
+
+        :return: None
+        """
+        with self.lock:
+            spans, self.spans = self.spans, []
+        if not spans:
+            return
+        with open(self.trace_file, "a") as stream:
+            for record in sorted(spans, key=lambda s: s["span_id"]):
+                stream.write(json.dumps(record, default=str) + "\n")
+
+
+BACKENDS = {
+    "off": NoopBackend,
+    "sentry": SentryBackend,
+    "otel": OpenTelemetryBackend,
+    "local": LocalBackend,
+}
+
+_backend = None
+
+
+def configure_tracing(backend: Optional[str] = None) -> Any:
+    """
+    Select the tracing backend: "sentry", "otel", "local" or "off".
+    Defaults to the KRAKEN_DCA_TRACING environment variable, then to
+    Sentry if a Sentry client is initialized, else tracing is off.
+
+    :param backend: Backend name.
+    :return: Backend object.
+    """
+    global _backend
+    name = backend or os.environ.get(TRACING_ENV, "").strip().lower()
+    if not name:
+        name = "sentry" if _sentry_enabled() else "off"
+    if name not in BACKENDS:
+        raise ValueError(
+            f"Unknown tracing backend {name}, "
+            f"available backends: {list(BACKENDS)}."
+        )
+    _backend = BACKENDS[name]()
+    return _backend
+
+
+def _sentry_enabled() -> bool:
+    try:
+        import sentry_sdk
+    except ImportError:
+        return False
+    client = sentry_sdk.Hub.current.client
+    return client is not None and bool(client.dsn)
+
+
+def get_backend() -> Any:
+    return _backend if _backend is not None else configure_tracing()
+
+
+@contextmanager
+def span(op: str, description: str = "", **tags: Any) -> Iterator[None]:
+    """
+    Trace a phase of the DCA run. Spans are tagged with the current
+    account and pair metric labels.
+
+    :param op: Phase name, e.g. "dca.ticker".
+    :param description: Optional human readable description.
+    :param tags: Additional tags.
+    :return: Context manager.
+    """
+    with get_backend().span(op, description, {**current_labels(), **tags}):
+        yield
+
+
+def flush() -> None:
+    """
+    Write spans of the local backend, no-op for the other backends.
+
+    :return: None
+    """
+    backend = get_backend()
+    if isinstance(backend, LocalBackend):
+        backend.flush()
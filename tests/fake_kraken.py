@@ -0,0 +1,870 @@
+"""
+Simulated Kraken exchange used by tests and benchmarks.
+
+FakeKraken answers API calls in-process (patch_urlopen), FakeKrakenServer
+serves it over HTTP with latency, error injection and Kraken-style API
+counter rate limiting and FakeKrakenWebSocket streams its ticker over a
+local WebSocket. The server can also be run standalone:
+    python -m tests.fake_kraken --port 8765 --latency 0.05
+"""
+import argparse
+import base64
+import hashlib
+import json
+import math
+import random
+import socket
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import StreamRequestHandler, ThreadingTCPServer
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Union
+from unittest.mock import patch
+from urllib.parse import parse_qsl, urlparse
+from urllib.request import Request
+
+from krakenapi import KrakenApi
+
+QUOTE_ASSET: str = "ZEUR"
+QUOTE_ALT_NAME: str = "EUR"
+PUBLIC_METHODS = ("Time", "Assets", "AssetPairs", "Ticker")
+# Kraken API counter cost of private calls, other calls cost 1.
+HISTORY_METHODS = ("ClosedOrders", "QueryOrders", "TradesHistory", "Ledgers")
+RATE_LIMIT_ERROR: str = "EAPI:Rate limit exceeded"
+
+
+def fake_pair_names(n_pairs: int) -> List[str]:
+    """
+    Return n synthetic pair names quoted in ZEUR.
+
+    :param n_pairs: Number of pairs.
+    :return: List of pair names.
+    """
+    return [f"A{index:03d}{QUOTE_ASSET}" for index in range(n_pairs)]
+
+
+class FakeKraken:
+    """
+    In-memory, stateful stand-in of the Kraken REST API endpoints used
+    by KrakenDCA. Limit buy orders at or above the ask price are filled
+    immediately, others stay open.
+    """
+
+    def __init__(
+        self,
+        pair_prices: Dict[str, float],
+        quote_balance: float = 1_000_000,
+        time_function: Callable[[], float] = time.time,
+        check_nonces: bool = False,
+        nonce_window: int = 0,
+    ) -> None:
+        """
+        Initialize the FakeKraken object.
+
+        :param pair_prices: Ask price per pair name, pairs are quoted in
+        ZEUR and their base asset is the pair name without the quote.
+        :param quote_balance: Initial ZEUR balance of every account.
+        :param time_function: Exchange clock returning unix time.
+        :param check_nonces: Reject private calls whose nonce is not
+        greater than the last nonce of the API key, like Kraken does.
+        :param nonce_window: Kraken API key nonce window: unused nonces
+        up to nonce_window lower than the last nonce are also accepted.
+        """
+        self.time_function = time_function
+        self.check_nonces = check_nonces
+        self.nonce_window = nonce_window
+        self.last_nonces: Dict[str, int] = {}
+        self.used_nonces: Dict[str, set] = defaultdict(set)
+        self.quote_balance = quote_balance
+        self.prices = dict(pair_prices)
+        self.assets = {
+            QUOTE_ASSET: {
+                "aclass": "currency",
+                "altname": QUOTE_ALT_NAME,
+                "decimals": 4,
+                "display_decimals": 2,
+            }
+        }
+        self.asset_pairs = {}
+        for pair in self.prices:
+            base = pair[: -len(QUOTE_ASSET)]
+            self.assets[base] = {
+                "aclass": "currency",
+                "altname": base,
+                "decimals": 10,
+                "display_decimals": 5,
+            }
+            self.asset_pairs[pair] = {
+                "altname": base + QUOTE_ALT_NAME,
+                "wsname": f"{base}/{QUOTE_ALT_NAME}",
+                "base": base,
+                "quote": QUOTE_ASSET,
+                "pair_decimals": 2,
+                "lot_decimals": 8,
+                "ordermin": "0.0001",
+            }
+        self.balances: Dict[str, Dict[str, float]] = {}
+        self.open_orders: Dict[str, Dict[str, dict]] = {}
+        self.closed_orders: Dict[str, Dict[str, dict]] = {}
+        self.calls: Counter = Counter()
+        self.order_count = 0
+
+    def account(self, api_key: str) -> Dict[str, float]:
+        """
+        Return the balances of an account, created on first use.
+
+        :param api_key: Account API public key.
+        :return: Dict of asset balances.
+        """
+        if api_key not in self.balances:
+            self.balances[api_key] = {QUOTE_ASSET: self.quote_balance}
+            self.open_orders[api_key] = {}
+            self.closed_orders[api_key] = {}
+        return self.balances[api_key]
+
+    def handle(
+        self, method: str, params: Dict[str, str], api_key: str = ""
+    ) -> dict:
+        """
+        Answer an API call like Kraken does, with error and result keys.
+
+        :param method: API method name, e.g. "Ticker".
+        :param params: Request parameters.
+        :param api_key: API-Key header of private calls.
+        :return: Response as dict.
+        """
+        self.calls[method] += 1
+        handler = getattr(self, f"_{method.lower()}", None)
+        if handler is None:
+            return {"error": [f"EGeneral:Unknown method {method}"]}
+        try:
+            if method in PUBLIC_METHODS:
+                result = handler(params)
+            else:
+                if not api_key:
+                    return {"error": ["EAPI:Invalid key"]}
+                self.account(api_key)
+                if self.check_nonces:
+                    nonce = int(params.get("nonce", 0))
+                    last_nonce = self.last_nonces.get(api_key, 0)
+                    if (
+                        nonce <= last_nonce - self.nonce_window
+                        or nonce in self.used_nonces[api_key]
+                    ):
+                        return {"error": ["EAPI:Invalid nonce"]}
+                    self.used_nonces[api_key].add(nonce)
+                    self.last_nonces[api_key] = max(nonce, last_nonce)
+                result = handler(params, api_key)
+        except (KeyError, ValueError) as e:
+            return {"error": [f"EGeneral:Invalid arguments:{e}"]}
+        return {"error": [], "result": result}
+
+    def _time(self, params: Dict[str, str]) -> dict:
+        now = self.time_function()
+        return {"unixtime": int(now), "rfc1123": formatdate(now)}
+
+    def _assets(self, params: Dict[str, str]) -> dict:
+        return self.assets
+
+    def _assetpairs(self, params: Dict[str, str]) -> dict:
+        return self.asset_pairs
+
+    def _ticker(self, params: Dict[str, str]) -> dict:
+        ticker = {}
+        for pair in params["pair"].split(","):
+            price = self.prices[pair]
+            ticker[pair] = {
+                "a": [f"{price:.2f}", "1", "1.000"],
+                "b": [f"{price * 0.999:.2f}", "1", "1.000"],
+            }
+        return ticker
+
+    def _balance(self, params: Dict[str, str], api_key: str) -> dict:
+        return {
+            asset: f"{balance:.10f}"
+            for asset, balance in self.balances[api_key].items()
+        }
+
+    def _tradebalance(self, params: Dict[str, str], api_key: str) -> dict:
+        equity = sum(
+            balance * self.prices.get(asset + QUOTE_ASSET, 1)
+            for asset, balance in self.balances[api_key].items()
+        )
+        return {"eb": f"{equity:.4f}"}
+
+    def _openorders(self, params: Dict[str, str], api_key: str) -> dict:
+        return {"open": self.open_orders[api_key]}
+
+    def _closedorders(self, params: Dict[str, str], api_key: str) -> dict:
+        start = float(params.get("start", 0))
+        closed = [
+            (txid, order)
+            for txid, order in self.closed_orders[api_key].items()
+            if order["opentm"] >= start
+        ]
+        # Newest first, by pages of 50 orders like Kraken.
+        closed.sort(key=lambda item: item[1]["opentm"], reverse=True)
+        offset = int(params.get("ofs", 0))
+        end = offset + 50
+        page = dict(closed[offset:end])
+        return {"closed": page, "count": len(closed)}
+
+    def _addorderbatch(self, params: Dict[str, str], api_key: str) -> dict:
+        orders: Dict[int, Dict[str, str]] = defaultdict(dict)
+        for key, value in params.items():
+            if key.startswith("orders["):
+                index, name = (
+                    key.replace("orders[", "", 1).rstrip("]").split("][")
+                )
+                orders[int(index)][name] = value
+        if not 2 <= len(orders) <= 15:
+            raise ValueError("orders")
+        results = []
+        for index in sorted(orders):
+            try:
+                result = self._addorder(
+                    dict(orders[index], pair=params["pair"]), api_key
+                )
+            except (KeyError, ValueError) as e:
+                results.append({"error": f"EGeneral:Invalid arguments:{e}"})
+                continue
+            # Batch answers have one txid per order.
+            results.append(
+                {"txid": result["txid"][0], "descr": result["descr"]}
+            )
+        return {"orders": results}
+
+    def _queryorders(self, params: Dict[str, str], api_key: str) -> dict:
+        txids = params["txid"].split(",")
+        if len(txids) > 50:
+            raise ValueError("txid")
+        orders = {}
+        for txid in txids:
+            for account_orders in (self.open_orders, self.closed_orders):
+                if txid in account_orders[api_key]:
+                    orders[txid] = account_orders[api_key][txid]
+        return orders
+
+    def fill_order(self, txid: str) -> None:
+        """
+        Fill an open order at its limit price, at the exchange time.
+
+        :param txid: Order transaction id.
+        :return: None
+        """
+        for api_key, orders in self.open_orders.items():
+            if txid not in orders:
+                continue
+            order = orders.pop(txid)
+            price = float(order["descr"]["price"])
+            volume = float(order["vol"])
+            cost = price * volume
+            fee = cost * 0.0026
+            balances = self.balances[api_key]
+            base = self.asset_pairs[self.pair_name(order)]["base"]
+            balances[QUOTE_ASSET] -= cost + fee
+            balances[base] = balances.get(base, 0) + volume
+            order.update(
+                status="closed",
+                closetm=self.time_function(),
+                vol_exec=order["vol"],
+                cost=f"{cost:.5f}",
+                fee=f"{fee:.5f}",
+            )
+            self.closed_orders[api_key][txid] = order
+            return
+        raise KeyError(txid)
+
+    def pair_name(self, order: dict) -> str:
+        alt_name = order["descr"]["pair"]
+        for pair, asset_pair in self.asset_pairs.items():
+            if asset_pair["altname"] == alt_name:
+                return pair
+        raise KeyError(alt_name)
+
+    def _addorder(self, params: Dict[str, str], api_key: str) -> dict:
+        pair = params["pair"]
+        price = float(params["price"])
+        volume = float(params["volume"])
+        if pair not in self.asset_pairs or params["type"] != "buy":
+            raise ValueError(pair)
+        cost = price * volume
+        fee = cost * 0.0026
+        balances = self.balances[api_key]
+        if balances[QUOTE_ASSET] < cost + fee:
+            raise ValueError("Insufficient funds")
+        self.order_count += 1
+        txid = f"O{self.order_count:05d}-FAKE0-{int(price * 100) % 10**6:06d}"
+        alt_name = self.asset_pairs[pair]["altname"]
+        description = f"buy {params['volume']} {alt_name} @ limit {price}"
+        now = self.time_function()
+        order = {
+            "status": "open",
+            "opentm": now,
+            "descr": {
+                "pair": alt_name,
+                "type": "buy",
+                "ordertype": params["ordertype"],
+                "price": params["price"],
+                "order": description,
+            },
+            "vol": params["volume"],
+            "vol_exec": "0.00000000",
+            "cost": "0.00000",
+            "fee": "0.00000",
+            "oflags": params.get("oflags", ""),
+        }
+        if price >= self.prices[pair]:
+            base = self.asset_pairs[pair]["base"]
+            balances[QUOTE_ASSET] -= cost + fee
+            balances[base] = balances.get(base, 0) + volume
+            order.update(
+                status="closed",
+                closetm=now,
+                vol_exec=params["volume"],
+                cost=f"{cost:.5f}",
+                fee=f"{fee:.5f}",
+            )
+            self.closed_orders[api_key][txid] = order
+        else:
+            self.open_orders[api_key][txid] = order
+        return {"descr": {"order": description}, "txid": [txid]}
+
+
+class FakeResponse:
+    """
+    Minimal urlopen response.
+    """
+
+    def __init__(self, body: bytes) -> None:
+        self.body = body
+
+    def read(self) -> bytes:
+        return self.body
+
+
+def parse_request(request: Request) -> tuple:
+    """
+    Return the method, parameters and API key of a krakenapi request.
+
+    :param request: urllib Request object.
+    :return: Tuple of method name, params dict and API key.
+    """
+    method = urlparse(request.full_url).path.rsplit("/", 1)[-1]
+    params = dict(parse_qsl(request.data.decode())) if request.data else {}
+    api_key = request.get_header("Api-key", "")
+    return method, params, api_key
+
+
+@contextmanager
+def patch_urlopen(
+    exchange: FakeKraken, latency: Optional[Callable[[], float]] = None
+) -> Iterator[FakeKraken]:
+    """
+    Route krakenapi HTTP requests to a FakeKraken exchange in-process.
+
+    :param exchange: FakeKraken object answering requests.
+    :param latency: Optional function returning a delay in seconds
+    slept before answering each request.
+    :return: Context manager yielding the exchange.
+    """
+
+    def fake_urlopen(request: Request, *args, **kwargs) -> FakeResponse:
+        if latency is not None:
+            time.sleep(latency())
+        response = exchange.handle(*parse_request(request))
+        return FakeResponse(json.dumps(response).encode())
+
+    with patch("krakenapi.kraken_api.urlopen", fake_urlopen):
+        yield exchange
+
+
+Latency = Callable[[], float]
+
+
+def constant_latency(seconds: float) -> Latency:
+    return lambda: seconds
+
+
+def uniform_latency(low: float, high: float, seed: int = None) -> Latency:
+    rng = random.Random(seed)
+    return lambda: rng.uniform(low, high)
+
+
+def lognormal_latency(
+    median: float, sigma: float = 0.5, seed: int = None
+) -> Latency:
+    """
+    Long-tailed latency distribution, closer to real network latency.
+
+    :param median: Median latency in seconds.
+    :param sigma: Standard deviation of the underlying normal.
+    :param seed: Random generator seed.
+    :return: Function returning a latency in seconds.
+    """
+    rng = random.Random(seed)
+    mu = math.log(median)
+    return lambda: rng.lognormvariate(mu, sigma)
+
+
+class ApiCounter:
+    """
+    Kraken private API call counter: every call adds its cost, the
+    counter decays over time and calls exceeding the maximum fail.
+    Defaults are the Kraken starter tier (15, -0.33/s).
+    """
+
+    def __init__(
+        self,
+        maximum: float = 15,
+        decay_per_second: float = 0.33,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.maximum = maximum
+        self.decay_per_second = decay_per_second
+        self.clock = clock
+        self.value = 0.0
+        self.updated = clock()
+
+    def try_add(self, cost: float) -> bool:
+        """
+        Add the cost of a call if it doesn't exceed the maximum.
+
+        :param cost: Call cost.
+        :return: True if the call is allowed.
+        """
+        now = self.clock()
+        elapsed = now - self.updated
+        self.value = max(0.0, self.value - elapsed * self.decay_per_second)
+        self.updated = now
+        if self.value + cost > self.maximum:
+            return False
+        self.value += cost
+        return True
+
+
+class FakeKrakenServer:
+    """
+    Local HTTP stand-in of the Kraken REST API serving a FakeKraken
+    exchange, with configurable latency, errors and rate limiting.
+    """
+
+    def __init__(
+        self,
+        exchange: FakeKraken,
+        latency: Union[Latency, Dict[str, Latency], None] = None,
+        error_rates: Optional[Dict[str, float]] = None,
+        rate_limit: Optional[Dict[str, float]] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        seed: int = None,
+    ) -> None:
+        """
+        Initialize the FakeKrakenServer object.
+
+        :param exchange: FakeKraken object answering requests.
+        :param latency: Latency function, or dict of latency function
+        per API method ("*" as default).
+        :param error_rates: Probability per API method ("*" as default)
+        of answering with an "EService:Unavailable" error.
+        :param rate_limit: ApiCounter arguments (maximum,
+        decay_per_second) applied per API key, None to disable.
+        :param host: Listening host.
+        :param port: Listening port, 0 for a free port.
+        :param seed: Random generator seed of error injection.
+        """
+        self.exchange = exchange
+        self.latency = latency
+        self.error_rates = error_rates or {}
+        self.rate_limit = rate_limit
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counters: Dict[str, ApiCounter] = {}
+        self.injected_errors: Dict[str, Deque[str]] = defaultdict(deque)
+        self.requests: List[dict] = []
+        self.rate_limited: Counter = Counter()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def inject_error(self, method: str, error: str, count: int = 1) -> None:
+        """
+        Answer the next count calls of a method with an error. Errors
+        starting with "HTTP " return that status code, "DROP" closes the
+        connection without answering, others are Kraken error strings.
+
+        :param method: API method name, "*" for any method.
+        :param error: Error to return.
+        :param count: Number of calls to fail.
+        :return: None
+        """
+        with self.lock:
+            self.injected_errors[method].extend([error] * count)
+
+    def _latency(self, method: str) -> float:
+        latency = self.latency
+        if isinstance(latency, dict):
+            latency = latency.get(method, latency.get("*"))
+        return latency() if latency else 0.0
+
+    def _error(self, method: str, api_key: str) -> Optional[str]:
+        with self.lock:
+            for key in (method, "*"):
+                if self.injected_errors[key]:
+                    return self.injected_errors[key].popleft()
+            rate = self.error_rates.get(method, self.error_rates.get("*", 0))
+            if rate and self.rng.random() < rate:
+                return "EService:Unavailable"
+            if self.rate_limit is not None and method not in PUBLIC_METHODS:
+                counter = self.counters.setdefault(
+                    api_key, ApiCounter(**self.rate_limit)
+                )
+                cost = 2 if method in HISTORY_METHODS else 1
+                if method != "AddOrder" and not counter.try_add(cost):
+                    self.rate_limited[method] += 1
+                    return RATE_LIMIT_ERROR
+        return None
+
+    def answer(self, method: str, params: Dict[str, str], api_key: str):
+        """
+        Return (status, body) answering a request, None to drop it.
+        """
+        delay = self._latency(method)
+        if delay > 0:
+            # Not time.sleep: benchmarks replace it to record waits.
+            threading.Event().wait(delay)
+        error = self._error(method, api_key)
+        with self.lock:
+            self.requests.append(
+                {"method": method, "params": params, "error": error}
+            )
+            if error == "DROP":
+                return None
+            if error and error.startswith("HTTP "):
+                return int(error.split()[1]), b"Service unavailable"
+            if error:
+                self.exchange.calls[method] += 1
+                return 200, json.dumps({"error": [error]}).encode()
+            response = self.exchange.handle(method, params, api_key)
+        return 200, json.dumps(response).encode()
+
+    def _handler_class(self) -> type:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _serve(self) -> None:
+                method = urlparse(self.path).path.rsplit("/", 1)[-1]
+                length = int(self.headers.get("Content-Length") or 0)
+                data = self.rfile.read(length).decode() if length else ""
+                answer = server.answer(
+                    method,
+                    dict(parse_qsl(data)),
+                    self.headers.get("API-Key", ""),
+                )
+                if answer is None:
+                    self.close_connection = True
+                    return
+                status, body = answer
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_GET = do_POST = _serve
+
+            def log_message(self, *args) -> None:
+                pass
+
+        return Handler
+
+    def start(self) -> "FakeKrakenServer":
+        self.thread = threading.Thread(
+            target=self.httpd.serve_forever, daemon=True
+        )
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "FakeKrakenServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+# RFC 6455 handshake GUID.
+WEBSOCKET_GUID: str = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+class FakeKrakenWebSocket:
+    """
+    Local stand-in of Kraken public WebSocket API ticker channel,
+    publishing the prices of a FakeKraken exchange. Only unfragmented
+    text and close frames are supported.
+    """
+
+    def __init__(self, exchange: FakeKraken, host: str = "127.0.0.1") -> None:
+        """
+        Initialize the FakeKrakenWebSocket object.
+
+        :param exchange: FakeKraken object whose prices are published.
+        :param host: Listening host, on a free port.
+        """
+        self.exchange = exchange
+        self.lock = threading.Lock()
+        self.connections: list = []
+        self.subscriptions: List[List[str]] = []
+        self.ws_names = {
+            information["wsname"]: pair
+            for pair, information in exchange.asset_pairs.items()
+        }
+        self.server = ThreadingTCPServer((host, 0), self._handler_class())
+        self.server.daemon_threads = True
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"ws://{host}:{port}"
+
+    def publish(self, pair: str) -> None:
+        """
+        Send the current ticker of a pair to its subscribers.
+
+        :param pair: FakeKraken pair name.
+        :return: None
+        """
+        ws_name = self.exchange.asset_pairs[pair]["wsname"]
+        with self.lock:
+            connections = list(self.connections)
+        for connection in connections:
+            if ws_name in connection.pairs:
+                connection.send_ticker(ws_name)
+
+    def disconnect(self) -> None:
+        """
+        Close every client connection, e.g. to test reconnections.
+
+        :return: None
+        """
+        with self.lock:
+            connections, self.connections = self.connections, []
+        for connection in connections:
+            try:
+                connection.request.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def ticker_message(self, ws_name: str) -> str:
+        price = self.exchange.prices[self.ws_names[ws_name]]
+        ticker = {
+            "a": [str(price), 1, "1.000"],
+            "b": [str(price * 0.999), 1, "1.000"],
+            "c": [str(price), "0.1"],
+        }
+        return json.dumps([0, ticker, "ticker", ws_name])
+
+    def _handler_class(self) -> type:
+        server = self
+
+        class Handler(StreamRequestHandler):
+            def handle(self) -> None:
+                self.pairs: List[str] = []
+                self.send_lock = threading.Lock()
+                if not self.handshake():
+                    return
+                with server.lock:
+                    server.connections.append(self)
+                try:
+                    while True:
+                        opcode, payload = self.read_frame()
+                        if opcode == 8:
+                            self.send_frame(8, payload)
+                            return
+                        if opcode == 1:
+                            self.handle_event(json.loads(payload))
+                except (ConnectionError, OSError, ValueError):
+                    return
+                finally:
+                    with server.lock:
+                        if self in server.connections:
+                            server.connections.remove(self)
+
+            def handshake(self) -> bool:
+                headers = {}
+                self.rfile.readline()
+                while True:
+                    line = self.rfile.readline().decode().strip()
+                    if not line:
+                        break
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                key = headers.get("sec-websocket-key")
+                if key is None:
+                    return False
+                accept = base64.b64encode(
+                    hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()
+                ).decode()
+                self.wfile.write(
+                    (
+                        "HTTP/1.1 101 Switching Protocols\r\n"
+                        "Upgrade: websocket\r\n"
+                        "Connection: Upgrade\r\n"
+                        f"Sec-WebSocket-Accept: {accept}\r\n\r\n"
+                    ).encode()
+                )
+                self.send_text({"event": "systemStatus", "status": "online"})
+                return True
+
+            def read_frame(self) -> tuple:
+                header = self.rfile.read(2)
+                if len(header) < 2:
+                    raise ConnectionError("Connection closed.")
+                opcode, length = header[0] & 0x0F, header[1] & 0x7F
+                if length == 126:
+                    length = int.from_bytes(self.rfile.read(2), "big")
+                elif length == 127:
+                    length = int.from_bytes(self.rfile.read(8), "big")
+                mask = self.rfile.read(4) if header[1] & 0x80 else b""
+                payload = self.rfile.read(length)
+                if mask:
+                    payload = bytes(
+                        byte ^ mask[index % 4]
+                        for index, byte in enumerate(payload)
+                    )
+                return opcode, payload
+
+            def send_frame(self, opcode: int, payload: bytes) -> None:
+                header = bytes([0x80 | opcode])
+                length = len(payload)
+                if length < 126:
+                    header += bytes([length])
+                elif length < 1 << 16:
+                    header += bytes([126]) + length.to_bytes(2, "big")
+                else:
+                    header += bytes([127]) + length.to_bytes(8, "big")
+                with self.send_lock:
+                    self.wfile.write(header + payload)
+
+            def send_text(self, message: Union[dict, list, str]) -> None:
+                if not isinstance(message, str):
+                    message = json.dumps(message)
+                self.send_frame(1, message.encode())
+
+            def send_ticker(self, ws_name: str) -> None:
+                self.send_text(server.ticker_message(ws_name))
+
+            def handle_event(self, event: dict) -> None:
+                if event.get("event") == "ping":
+                    self.send_text({"event": "pong"})
+                    return
+                if event.get("event") != "subscribe":
+                    return
+                pairs = event.get("pair", [])
+                server.subscriptions.append(pairs)
+                for ws_name in pairs:
+                    if ws_name not in server.ws_names:
+                        self.send_text(
+                            {
+                                "event": "subscriptionStatus",
+                                "status": "error",
+                                "errorMessage": "Currency pair not supported "
+                                f"{ws_name}",
+                                "pair": ws_name,
+                            }
+                        )
+                        continue
+                    self.pairs.append(ws_name)
+                    self.send_text(
+                        {
+                            "event": "subscriptionStatus",
+                            "status": "subscribed",
+                            "pair": ws_name,
+                            "subscription": {"name": "ticker"},
+                        }
+                    )
+                    # Kraken sends the current ticker on subscription.
+                    self.send_ticker(ws_name)
+
+        return Handler
+
+    def start(self) -> "FakeKrakenWebSocket":
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, daemon=True
+        )
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.disconnect()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "FakeKrakenWebSocket":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+@contextmanager
+def patch_kraken_url(url: str) -> Iterator[str]:
+    """
+    Send krakenapi requests to another base URL, e.g. a FakeKrakenServer.
+
+    :param url: Base URL replacing https://api.kraken.com.
+    :return: Context manager yielding the URL.
+    """
+
+    def create_api_path(public_method: bool, api_method: str) -> str:
+        api_type = "/0/public/" if public_method else "/0/private/"
+        return url + api_type + api_method
+
+    with patch.object(
+        KrakenApi, "create_api_path", staticmethod(create_api_path)
+    ):
+        yield url
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local fake Kraken API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--pairs", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", action="store_true")
+    args = parser.parse_args()
+    prices = {
+        pair: 100.0 + index
+        for index, pair in enumerate(fake_pair_names(args.pairs))
+    }
+    server = FakeKrakenServer(
+        FakeKraken(prices),
+        latency=lognormal_latency(args.latency) if args.latency else None,
+        error_rates={"*": args.error_rate},
+        rate_limit={} if args.rate_limit else None,
+        host=args.host,
+        port=args.port,
+    )
+    print(f"Fake Kraken API listening on {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""api.py tests module."""
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from krakendca import api
+from krakendca.api import KrakenClient, LatencyTracker, RequestPolicy
+from krakendca.metrics import METRICS, metric_labels
+from tests.fake_kraken import (
+    FakeKraken,
+    FakeKrakenServer,
+    constant_latency,
+    patch_kraken_url,
+)
+
+PRIVATE_KEY = "a3Jha2VuLWRjYS10ZXN0"
+
+
+@pytest.fixture
+def server():
+    METRICS.reset()
+    exchange = FakeKraken({"XETHZEUR": 2083.16})
+    with FakeKrakenServer(exchange) as server:
+        with patch_kraken_url(server.url):
+            yield server
+    METRICS.reset()
+
+
+def test_send_api_request(server: FakeKrakenServer) -> None:
+    ka = KrakenClient("user-key", PRIVATE_KEY)
+    with metric_labels(account="user_X", pair="XETHZEUR"):
+        ticker = ka.get_pair_ticker("XETHZEUR")
+    assert ticker["XETHZEUR"]["a"][0] == "2083.16"
+    series = METRICS.series[("kraken", "Ticker", "user_X", "XETHZEUR")]
+    assert series.calls == 1
+    assert not series.errors
+
+
+def test_send_api_request_retries(server: FakeKrakenServer, capfd) -> None:
+    ka = KrakenClient("user-key", PRIVATE_KEY)
+    server.inject_error("Balance", "HTTP 502")
+    server.inject_error("Balance", "EAPI:Rate limit exceeded")
+    with patch("time.sleep") as sleep:
+        assert "ZEUR" in ka.get_balance()
+    assert [call.args[0] for call in sleep.call_args_list] == [0.5, 10]
+    assert capfd.readouterr().out == (
+        "Kraken API connection error. Waiting 0.5sc...\n"
+        "Kraken API rate limit exceeded. Waiting 10sc...\n"
+    )
+    series = METRICS.series[("kraken", "Balance", "", "")]
+    assert series.calls == 3
+    assert series.retries == 2
+    assert series.rate_limit_wait == 10
+    assert series.errors == {"HTTPError": 1, "EAPI:Rate limit exceeded": 1}
+
+
+def test_send_api_request_error(server: FakeKrakenServer) -> None:
+    ka = KrakenClient()
+    with pytest.raises(ValueError) as e_info:
+        ka.get_pair_ticker("XXBTZEUR")
+    assert "Kraken API error -> EGeneral:Invalid arguments" in str(
+        e_info.value
+    )
+    series = METRICS.series[("kraken", "Ticker", "", "")]
+    assert sum(series.errors.values()) == 1
+
+
+def test_concurrent_private_calls(server: FakeKrakenServer) -> None:
+    server.exchange.check_nonces = True
+    clients = [KrakenClient("user-key", PRIVATE_KEY) for _ in range(8)]
+    assert clients[0].nonces is clients[1].nonces
+    errors = []
+
+    def get_balance(ka: KrakenClient) -> None:
+        try:
+            for _ in range(10):
+                ka.get_balance()
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [
+        threading.Thread(target=get_balance, args=(ka,)) for ka in clients
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert server.exchange.calls["Balance"] >= 80
+
+
+def test_send_api_request_invalid_nonce(server: FakeKrakenServer) -> None:
+    server.exchange.check_nonces = True
+    ka = KrakenClient("user-key", PRIVATE_KEY)
+    server.inject_error("Balance", "EAPI:Invalid nonce", count=2)
+    assert "ZEUR" in ka.get_balance()
+    nonces = [int(r["params"]["nonce"]) for r in server.requests]
+    assert nonces == sorted(set(nonces))
+    series = METRICS.series[("kraken", "Balance", "", "")]
+    assert series.errors == {"EAPI:Invalid nonce": 2}
+    # An order which may have reached Kraken is never sent again with a
+    # new nonce.
+    server.inject_error("AddOrder", "DROP")
+    server.inject_error("AddOrder", "EAPI:Invalid nonce")
+    with patch("time.sleep"), pytest.raises(ValueError) as e_info:
+        ka.create_order("XETHZEUR", "buy", "limit", 2083.16, 0.01, "fciq")
+    assert "EAPI:Invalid nonce" in str(e_info.value)
+    assert server.exchange.calls["AddOrder"] == 1
+
+
+def test_public_request_retries(server: FakeKrakenServer, capfd) -> None:
+    ka = KrakenClient(policy=RequestPolicy(backoff_base=0.01))
+    server.inject_error("Ticker", "EService:Unavailable")
+    server.inject_error("Ticker", "HTTP 503")
+    with patch("time.sleep") as sleep:
+        ticker = ka.get_pair_ticker("XETHZEUR")
+    assert ticker["XETHZEUR"]["a"][0] == "2083.16"
+    delays = [call.args[0] for call in sleep.call_args_list]
+    assert len(delays) == 2
+    assert 0 <= delays[0] <= 0.01 and 0 <= delays[1] <= 0.02
+    assert capfd.readouterr().out.count("Kraken API Ticker error.") == 2
+    series = METRICS.series[("kraken", "Ticker", "", "")]
+    assert series.calls == 3
+    assert series.retries == 2
+
+
+def test_public_request_deadline(server: FakeKrakenServer) -> None:
+    server.latency = {"Time": constant_latency(1)}
+    policy = RequestPolicy(timeout=0.1, deadline=0.5, backoff_base=0.01)
+    ka = KrakenClient(policy=policy)
+    start = time.monotonic()
+    with pytest.raises(ConnectionError) as e_info:
+        ka.get_time()
+    assert time.monotonic() - start < 0.9
+    assert "Kraken API Time failed after" in str(e_info.value)
+
+
+def test_public_request_hedging(server: FakeKrakenServer, monkeypatch) -> None:
+    latencies = LatencyTracker()
+    for _ in range(20):
+        latencies.record("Ticker", 0.01)
+    monkeypatch.setattr(api, "LATENCIES", latencies)
+    delays = iter([2])
+    server.latency = {"Ticker": lambda: next(delays, 0)}
+    ka = KrakenClient(policy=RequestPolicy(hedge=True))
+    start = time.monotonic()
+    ticker = ka.get_pair_ticker("XETHZEUR")
+    assert time.monotonic() - start < 1
+    assert ticker["XETHZEUR"]["a"][0] == "2083.16"
+    assert METRICS.series[("kraken", "Ticker", "", "")].hedges == 1
+
+
+def test_private_request_single_shot(server: FakeKrakenServer) -> None:
+    ka = KrakenClient("user-key", PRIVATE_KEY)
+    server.inject_error("AddOrder", "EService:Unavailable")
+    with pytest.raises(ValueError) as e_info:
+        ka.create_order("XETHZEUR", "buy", "limit", 2083.16, 0.01, "fciq")
+    assert "EService:Unavailable" in str(e_info.value)
+    assert server.exchange.calls["AddOrder"] == 1
+    assert server.exchange.order_count == 0
+
+
+def test_latency_tracker() -> None:
+    latencies = LatencyTracker()
+    assert latencies.quantile("Time", 0.95) is None
+    for index in range(1, 101):
+        latencies.record("Time", index / 100)
+    assert latencies.quantile("Time", 0.95) == 0.95
+    assert latencies.quantile("Time", 0.95, min_samples=101) is None
@@ -0,0 +1,87 @@
+"""clock.py tests module."""
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+from freezegun import freeze_time
+
+from krakendca import clock
+from krakendca.clock import ClockService
+from krakendca.dca import checked_system_time
+
+
+class KrakenTime:
+    """Kraken Time endpoint answering with a clock offset."""
+
+    def __init__(self, offset: float) -> None:
+        self.offset = offset
+        self.calls = 0
+
+    def get_time(self) -> int:
+        self.calls += 1
+        return int(clock.time.time() + self.offset)
+
+
+def test_measure(capfd) -> None:
+    ka = KrakenTime(offset=-4)
+    with freeze_time("2021-04-09 20:47:40.5"):
+        service = ClockService(ka)
+        offset = service.measure()
+    # Frozen clock: no RTT, one sample is enough.
+    assert ka.calls == 1
+    assert service.rtt == 0
+    assert -4.5 <= offset <= -3.5
+    captured = capfd.readouterr()
+    assert captured.out == (
+        "It's 2021-04-09 20:47:36 on Kraken, 2021-04-09 20:47:40 on "
+        "system.\n"
+        "Clock offset: -4.000s (RTT 0ms).\n"
+    )
+
+
+def test_measure_slow_answers() -> None:
+    ka = KrakenTime(offset=0)
+    # Request and answer system times of each sample.
+    times = iter([100.0, 100.9, 200.0, 200.6, 300.0, 300.8])
+    answers = iter([100, 200, 300])
+    ka.get_time = lambda: next(answers)
+    service = ClockService(ka, max_samples=3)
+    with patch.object(clock.time, "time", lambda: next(times)):
+        with patch.object(ClockService, "kraken_now"):
+            offset = service.measure()
+    # Every sample is slow: all of them are taken, and the offset is
+    # the middle of the intersection of their bounds.
+    assert service.rtt == pytest.approx(0.6)
+    assert offset == pytest.approx((-0.6 + 1) / 2)
+
+
+def test_check_lag() -> None:
+    # Kraken ahead of the system, the sign must not matter.
+    for offset in (-3, 3, 86400 + 1):
+        with freeze_time("2021-04-09 20:47:40"):
+            service = ClockService(KrakenTime(offset=offset))
+            with pytest.raises(OSError) as e_info:
+                service.check_lag()
+        assert clock.LAG_ERROR_MSG in str(e_info.value)
+    with freeze_time("2021-04-09 20:47:40"):
+        ClockService(KrakenTime(offset=1)).check_lag()
+
+
+def test_checked_now() -> None:
+    ka = KrakenTime(offset=1)
+    with freeze_time("2021-04-09 20:47:40"):
+        service = ClockService(ka)
+        assert service.checked_now() == datetime(2021, 4, 9, 20, 47, 41)
+        assert service.checked_now() == datetime(2021, 4, 9, 20, 47, 41)
+    # The offset is measured once per run.
+    assert ka.calls == 1
+
+
+def test_checked_system_time() -> None:
+    # System one second behind Kraken is not lagging.
+    with freeze_time("2021-04-09 20:47:40"):
+        date = checked_system_time(KrakenTime(offset=1))
+    assert date == datetime(2021, 4, 9, 20, 47, 40)
+    with freeze_time("2021-04-09 20:47:40"):
+        with pytest.raises(OSError):
+            checked_system_time(KrakenTime(offset=86400 + 1))
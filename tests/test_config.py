@@ -2,8 +2,10 @@
 from unittest import mock
 
 import pytest
+import yaml
 from yaml.scanner import ScannerError
 
+from krakendca import config as config_module
 from krakendca.config import Config
 
 
@@ -60,6 +62,44 @@ def test_config_properties() -> None:
     assert len(config.dca_pairs) == 2
     assert_dca_pair(config.dca_pairs[0], "XETHZEUR", 1, 15, 0.985, 2900.10)
     assert_dca_pair(config.dca_pairs[1], "XXBTZEUR", 3, 20)
+    assert config.max_concurrent_orders == 1
+
+
+def test_compiled_config_cache(tmp_path, monkeypatch) -> None:
+    monkeypatch.setenv("KRAKEN_DCA_CONFIG_CACHE", str(tmp_path / "cache"))
+    monkeypatch.setattr(config_module, "_compiled_configs", {})
+    config = Config("tests/fixtures/config.yaml")
+    cache_files = list((tmp_path / "cache").glob("*.marshal"))
+    assert len(cache_files) == 1
+    # Compiled configurations are neither parsed nor checked again.
+    with mock.patch.object(Config, "compile") as compile_config:
+        cached_config = Config("tests/fixtures/config.yaml")
+        monkeypatch.setattr(config_module, "_compiled_configs", {})
+        disk_cached_config = Config("tests/fixtures/config.yaml")
+    compile_config.assert_not_called()
+    for cached in (cached_config, disk_cached_config):
+        assert vars(cached) == vars(config)
+        assert cached.dca_pairs is not config.dca_pairs
+    assert_dca_pair(config.dca_pairs[0], "XETHZEUR", 1, 15, 0.985, 2900.10)
+    # Unreadable compiled configurations are compiled again.
+    cache_files[0].write_bytes(b"\x00")
+    monkeypatch.setattr(config_module, "_compiled_configs", {})
+    assert vars(Config("tests/fixtures/config.yaml")) == vars(config)
+    # A modified file has another key.
+    modified_config = tmp_path / "config.yaml"
+    modified_config.write_text(get_config().replace("amount: 20", "amount: 5"))
+    assert Config(modified_config).dca_pairs[1]["amount"] == 5.0
+    assert len(list((tmp_path / "cache").glob("*.marshal"))) == 2
+
+
+def test_parse_yaml_errors(monkeypatch) -> None:
+    # Same error messages with the libyaml loader.
+    bad_config = get_config().replace("api:", "api")
+    with pytest.raises(ScannerError) as python_error:
+        yaml.load(bad_config, Loader=yaml.SafeLoader)
+    with pytest.raises(ScannerError) as e_info:
+        config_module.parse_yaml(bad_config)
+    assert str(e_info.value) == str(python_error.value)
 
 
 def mock_config_error(config: str, error_type: type) -> str:
@@ -122,6 +162,15 @@ class TestConfig:
         e_info: str = mock_config_error(bad_config, ValueError)
         assert "No DCA pairs specified." in e_info
 
+    def test_max_concurrent_orders(self) -> None:
+        """Test max_concurrent_orders is not a number > 0."""
+        for value in ("0", "two"):
+            bad_config: str = self.config.replace(
+                "dca_pairs:", f"max_concurrent_orders: {value}\ndca_pairs:"
+            )
+            e_info: str = mock_config_error(bad_config, ValueError)
+            assert "max_concurrent_orders must be a number > 0." in e_info
+
     def test_missing_pair_name(self) -> None:
         """Test missing pair name."""
         bad_config: str = self.config.replace('pair: "XETHZEUR"', "")
@@ -181,3 +230,70 @@ class TestConfig:
         )
         e_info: str = mock_config_error(bad_config, ValueError)
         assert "max_price must be a number." in e_info
+
+    def test_ladder(self) -> None:
+        """Test ladder offsets are converted to floats."""
+        config_file = self.config.replace(
+            "max_price: 2900.10", "max_price: 2900.10\n    ladder: [0, 0.01]"
+        )
+        with mock.patch(
+            "builtins.open", mock.mock_open(read_data=config_file)
+        ):
+            config = Config("config.yaml")
+        assert config.dca_pairs[0]["ladder"] == [0.0, 0.01]
+        assert "ladder" not in config.dca_pairs[1]
+
+    def test_ladder_is_not_valid(self) -> None:
+        """Test ladder offsets count and range."""
+        for ladder in ("[0]", "[0, 1]", "[0, error]", "0.01", str([0] * 16)):
+            bad_config: str = self.config.replace(
+                "max_price: 2900.10",
+                f"max_price: 2900.10\n    ladder: {ladder}",
+            )
+            e_info: str = mock_config_error(bad_config, ValueError)
+            assert (
+                "ladder option must be a list of 2 to 15 offsets >= 0 and < 1."
+                in e_info
+            )
+
+    def test_order_store(self) -> None:
+        """Test order store backend, DynamoDB if not set."""
+        with mock.patch(
+            "builtins.open", mock.mock_open(read_data=self.config)
+        ):
+            assert Config("config.yaml").order_store == {}
+        config_file = self.config.replace(
+            "dca_pairs:",
+            "order_store:\n  backend: sqlite\n  path: orders.sqlite\n"
+            "dca_pairs:",
+        )
+        with mock.patch(
+            "builtins.open", mock.mock_open(read_data=config_file)
+        ):
+            config = Config("config.yaml")
+        assert config.order_store == {
+            "backend": "sqlite",
+            "path": "orders.sqlite",
+        }
+
+    def test_order_store_is_not_valid(self) -> None:
+        """Test order store backend, path and batch size."""
+        errors = {
+            "order_store: orders.csv": "order_store must be a mapping.",
+            "order_store:\n  backend: mysql": (
+                "order_store backend must be one of dynamodb, sqlite, csv, "
+                "ndjson."
+            ),
+            "order_store:\n  backend: csv": (
+                "Please provide the csv order_store path."
+            ),
+            "order_store:\n  batch_size: 0": (
+                "order_store batch_size must be a number > 0."
+            ),
+        }
+        for order_store, error in errors.items():
+            bad_config: str = self.config.replace(
+                "dca_pairs:", f"{order_store}\ndca_pairs:"
+            )
+            e_info: str = mock_config_error(bad_config, ValueError)
+            assert error in e_info
@@ -0,0 +1,156 @@
+"""daemon.py tests module."""
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+import yaml
+from freezegun import freeze_time
+from moto import mock_dynamodb
+
+from krakendca.daemon import Daemon, PairScheduler
+from krakendca.krakendca import KrakenDCA
+from krakendca.utils import datetime_as_utc_unix
+from tests.fake_kraken import FakeKraken, fake_pair_names, patch_urlopen
+from tests.test_dca import create_dynamodb_table
+
+PRIVATE_KEY = "a3Jha2VuLWRjYS10ZXN0"
+
+
+def write_config(config_file: Path, delays: list, amount: float = 20) -> None:
+    config = {
+        "api": {
+            "user_name": "daemon_user",
+            "public_key": "daemon-key",
+            "private_key": PRIVATE_KEY,
+        },
+        "dca_pairs": [
+            {"pair": pair, "delay": delay, "amount": amount}
+            for pair, delay in zip(fake_pair_names(len(delays)), delays)
+        ],
+    }
+    config_file.write_text(yaml.safe_dump(config))
+
+
+def unix(*date) -> int:
+    return datetime_as_utc_unix(datetime(*date))
+
+
+def test_pair_scheduler() -> None:
+    scheduler = PairScheduler()
+    scheduler.schedule("a", 30)
+    scheduler.schedule("b", 10)
+    scheduler.schedule("c", 20)
+    scheduler.schedule("b", 40)
+    scheduler.remove("c")
+    assert len(scheduler) == 2
+    assert scheduler.next_due_time() == 30
+    assert scheduler.pop_due(29) == []
+    assert scheduler.pop_due(40) == ["a", "b"]
+    assert scheduler.next_due_time() is None
+    # Same due time scheduled twice is popped once.
+    scheduler.schedule("a", 50)
+    scheduler.schedule("a", 50)
+    assert scheduler.pop_due(50) == ["a"]
+    assert scheduler.pop_due(50) == []
+
+
+@pytest.fixture
+def exchange():
+    exchange = FakeKraken(
+        {pair: 100.0 for pair in fake_pair_names(2)},
+        time_function=lambda: time.time(),
+    )
+    with mock_dynamodb(), patch_urlopen(exchange):
+        create_dynamodb_table()
+        yield exchange
+
+
+def test_daemon(exchange, tmp_path, capfd) -> None:
+    config_file = tmp_path / "config.yaml"
+    write_config(config_file, [1, 3])
+    with freeze_time("2021-09-12 10:00:00") as frozen:
+        daemon = Daemon(tmp_path, time_function=lambda: time.time())
+        daemon.reload_configs()
+        assert daemon.next_wait() == 0
+        daemon.run_due_pairs()
+        assert exchange.calls["AddOrder"] == 2
+        assert daemon.scheduler.due_times == {
+            (config_file, 0): unix(2021, 9, 13),
+            (config_file, 1): unix(2021, 9, 15),
+        }
+        assert daemon.next_wait() == daemon.poll_interval
+        # Pairs metadata is kept between runs.
+        asset_pairs_calls = exchange.calls["AssetPairs"]
+        frozen.move_to("2021-09-13 00:00:01")
+        daemon.reload_configs()
+        daemon.run_due_pairs()
+        assert exchange.calls["AddOrder"] == 3
+        assert exchange.calls["AssetPairs"] == asset_pairs_calls
+        assert daemon.scheduler.due_times[(config_file, 0)] == unix(
+            2021, 9, 14
+        )
+        # Modified configuration files are reloaded and run again.
+        write_config(config_file, [1, 3], amount=30)
+        os.utime(config_file, (time.time() + 1, time.time() + 1))
+        daemon.reload_configs()
+        kdca = daemon.accounts[config_file].kdca
+        assert [dca.amount for dca in kdca.dcas_list] == [30, 30]
+        daemon.run_due_pairs()
+        assert exchange.calls["AddOrder"] == 3
+        assert daemon.scheduler.due_times == {
+            (config_file, 0): unix(2021, 9, 14),
+            (config_file, 1): unix(2021, 9, 14),
+        }
+        # Removed configuration files are unscheduled.
+        config_file.unlink()
+        daemon.reload_configs()
+        assert len(daemon.scheduler) == 0
+    captured = capfd.readouterr()
+    assert "No DCA for A000ZEUR: Already placed an order today." in (
+        captured.out
+    )
+    assert "Configuration config.yaml removed." in captured.out
+
+
+def test_daemon_errors(exchange, tmp_path, capfd) -> None:
+    config_file = tmp_path / "config.yaml"
+    config_file.write_text("api: {}")
+    with freeze_time("2021-09-12 10:00:00"):
+        daemon = Daemon(tmp_path, time_function=lambda: time.time())
+        daemon.reload_configs()
+        assert daemon.accounts[config_file].kdca is None
+        # Invalid files aren't loaded again until modified.
+        with patch.object(Daemon, "load_account") as load_account:
+            daemon.reload_configs()
+        load_account.assert_not_called()
+        write_config(config_file, [1])
+        os.utime(config_file, (time.time() + 1, time.time() + 1))
+        daemon.reload_configs()
+        with patch.object(
+            KrakenDCA,
+            "handle_pairs_dca",
+            side_effect=ConnectionError("Kraken API down"),
+        ):
+            daemon.run_due_pairs()
+        assert daemon.scheduler.due_times == {
+            (config_file, 0): time.time() + daemon.retry_interval
+        }
+    captured = capfd.readouterr()
+    assert "Configuration config.yaml not loaded" in captured.out
+    assert (
+        "DCA of config.yaml failed: Kraken API down. Retrying in 900sc..."
+        in captured.out
+    )
+
+
+def test_daemon_run(tmp_path) -> None:
+    daemon = Daemon(tmp_path, poll_interval=0.01)
+    thread = threading.Thread(target=daemon.run)
+    thread.start()
+    daemon.stop()
+    thread.join(5)
+    assert not thread.is_alive()
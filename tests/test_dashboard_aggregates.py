@@ -0,0 +1,108 @@
+"""dashboard/aggregates.py tests module."""
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from dashboard.aggregates import OrderAggregates  # noqa: E402
+
+
+def create_history(n_orders: int = 12):
+    return pd.DataFrame(
+        {
+            "user_name": [
+                "user_X" if i % 3 else "user_Y" for i in range(n_orders)
+            ],
+            "pair": [
+                "XETHZEUR" if i % 2 else "XXBTZEUR" for i in range(n_orders)
+            ],
+            "date": [
+                f"2021-04-{i + 10:02d} 21:00:00" for i in range(n_orders)
+            ],
+            "txid": [f"O{i:05d}" for i in range(n_orders)],
+            "volume": [0.01 * (i + 1) for i in range(n_orders)],
+            "price": [19.9 + i for i in range(n_orders)],
+            "fee": [0.05 + i / 100 for i in range(n_orders)],
+            "total_price": [19.95 + i * 1.01 for i in range(n_orders)],
+        }
+    )
+
+
+def full_cumsums(history, prices):
+    orders = history.sort_values("date", ignore_index=True)
+    groups = orders.groupby(["user_name", "pair"])
+    for column in ("fee", "volume", "price", "total_price"):
+        orders[f"{column}_cumsum"] = groups[column].cumsum()
+    orders["latest_price"] = orders.pair.map(prices)
+    orders["profit"] = (
+        orders.volume_cumsum * orders.latest_price - orders.total_price_cumsum
+    )
+    return orders
+
+
+def assert_same_aggregates(aggregates, history, prices) -> None:
+    expected = full_cumsums(history, prices).set_index("txid")
+    orders = aggregates.orders.set_index("txid").loc[expected.index]
+    for column in (
+        "fee_cumsum",
+        "volume_cumsum",
+        "price_cumsum",
+        "total_price_cumsum",
+        "profit",
+    ):
+        assert orders[column].tolist() == pytest.approx(
+            expected[column].tolist()
+        )
+
+
+def test_extend() -> None:
+    history = create_history()
+    prices = {"XETHZEUR": 2000.0, "XXBTZEUR": 40000.0}
+    aggregates = OrderAggregates()
+    aggregates.prices.update(prices)
+    aggregates.extend(aggregates.new_orders(history.iloc[:7]))
+    assert_same_aggregates(aggregates, history.iloc[:7], prices)
+    # Only new orders are aggregated, from the last totals.
+    new_orders = aggregates.new_orders(history)
+    assert new_orders.txid.tolist() == [f"O{i:05d}" for i in range(7, 12)]
+    aggregates.extend(new_orders)
+    assert_same_aggregates(aggregates, history, prices)
+    assert aggregates.orders.date.is_monotonic_increasing
+    assert aggregates.totals.loc[("user_X", "XETHZEUR"), "volume_cumsum"] == (
+        pytest.approx(0.02 + 0.06 + 0.08 + 0.12)
+    )
+    assert aggregates.new_orders(history).empty
+
+
+def test_extend_late_order() -> None:
+    history = create_history()
+    prices = {"XETHZEUR": 2000.0, "XXBTZEUR": 40000.0}
+    aggregates = OrderAggregates()
+    aggregates.prices.update(prices)
+    late = history.txid == "O00004"
+    aggregates.extend(history[~late])
+    # An order older than the last one of its group recomputes it.
+    aggregates.extend(aggregates.new_orders(history))
+    assert len(aggregates.orders) == 12
+    assert aggregates.orders.date.is_monotonic_increasing
+    assert_same_aggregates(aggregates, history, prices)
+
+
+def test_update_prices() -> None:
+    history = create_history()
+    aggregates = OrderAggregates(
+        formatters={"volume_text": lambda row: f"{row.volume_cumsum:.2f}"},
+        price_formatters={"profit_text": lambda row: f"{row.profit:.2f}"},
+    )
+    aggregates.extend(history)
+    prices = {"XETHZEUR": 2000.0, "XXBTZEUR": 40000.0}
+    aggregates.update_prices(prices)
+    assert_same_aggregates(aggregates, history, prices)
+    texts = aggregates.orders.set_index("txid").volume_text
+    prices["XETHZEUR"] = 2100.0
+    aggregates.update_prices(prices)
+    assert_same_aggregates(aggregates, history, prices)
+    orders = aggregates.orders.set_index("txid")
+    assert orders.profit_text.tolist() == [
+        f"{profit:.2f}" for profit in orders.profit
+    ]
+    assert orders.volume_text.equals(texts)
@@ -0,0 +1,66 @@
+"""dashboard/data_plane.py tests module."""
+import pytest
+
+pd = pytest.importorskip("pandas")
+pa = pytest.importorskip("pyarrow")
+
+from dashboard.data_plane import (  # noqa: E402
+    DataPlanePublisher,
+    DataPlaneReader,
+    version_path,
+)
+
+
+def create_orders(n_orders: int = 6):
+    return pd.DataFrame(
+        {
+            "user_name": [
+                "user_X" if i % 3 else "user_Y" for i in range(n_orders)
+            ],
+            "pair": [
+                "XETHZEUR" if i % 2 else "XXBTZEUR" for i in range(n_orders)
+            ],
+            "txid": [f"O{i:05d}" for i in range(n_orders)],
+            "volume_cumsum": [0.01 * (i + 1) for i in range(n_orders)],
+        }
+    )
+
+
+def test_publish_and_read(tmp_path) -> None:
+    reader = DataPlaneReader(tmp_path)
+    assert reader.current() is None
+    with pytest.raises(TimeoutError):
+        reader.wait(timeout=0, poll_interval=0)
+    orders = create_orders()
+    assert DataPlanePublisher(tmp_path).publish(orders) == 1
+    assert reader.wait(timeout=0).num_rows == 6
+    pd.testing.assert_frame_equal(reader.orders(), orders)
+    user_orders = reader.orders("user_Y")
+    assert user_orders.txid.tolist() == ["O00000", "O00003"]
+    users = reader.orders(columns=["user_name"])
+    assert users.columns.tolist() == ["user_name"]
+
+
+def test_new_versions(tmp_path) -> None:
+    publisher = DataPlanePublisher(tmp_path)
+    reader = DataPlaneReader(tmp_path)
+    publisher.publish(create_orders(3))
+    assert len(reader.orders()) == 3
+    publisher.publish(create_orders(4))
+    publisher.publish(create_orders(5))
+    # Workers pick up the latest version, older ones are removed.
+    assert len(reader.orders()) == 5
+    assert reader.version == 3
+    assert not version_path(tmp_path, 1).exists()
+    assert version_path(tmp_path, 2).exists()
+    # A new publisher continues the version counter.
+    assert DataPlanePublisher(tmp_path).publish(create_orders()) == 4
+
+
+def test_memory_mapped(tmp_path) -> None:
+    DataPlanePublisher(tmp_path).publish(create_orders(1000))
+    allocated = pa.total_allocated_bytes()
+    table = DataPlaneReader(tmp_path).current()
+    # The table buffers are mapped from the file, not copied.
+    assert table.num_rows == 1000
+    assert pa.total_allocated_bytes() == allocated
@@ -1,6 +1,6 @@
 """dca.py tests module."""
+import time
 from datetime import datetime
-from unittest.mock import patch
 
 import boto3
 import pytest
@@ -9,9 +9,18 @@ from freezegun import freeze_time
 from krakenapi import KrakenApi
 from moto import mock_dynamodb
 
-from krakendca.dca import DCA
+from krakendca.dca import DCA, checked_system_time
 from krakendca.order import Order
 from krakendca.pair import Pair
+from krakendca.plan import (
+    DCAPlan,
+    MarketSnapshot,
+    PlannedOrder,
+    execute_plan,
+    plan_dcas,
+)
+from krakendca.store import SQLiteOrderStore
+from tests.fake_kraken import FakeKraken, patch_urlopen
 
 
 def create_dynamodb_table():
@@ -35,13 +44,13 @@ class TestDCA:
     def setup(self):
         # Initialize DCA test object - Fake keys.
         ka = KrakenApi(
-            "R6/OvXmIQEv1E8nyJd7+a9Zmaf84yJ7uifwe2yj5BgV1N+lgqURsxQwQ",
+            "user-key",
             "MWZ9lFF/mreK4Fdk/SEpFLvVn//nbKUbCytGShSwvCvYlgRkn4K8i7VY18UQ"
             "EgOHzBIEsqg78B"
             "ZJCEhvFIzw1Q==",
         )
         # Initialize the Pair object.
-        pair = Pair("XETHZEUR", "ETHEUR", "XETH", "ZEUR", 2, 8, 4, 0.005)
+        pair = Pair("XETHZEUR", "XETHEUR", "XETH", "ZEUR", 2, 8, 4, 0.005)
         # Initialize the DCA object.
         self.dca = DCA(ka, 1, pair, 20, "user_X")
 
@@ -57,22 +66,30 @@ class TestDCA:
         assert type(self.dca.limit_factor) == float
         assert self.dca.limit_factor == 1
 
+    def run_dca(self) -> DCAPlan:
+        snapshot = MarketSnapshot.fetch(self.dca.ka, [self.dca])
+        plan = plan_dcas(self.dca.user_name, [self.dca], snapshot)
+        execute_plan(plan, [self.dca])
+        return plan
+
     @freeze_time("2021-04-15 21:33:28.069731")
-    def test_handle_dca_logic(self, capfd):
+    def test_plan_and_execute(self, capfd):
         """Test normal execution."""
-        with vcr.use_cassette(
-            "tests/fixtures/vcr_cassettes/test_handle_dca_logic.yaml",
-            filter_headers=["API-Key", "API-Sign"],
-        ):
-            with mock_dynamodb():
-                create_dynamodb_table()
-                self.dca.handle_dca_logic()
+        exchange = FakeKraken(
+            {"XETHZEUR": 2083.16},
+            quote_balance=39.728,
+            time_function=lambda: time.time(),
+        )
+        with patch_urlopen(exchange), mock_dynamodb():
+            create_dynamodb_table()
+            self.run_dca()
         captured = capfd.readouterr()
         test_output = (
             "It's 2021-04-15 21:33:28 on Kraken, 2021-04-15 21:33:28 on "
             "system.\n"
-            "Current trade balance: 1650.3006 ZUSD.\n"
-            "Pair balances: 39.728 ZEUR, 0.109598362 XETH.\n"
+            "Current trade balance: 39.7280 ZUSD.\n"
+            "Pair XETHZEUR: delay: 1, amount: 20.0\n"
+            "Pair balances: 39.728 ZEUR, 0 XETH.\n"
             "Didn't DCA already today.\n"
             "Current XETHZEUR ask price: 2083.16.\n"
             "Create a 19.9481ZEUR buy limit order of 0.00957589XETH at "
@@ -80,29 +97,36 @@ class TestDCA:
             "Fee expected: 0.0519ZEUR (0.26% taker fee).\n"
             "Total price expected: 0.00957589XETH for 20.0ZEUR.\n"
             "Order successfully created.\n"
-            "TXID: OCYS4K-OILOE-36HPAE\n"
-            "Description: buy 0.00957589 ETHEUR @ limit 2083.16\n"
+            "TXID: O00001-FAKE0-208316\n"
+            "Description: buy 0.00957589 XETHEUR @ limit 2083.16\n"
             "Order information saved to Dynamo DB.\n"
         )
         assert captured.out == test_output
+        # The AddOrder request carried the planned order.
+        order = exchange.closed_orders["user-key"]["O00001-FAKE0-208316"]
+        assert order["vol"] == "0.00957589"
+        assert order["descr"]["price"] == "2083.16"
+        assert order["oflags"] == "fciq"
 
     @freeze_time("2021-04-16 18:54:53.069731")
-    def test_handle_dca_logic_error(self, capfd):
+    def test_plan_already_ordered(self, capfd):
         """Test execution while already DCA."""
-        with vcr.use_cassette(
-            "tests/fixtures/vcr_cassettes/test_handle_dca_logic_error.yaml",
-            filter_headers=["API-Key", "API-Sign"],
-        ):
-            self.dca.handle_dca_logic()
-        captured = capfd.readouterr()
-        test_output = (
-            "It's 2021-04-16 18:54:53 on Kraken, 2021-04-16 18:54:53 on "
-            "system.\n"
-            "Current trade balance: 16524.7595 ZUSD.\n"
-            "Pair balances: 359.728 ZEUR, 0.128994332 XETH.\n"
+        exchange = FakeKraken(
+            {"XETHZEUR": 2083.16}, time_function=lambda: time.time()
+        )
+        with patch_urlopen(exchange), mock_dynamodb():
+            create_dynamodb_table()
+            self.run_dca()
+            capfd.readouterr()
+            plan = self.run_dca()
+        assert exchange.calls["AddOrder"] == 1
+        assert plan.items[0].skip_reason == (
+            "No DCA for XETHZEUR: Already placed an order today."
+        )
+        assert (
             "No DCA for XETHZEUR: Already placed an order today.\n"
+            in capfd.readouterr().out
         )
-        assert captured.out == test_output
 
     def test_get_system_time(self):
         """Test with system time in the past."""
@@ -111,7 +135,7 @@ class TestDCA:
                 "tests/fixtures/vcr_cassettes/test_get_time.yaml"
             ):
                 with pytest.raises(OSError) as e_info:
-                    self.dca.get_system_time()
+                    checked_system_time(self.dca.ka)
         error_message = (
             "Too much lag -> Check your internet connection "
             "speed or synchronize your system time."
@@ -125,60 +149,43 @@ class TestDCA:
             with vcr.use_cassette(
                 "tests/fixtures/vcr_cassettes/test_get_time.yaml"
             ):
-                date = self.dca.get_system_time()
+                date = checked_system_time(self.dca.ka)
         assert date == test_date
 
-    @vcr.use_cassette(
-        "tests/fixtures/vcr_cassettes/test_check_account_balance.yaml",
-        filter_headers=["API-Key", "API-Sign"],
-    )
-    def test_check_account_balance_insufficient(self):
+    def test_check_balance_insufficient(self):
         with pytest.raises(ValueError) as e_info:
-            self.dca.check_account_balance()
+            self.dca.check_balance({"ZEUR": "19.9", "XETH": "0.1"})
         assert "Insufficient funds to buy 20.0 ZEUR of XETH" in str(
             e_info.value
         )
 
-    @vcr.use_cassette(
-        "tests/fixtures/vcr_cassettes/test_check_account_balance.yaml",
-        filter_headers=["API-Key", "API-Sign"],
-    )
-    def test_check_account_balance_no_pair_base(self):
-        with patch.object(
-            target=KrakenApi,
-            attribute="get_balance",
-            return_value={"ZEUR": "0.0"},
-        ):
-            with pytest.raises(ValueError) as e_info:
-                self.dca.check_account_balance()
+    def test_check_balance_no_pair_base(self, capfd):
+        with pytest.raises(ValueError) as e_info:
+            self.dca.check_balance({"ZEUR": "0.0"})
         assert "Insufficient funds to buy 20.0 ZEUR of XETH" in str(
             e_info.value
         )
+        self.dca.check_balance({"ZEUR": "20.0"})
+        assert "Pair balances: 20.0 ZEUR, 0 XETH." in capfd.readouterr().out
 
-    @vcr.use_cassette(
-        "tests/fixtures/vcr_cassettes/test_check_account_balance.yaml",
-        filter_headers=["API-Key", "API-Sign"],
-    )
-    def test_check_account_balance_no_pair_quote(self):
-        with patch.object(
-            target=KrakenApi,
-            attribute="get_balance",
-            return_value={"XETH": 8.02e-07},
-        ):
-            with pytest.raises(ValueError) as e_info:
-                self.dca.check_account_balance()
+    def test_check_balance_no_pair_quote(self):
+        with pytest.raises(ValueError) as e_info:
+            self.dca.check_balance({"XETH": 8.02e-07})
         assert "Insufficient funds to buy 20.0 ZEUR of XETH" in str(
             e_info.value
         )
 
-    @vcr.use_cassette(
-        "tests/fixtures/vcr_cassettes/test_count_pair_daily_orders.yaml",
-        filter_headers=["API-Key", "API-Sign"],
-    )
-    def test_count_pair_daily_orders(self):
-        order_count = self.dca.count_pair_daily_orders()
-        assert type(order_count) == int
-        assert order_count == 1
+    def test_count_daily_orders(self):
+        open_orders = {
+            "O1": {"descr": {"pair": "XETHEUR"}},
+            "O2": {"descr": {"pair": "XXBTEUR"}},
+        }
+        closed_orders = {
+            "O3": {"descr": {"pair": "XETHZEUR"}},
+            "O4": {"descr": {"pair": "XETHEUR"}},
+        }
+        order_count = self.dca.count_daily_orders(open_orders, closed_orders)
+        assert order_count == 3
 
     def test_extract_pair_orders(self):
         # Pairs orders dictionary
@@ -231,7 +238,7 @@ class TestDCA:
         assert type(pair_orders) == dict
         assert len(pair_orders) == 0
 
-    def test_send_buy_limit_order_error(self):
+    def test_print_order_information_error(self):
         # Test error with order volume < pair minimum volume.
         order = Order(
             self.dca.user_name,
@@ -247,17 +254,13 @@ class TestDCA:
             20.0,
         )
         with pytest.raises(ValueError) as e_info:
-            self.dca.send_buy_limit_order(order)
+            self.dca.print_order_information(order)
         error_message = (
             "Too low volume to buy XETH: current 0.001, " "minimum 0.005."
         )
         assert error_message in str(e_info.value)
 
-    @vcr.use_cassette(
-        "tests/fixtures/vcr_cassettes/test_create_order.yaml",
-        filter_headers=["API-Key", "API-Sign"],
-    )
-    def test_send_buy_limit_order(self, capfd):
+    def test_execute_plan_order(self, capfd, tmp_path):
         # Test valid order
         order = Order(
             self.dca.user_name,
@@ -272,7 +275,15 @@ class TestDCA:
             0.0519,
             20.0,
         )
-        self.dca.send_buy_limit_order(order)
+        self.dca.order_store = SQLiteOrderStore(str(tmp_path / "orders.db"))
+        plan = DCAPlan(
+            self.dca.user_name,
+            order.date,
+            [PlannedOrder("XETHZEUR", order=order)],
+        )
+        exchange = FakeKraken({"XETHZEUR": 2083.16})
+        with patch_urlopen(exchange):
+            execute_plan(plan, [self.dca])
         captured = capfd.readouterr()
         test_output = (
             "Create a 19.9481ZEUR buy limit order of 0.01029256XETH at "
@@ -280,10 +291,14 @@ class TestDCA:
             "Fee expected: 0.0519ZEUR (0.26% taker fee).\n"
             "Total price expected: 0.01029256XETH for 20.0ZEUR.\n"
             "Order successfully created.\n"
-            "TXID: OUHXFN-RTP6W-ART4VP\n"
-            "Description: buy 0.01029256 ETHEUR @ limit 1938.11\n"
+            "TXID: O00001-FAKE0-193811\n"
+            "Description: buy 0.01029256 XETHEUR @ limit 1938.11\n"
+            f"Order information saved to {self.dca.order_store}.\n"
         )
         assert captured.out == test_output
+        assert [
+            saved.txid for saved in self.dca.order_store.read_orders()
+        ] == ["O00001-FAKE0-193811"]
 
     @vcr.use_cassette("tests/fixtures/vcr_cassettes/test_limit_factor.yaml")
     def test_limit_factor(self):
@@ -0,0 +1,178 @@
+"""due_index.py tests module."""
+import time
+from datetime import datetime
+
+import boto3
+import pytest
+import yaml
+from freezegun import freeze_time
+from moto import mock_dynamodb
+
+from krakendca.api import KrakenClient
+from krakendca.config import Config
+from krakendca.due_index import DueIndex, DynamoDueIndex, FileDueIndex
+from krakendca.krakendca import KrakenDCA
+from krakendca.utils import datetime_as_utc_unix
+from tests.fake_kraken import FakeKraken, fake_pair_names, patch_urlopen
+from tests.test_dca import create_dynamodb_table
+
+PRIVATE_KEY = "a3Jha2VuLWRjYS10ZXN0"
+PRIVATE_METHODS = ("Balance", "TradeBalance", "OpenOrders", "ClosedOrders")
+
+
+def test_file_due_index(tmp_path, capfd) -> None:
+    path = tmp_path / "index" / "due.json"
+    index = FileDueIndex(str(path))
+    assert index.last_order_time("user_X", "XETHZEUR") is None
+    index.record("user_X", "XETHZEUR", 1631476207.84)
+    index.record("user_X", "XETHZEUR", 1631400000)
+    index.record("user_Y", "XXBTZEUR", 1631476000)
+    index.save()
+    index = FileDueIndex(str(path))
+    assert index.last_order_time("user_X", "XETHZEUR") == 1631476207
+    assert index.last_order_time("user_Y", "XXBTZEUR") == 1631476000
+    index.discard("user_Y", "XXBTZEUR")
+    index.save()
+    assert FileDueIndex(str(path)).entries("user_Y") == {}
+    # Unreadable indexes are ignored.
+    path.write_text("{")
+    assert FileDueIndex(str(path)).entries("user_X") == {}
+    assert "unreadable, checking Kraken" in capfd.readouterr().out
+
+
+@mock_dynamodb
+def test_dynamo_due_index() -> None:
+    dynamodb = boto3.resource("dynamodb", region_name="us-east-1")
+    dynamodb.create_table(
+        TableName="kraken-dca-due",
+        KeySchema=[{"AttributeName": "user_name", "KeyType": "HASH"}],
+        AttributeDefinitions=[
+            {"AttributeName": "user_name", "AttributeType": "S"}
+        ],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    index = DynamoDueIndex("kraken-dca-due")
+    index.record("user_X", "XETHZEUR", 1631476207)
+    index.save()
+    index = DynamoDueIndex("kraken-dca-due")
+    assert index.entries("user_X") == {"XETHZEUR": 1631476207}
+    assert index.entries("user_Y") == {}
+
+
+def test_from_environment(monkeypatch, tmp_path) -> None:
+    monkeypatch.delenv("KRAKEN_DCA_DUE_INDEX", raising=False)
+    assert DueIndex.from_environment() is None
+    monkeypatch.setenv("KRAKEN_DCA_DUE_INDEX", str(tmp_path / "due.json"))
+    index = DueIndex.from_environment()
+    assert isinstance(index, FileDueIndex)
+    assert index.path == tmp_path / "due.json"
+    monkeypatch.setenv("KRAKEN_DCA_DUE_INDEX", "dynamodb:kraken-dca-due")
+    index = DueIndex.from_environment()
+    assert isinstance(index, DynamoDueIndex)
+    assert index.table_name == "kraken-dca-due"
+
+
+@pytest.fixture
+def exchange():
+    exchange = FakeKraken(
+        {pair: 100.0 for pair in fake_pair_names(2)},
+        time_function=lambda: time.time(),
+    )
+    with mock_dynamodb(), patch_urlopen(exchange):
+        create_dynamodb_table()
+        yield exchange
+
+
+def create_kdca(tmp_path, due_index: DueIndex) -> KrakenDCA:
+    config_file = tmp_path / "config.yaml"
+    config_file.write_text(
+        yaml.safe_dump(
+            {
+                "api": {
+                    "user_name": "user_X",
+                    "public_key": "due-key",
+                    "private_key": PRIVATE_KEY,
+                },
+                "dca_pairs": [
+                    {"pair": pair, "delay": delay, "amount": 20}
+                    for pair, delay in zip(fake_pair_names(2), (1, 3))
+                ],
+            }
+        )
+    )
+    ka = KrakenClient("due-key", PRIVATE_KEY)
+    kdca = KrakenDCA(Config(config_file), ka, due_index=due_index)
+    kdca.initialize_pairs_dca()
+    return kdca
+
+
+def private_calls(exchange: FakeKraken) -> int:
+    return sum(exchange.calls[method] for method in PRIVATE_METHODS)
+
+
+def test_skip_not_due_pairs(exchange, tmp_path, capfd) -> None:
+    due_index = FileDueIndex(str(tmp_path / "due.json"))
+    first_pair, second_pair = fake_pair_names(2)
+    with freeze_time("2021-09-12 10:00:00") as frozen:
+        kdca = create_kdca(tmp_path, due_index)
+        kdca.handle_pairs_dca()
+        assert exchange.calls["AddOrder"] == 2
+        now = datetime_as_utc_unix(datetime(2021, 9, 12, 10))
+        assert FileDueIndex(due_index.path).entries("user_X") == {
+            first_pair: now,
+            second_pair: now,
+        }
+        # Pairs ordered in their delay window are skipped without
+        # private API call.
+        calls = private_calls(exchange)
+        capfd.readouterr()
+        frozen.move_to("2021-09-12 18:00:00")
+        plan = create_kdca(tmp_path, due_index).handle_pairs_dca()
+        assert private_calls(exchange) == calls
+        assert [item.skip_reason for item in plan.items] == [
+            f"No DCA for {first_pair}: Already placed an order today.",
+            f"No DCA for {second_pair}: Already placed an order today.",
+        ]
+        assert capfd.readouterr().out == (
+            "Hi user_X, current configuration:\n"
+            f"Pair {first_pair}: delay: 1, amount: 20.0\n"
+            f"Pair {second_pair}: delay: 3, amount: 20.0\n"
+            "DCA (2 pairs):\n"
+            "It's 2021-09-12 18:00:00 on Kraken, 2021-09-12 18:00:00 on "
+            "system.\n"
+            "Clock offset: +0.500s (RTT 0ms).\n"
+            f"Pair {first_pair}: delay: 1, amount: 20.0\n"
+            f"No DCA for {first_pair}: Already placed an order today.\n"
+            f"Pair {second_pair}: delay: 3, amount: 20.0\n"
+            f"No DCA for {second_pair}: Already placed an order today.\n"
+        )
+        # Only the pair due the next day is checked on Kraken.
+        frozen.move_to("2021-09-13 10:00:00")
+        plan = create_kdca(tmp_path, due_index).handle_pairs_dca()
+        assert [item.pair for item in plan.items] == [first_pair, second_pair]
+        assert plan.items[0].order is not None
+        assert plan.items[1].skip_reason is not None
+        assert exchange.calls["AddOrder"] == 3
+
+
+def test_missing_or_suspect_index(exchange, tmp_path) -> None:
+    first_pair, second_pair = fake_pair_names(2)
+    with freeze_time("2021-09-12 10:00:00"):
+        create_kdca(tmp_path, None).handle_pairs_dca()
+        assert exchange.calls["AddOrder"] == 2
+        # Missing index: Kraken is checked once and orders recorded.
+        due_index = FileDueIndex(str(tmp_path / "due.json"))
+        due_index.record("user_X", second_pair, time.time() + 3600)
+        calls = private_calls(exchange)
+        create_kdca(tmp_path, due_index).handle_pairs_dca()
+        assert private_calls(exchange) > calls
+        assert exchange.calls["AddOrder"] == 2
+        now = datetime_as_utc_unix(datetime(2021, 9, 12, 10))
+        # The order in the future was suspect and replaced.
+        assert FileDueIndex(due_index.path).entries("user_X") == {
+            first_pair: now,
+            second_pair: now,
+        }
+        calls = private_calls(exchange)
+        create_kdca(tmp_path, due_index).handle_pairs_dca()
+        assert private_calls(exchange) == calls
@@ -0,0 +1,166 @@
+"""export.py tests module."""
+import csv
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from moto import mock_dynamodb
+
+from krakendca.export import export_rows, ledger_rows, main, scan_rows
+from krakendca.metrics import METRICS
+from krakendca.order import CSV_FIELDS, Order
+from krakendca.store import DynamoOrderStore
+from tests.test_dca import create_dynamodb_table
+
+
+def create_orders():
+    start = datetime(2021, 4, 15, 21, 0)
+    orders = []
+    for index in range(25):
+        order = Order.buy_limit_order(
+            "user_X" if index % 5 else "user_Y",
+            start + timedelta(days=index),
+            "XETHZEUR" if index % 2 else "XXBTZEUR",
+            20,
+            2083.16 + index,
+            8,
+            4,
+            0.985,
+        )
+        order.txid = f"O{index:05d}-TEST-000000"
+        order.description = f"buy {order.volume} @ limit {order.pair_price}"
+        orders.append(order)
+    return orders
+
+
+@pytest.fixture
+def orders():
+    orders = create_orders()
+    with mock_dynamodb():
+        create_dynamodb_table()
+        DynamoOrderStore().save_orders(orders)
+        yield orders
+
+
+def test_scan_rows(orders) -> None:
+    METRICS.reset()
+    rows = scan_rows("kraken-dca", user="user_X", page_size=4)
+    # Rows are read as they are consumed.
+    first_row = next(rows)
+    assert METRICS.series[("dynamodb", "Scan", "", "")].calls == 1
+    rows = [first_row] + list(rows)
+    assert METRICS.series[("dynamodb", "Scan", "", "")].calls == 7
+    expected = [
+        order.to_row() for order in orders if order.user_name == "user_X"
+    ]
+    assert sorted(rows, key=lambda row: row["txid"]) == expected
+    rows = scan_rows(
+        "kraken-dca",
+        pair="XETHZEUR",
+        start=datetime(2021, 4, 20),
+        end=datetime(2021, 4, 24, 21, 0),
+    )
+    assert sorted(row["txid"] for row in rows) == [
+        "O00005-TEST-000000",
+        "O00007-TEST-000000",
+    ]
+
+
+def test_export_csv(orders, tmp_path) -> None:
+    output = str(tmp_path / "orders.csv")
+    count = export_rows(scan_rows("kraken-dca"), output, chunk_size=10)
+    assert count == 25
+    with open(output, newline="") as csv_file:
+        reader = csv.DictReader(csv_file)
+        assert tuple(reader.fieldnames) == CSV_FIELDS
+        exported = sorted(
+            (Order.from_row(row) for row in reader),
+            key=lambda order: order.txid,
+        )
+    assert [order.to_item() for order in exported] == [
+        order.to_item() for order in orders
+    ]
+
+
+def test_export_ndjson(orders, tmp_path) -> None:
+    output = str(tmp_path / "orders.ndjson")
+    count = export_rows(
+        scan_rows("kraken-dca", user="user_Y"), output, "ndjson", 2
+    )
+    assert count == 5
+    with open(output) as ndjson_file:
+        rows = [json.loads(line) for line in ndjson_file]
+    assert sorted(row["txid"] for row in rows) == [
+        f"O{index:05d}-TEST-000000" for index in range(0, 25, 5)
+    ]
+    assert rows[0]["limit_factor"] == "0.985"
+
+
+def test_export_parquet(orders, tmp_path) -> None:
+    pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+
+    output = str(tmp_path / "orders.parquet")
+    count = export_rows(scan_rows("kraken-dca"), output, "parquet", 10)
+    assert count == 25
+    parquet_file = pq.ParquetFile(output)
+    assert parquet_file.metadata.num_row_groups == 3
+    table = parquet_file.read()
+    exported = sorted(table.to_pylist(), key=lambda row: row["txid"])
+    assert exported[0]["date"] == datetime(2021, 4, 15, 21, 0)
+    assert exported[0]["volume"] == orders[0].to_item()["volume"]
+    assert exported[0]["total_price"] == orders[0].to_item()["total_price"]
+
+
+def test_export_format_is_not_valid(tmp_path) -> None:
+    with pytest.raises(ValueError) as e_info:
+        export_rows([], str(tmp_path / "orders.xml"), "xml")
+    assert "Export format must be one of csv, ndjson, parquet." in str(
+        e_info.value
+    )
+
+
+def test_ledger(tmp_path, capfd) -> None:
+    ledger = tmp_path / "ledger.csv"
+    with open(ledger, "w", newline="") as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        writer.writerows(order.to_row() for order in create_orders())
+    with open(ledger, newline="") as csv_file:
+        rows = list(
+            ledger_rows(csv_file, pair="XXBTZEUR", end=datetime(2021, 4, 20))
+        )
+    assert [row["txid"] for row in rows] == [
+        "O00000-TEST-000000",
+        "O00002-TEST-000000",
+        "O00004-TEST-000000",
+    ]
+    output = tmp_path / "export.ndjson"
+    assert (
+        main(
+            [
+                str(output),
+                "--ledger",
+                str(ledger),
+                "--user",
+                "user_Y",
+                "--start",
+                "2021-04-25",
+            ]
+        )
+        == 0
+    )
+    lines = output.read_text().splitlines()
+    assert [json.loads(line)["txid"] for line in lines] == [
+        "O00010-TEST-000000",
+        "O00015-TEST-000000",
+        "O00020-TEST-000000",
+    ]
+    assert f"3 orders exported to {output}." in capfd.readouterr().out
+
+
+def test_main_dynamodb(orders, tmp_path) -> None:
+    output = tmp_path / "orders.csv"
+    main([str(output), "--pair", "XETHZEUR", "--chunk-size", "5"])
+    with open(output, newline="") as csv_file:
+        assert len(list(csv.DictReader(csv_file))) == 12
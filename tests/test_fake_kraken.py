@@ -0,0 +1,126 @@
+"""fake_kraken.py tests module."""
+import json
+import time
+from unittest.mock import patch
+from urllib.request import Request, urlopen
+
+import pytest
+from krakenapi import KrakenApi
+
+from tests.fake_kraken import (
+    ApiCounter,
+    FakeKraken,
+    FakeKrakenServer,
+    constant_latency,
+    patch_kraken_url,
+)
+
+PRIVATE_KEY = "a3Jha2VuLWRjYS10ZXN0"
+
+
+@pytest.fixture
+def server():
+    exchange = FakeKraken({"XETHZEUR": 2083.16}, quote_balance=100)
+    with FakeKrakenServer(exchange) as server:
+        with patch_kraken_url(server.url):
+            yield server
+
+
+def test_public_endpoints(server: FakeKrakenServer) -> None:
+    ka = KrakenApi()
+    assert abs(ka.get_time() - time.time()) < 2
+    assert "XETHZEUR" in ka.get_asset_pairs()
+    assert ka.get_assets()["ZEUR"]["decimals"] == 4
+    ticker = ka.get_pair_ticker("XETHZEUR")
+    assert ticker["XETHZEUR"]["a"][0] == "2083.16"
+
+
+def test_stateful_orders(server: FakeKrakenServer) -> None:
+    ka = KrakenApi("user-key", PRIVATE_KEY)
+    assert float(ka.get_balance()["ZEUR"]) == 100
+    response = ka.create_order(
+        "XETHZEUR", "buy", "limit", 2083.16, 0.00957589, "fciq"
+    )
+    assert response["descr"]["order"] == (
+        "buy 0.00957589 XETHEUR @ limit 2083.16"
+    )
+    assert float(ka.get_balance()["ZEUR"]) == pytest.approx(80, abs=0.01)
+    assert float(ka.get_balance()["XETH"]) == 0.00957589
+    closed_orders = ka.get_closed_orders({"start": 0})
+    assert list(closed_orders) == response["txid"]
+    # Limit orders below the ask price stay open.
+    ka.create_order("XETHZEUR", "buy", "limit", 2000, 0.001, "fciq")
+    assert len(ka.get_open_orders()) == 1
+    assert server.exchange.calls["AddOrder"] == 2
+    with pytest.raises(ValueError) as e_info:
+        ka.create_order("XETHZEUR", "buy", "limit", 2000, 1, "fciq")
+    assert "Insufficient funds" in str(e_info.value)
+
+
+def test_error_injection(server: FakeKrakenServer) -> None:
+    ka = KrakenApi()
+    server.inject_error("Ticker", "EGeneral:Internal error")
+    with pytest.raises(ValueError) as e_info:
+        ka.get_pair_ticker("XETHZEUR")
+    assert "EGeneral:Internal error" in str(e_info.value)
+    # HTTP errors and dropped connections are retried by krakenapi.
+    server.inject_error("Time", "HTTP 503")
+    server.inject_error("Time", "DROP")
+    with patch("time.sleep") as sleep:
+        assert ka.get_time()
+    assert sleep.call_count == 2
+    assert [r["error"] for r in server.requests[-3:]] == [
+        "HTTP 503",
+        "DROP",
+        None,
+    ]
+
+
+def test_error_rates() -> None:
+    exchange = FakeKraken({"XETHZEUR": 2083.16})
+    server = FakeKrakenServer(exchange, error_rates={"Ticker": 1}, seed=1)
+    status, body = server.answer("Ticker", {"pair": "XETHZEUR"}, "")
+    assert json.loads(body) == {"error": ["EService:Unavailable"]}
+    status, body = server.answer("Time", {}, "")
+    assert json.loads(body)["error"] == []
+    server.httpd.server_close()
+
+
+def test_latency() -> None:
+    exchange = FakeKraken({"XETHZEUR": 2083.16})
+    latency = {"Time": constant_latency(0.05)}
+    with FakeKrakenServer(exchange, latency=latency) as server:
+        start = time.perf_counter()
+        urlopen(Request(server.url + "/0/public/Time")).read()
+        assert time.perf_counter() - start >= 0.05
+        start = time.perf_counter()
+        urlopen(Request(server.url + "/0/public/Assets")).read()
+        assert time.perf_counter() - start < 0.05
+
+
+def test_rate_limit() -> None:
+    exchange = FakeKraken({"XETHZEUR": 2083.16})
+    rate_limit = {"maximum": 3, "decay_per_second": 0}
+    with FakeKrakenServer(exchange, rate_limit=rate_limit) as server:
+
+        def call(method: str) -> dict:
+            request = Request(f"{server.url}/0/private/{method}", data=b"")
+            request.add_header("API-Key", "user-key")
+            return json.loads(urlopen(request).read())
+
+        assert call("Balance")["error"] == []
+        # ClosedOrders costs 2 like on Kraken.
+        assert call("ClosedOrders")["error"] == []
+        assert call("Balance")["error"] == ["EAPI:Rate limit exceeded"]
+        # Public calls are not counted.
+        assert json.loads(urlopen(server.url + "/0/public/Time").read())
+        assert server.rate_limited["Balance"] == 1
+
+
+def test_api_counter_decay() -> None:
+    now = [0.0]
+    counter = ApiCounter(2, 1, clock=lambda: now[0])
+    assert counter.try_add(2)
+    assert not counter.try_add(1)
+    now[0] = 1.0
+    assert counter.try_add(1)
@@ -0,0 +1,181 @@
+"""fanout.py tests module."""
+import io
+import json
+import multiprocessing
+import threading
+from pathlib import Path
+
+import pytest
+import yaml
+from moto import mock_dynamodb
+
+from krakendca.fanout import (
+    LambdaExecutor,
+    LocalExecutor,
+    Shard,
+    coordinate,
+    plan_shards,
+    run_shard,
+)
+from krakendca.plan import DCAPlan
+from tests.fake_kraken import (
+    FakeKraken,
+    FakeKrakenServer,
+    fake_pair_names,
+    patch_kraken_url,
+)
+from tests.test_dca import create_dynamodb_table
+
+PRIVATE_KEY = "a3Jha2VuLWRjYS10ZXN0"
+
+
+def write_configs(directory: Path, n_accounts: int, n_pairs: int) -> None:
+    for account in range(n_accounts):
+        config = {
+            "api": {
+                "user_name": f"user_{account}",
+                "public_key": f"key-{account}",
+                "private_key": PRIVATE_KEY,
+            },
+            "dca_pairs": [
+                {"pair": pair, "delay": 1, "amount": 20}
+                for pair in fake_pair_names(n_pairs)
+            ],
+        }
+        config_file = directory / f"config_{account}.yaml"
+        config_file.write_text(yaml.safe_dump(config))
+
+
+def test_plan_shards(tmp_path) -> None:
+    write_configs(tmp_path, 2, 5)
+    (tmp_path / "config_x.yaml").write_text(
+        open("tests/fixtures/config.yaml").read()
+    )
+    shards = plan_shards(tmp_path)
+    assert [str(shard) for shard in shards] == [
+        "config_0.yaml",
+        "config_1.yaml",
+    ]
+    shards = plan_shards(tmp_path, pairs_per_shard=2)
+    assert [str(shard) for shard in shards] == [
+        "config_0.yaml[0,1]",
+        "config_0.yaml[2,3]",
+        "config_0.yaml[4]",
+        "config_1.yaml[0,1]",
+        "config_1.yaml[2,3]",
+        "config_1.yaml[4]",
+    ]
+    assert Shard.from_dict(shards[2].to_dict()).pairs == [4]
+
+
+@pytest.fixture
+def server():
+    exchange = FakeKraken({pair: 100.0 for pair in fake_pair_names(4)})
+    with mock_dynamodb():
+        create_dynamodb_table()
+        with FakeKrakenServer(exchange) as server:
+            with patch_kraken_url(server.url):
+                yield server
+
+
+@pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(),
+    reason="Workers inherit the fake Kraken URL by fork.",
+)
+def test_coordinate_processes(server, tmp_path, capfd) -> None:
+    write_configs(tmp_path, 3, 4)
+    shards = plan_shards(tmp_path, pairs_per_shard=2)
+    executor = LocalExecutor(
+        tmp_path, 3, mp_context=multiprocessing.get_context("fork")
+    )
+    try:
+        results = coordinate(shards, executor)
+    finally:
+        executor.shutdown()
+    assert [result["error"] for result in results] == [None] * 6
+    plans = [DCAPlan.from_json(result["plan"]) for result in results]
+    assert [len(plan.orders) for plan in plans] == [2] * 6
+    assert server.exchange.calls["AddOrder"] == 12
+    assert "6 shards done" in capfd.readouterr().out
+
+
+def test_coordinate_retries(server, tmp_path, capfd) -> None:
+    write_configs(tmp_path, 2, 2)
+    attempts = []
+    lock = threading.Lock()
+
+    def worker(shard: dict, config_directory: str) -> dict:
+        with lock:
+            attempts.append((shard["config_file"], shard["attempt"]))
+        if shard["config_file"] == "config_1.yaml":
+            # Failing shard, the other one isn't affected.
+            raise ConnectionError("Worker lost")
+        return run_shard(shard, config_directory)
+
+    executor = LocalExecutor(tmp_path, 2, processes=False, worker=worker)
+    results = coordinate(plan_shards(tmp_path), executor, max_attempts=3)
+    executor.shutdown()
+    assert sorted(attempts) == [
+        ("config_0.yaml", 1),
+        ("config_1.yaml", 1),
+        ("config_1.yaml", 2),
+        ("config_1.yaml", 3),
+    ]
+    assert results[0]["error"] is None
+    assert results[1]["error"] == "ConnectionError: Worker lost"
+    assert server.exchange.calls["AddOrder"] == 2
+    captured = capfd.readouterr()
+    assert (
+        "Shard config_1.yaml failed (attempt 3): ConnectionError: "
+        "Worker lost." in captured.out
+    )
+    assert "2 shards done" in captured.out
+    assert "1 failed." in captured.out
+
+
+def test_run_shard_error(tmp_path) -> None:
+    result = run_shard(Shard("config_missing.yaml").to_dict(), tmp_path)
+    assert result == {
+        "shard": {
+            "config_file": "config_missing.yaml",
+            "pairs": None,
+            "attempt": 1,
+        },
+        "error": "FileNotFoundError: Configuration file not found.",
+        "plan": None,
+    }
+
+
+class LambdaClient:
+    """Lambda client invoking the worker in-process."""
+
+    def __init__(self, config_directory: Path) -> None:
+        self.config_directory = config_directory
+        self.invocations = []
+
+    def invoke(self, FunctionName, InvocationType, Payload) -> dict:
+        shard = json.loads(Payload)
+        self.invocations.append((FunctionName, InvocationType, shard))
+        if shard["attempt"] == 1 and shard["config_file"] == "config_1.yaml":
+            payload = {"errorMessage": "Task timed out after 60.00 seconds"}
+            return {
+                "FunctionError": "Unhandled",
+                "Payload": io.BytesIO(json.dumps(payload).encode()),
+            }
+        result = run_shard(shard, self.config_directory)
+        return {"Payload": io.BytesIO(json.dumps(result).encode())}
+
+
+def test_lambda_executor(server, tmp_path) -> None:
+    write_configs(tmp_path, 2, 1)
+    client = LambdaClient(tmp_path)
+    executor = LambdaExecutor("kraken-dca-worker", 2, client)
+    results = coordinate(plan_shards(tmp_path), executor)
+    executor.shutdown()
+    assert [result["error"] for result in results] == [None, None]
+    assert len(client.invocations) == 3
+    assert client.invocations[0][:2] == (
+        "kraken-dca-worker",
+        "RequestResponse",
+    )
+    assert server.exchange.calls["AddOrder"] == 2
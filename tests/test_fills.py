@@ -0,0 +1,133 @@
+"""fills.py tests module."""
+import time
+from decimal import Decimal
+
+import boto3
+import pytest
+from freezegun import freeze_time
+from moto import mock_dynamodb
+
+from krakendca.api import KrakenClient
+from krakendca.fills import (
+    FillTracker,
+    fill_times,
+    percentile,
+    print_fill_report,
+)
+from tests.fake_kraken import FakeKraken, fake_pair_names, patch_urlopen
+from tests.test_dca import create_dynamodb_table
+
+PRIVATE_KEY = "a3Jha2VuLWRjYS10ZXN0"
+
+
+@pytest.fixture
+def exchange():
+    exchange = FakeKraken(
+        {pair: 100.0 for pair in fake_pair_names(2)},
+        time_function=lambda: time.time(),
+    )
+    with mock_dynamodb(), patch_urlopen(exchange):
+        create_dynamodb_table()
+        yield exchange
+
+
+def add_open_order(
+    exchange: FakeKraken, pair: str, limit_factor: Decimal = None
+) -> str:
+    response = exchange.handle(
+        "AddOrder",
+        {
+            "pair": pair,
+            "type": "buy",
+            "ordertype": "limit",
+            "price": "90.0",
+            "volume": "0.1",
+        },
+        "fills-key",
+    )
+    txid = response["result"]["txid"][0]
+    item = {"txid": txid, "user_name": "user_X", "pair": pair}
+    if limit_factor is not None:
+        item["limit_factor"] = limit_factor
+    table = boto3.resource("dynamodb", region_name="us-east-1").Table(
+        "kraken-dca"
+    )
+    table.put_item(Item=item)
+    return txid
+
+
+def test_track_fills(exchange, capfd) -> None:
+    first_pair, second_pair = fake_pair_names(2)
+    tracker = FillTracker(
+        "user_X", KrakenClient("fills-key", PRIVATE_KEY), "kraken-dca"
+    )
+    with freeze_time("2021-09-12 10:00:00") as frozen:
+        first_txids = [
+            add_open_order(exchange, first_pair, Decimal("0.9"))
+            for _ in range(40)
+        ]
+        second_txids = [
+            add_open_order(exchange, second_pair) for _ in range(20)
+        ]
+        for txid in first_txids[:10] + second_txids[:2]:
+            frozen.tick(60)
+            exchange.fill_order(txid)
+        items = tracker.track()
+        # 60 unfilled orders are queried in 2 calls.
+        assert exchange.calls["QueryOrders"] == 2
+        closed = [item for item in items if item["status"] == "closed"]
+        assert len(closed) == 12
+        assert closed[0]["vol_exec"] == Decimal("0.10000000")
+        assert closed[0]["cost_exec"] == Decimal("9.00000")
+        assert closed[0]["fee_exec"] == Decimal("0.02340")
+        # Only orders still open are queried again.
+        exchange.calls.clear()
+        items = tracker.track()
+        assert exchange.calls["QueryOrders"] == 1
+    times = fill_times(items)
+    assert times[(first_pair, Decimal("0.9"))] == [
+        60.0 * minutes for minutes in range(1, 11)
+    ]
+    assert times[(second_pair, None)] == [660.0, 720.0]
+    print_fill_report(times)
+    captured = capfd.readouterr()
+    assert "60 unfilled orders of user_X checked, 60 updated." in (
+        captured.out
+    )
+    assert "48 unfilled orders of user_X checked, 0 updated." in captured.out
+    assert (
+        f"Time to fill of {first_pair} (limit factor 0.9): p50 300sc, "
+        "p90 540sc, p99 600sc (10 orders)." in captured.out
+    )
+    assert (
+        f"Time to fill of {second_pair} (limit factor unknown): p50 660sc, "
+        "p90 720sc, p99 720sc (2 orders)." in captured.out
+    )
+
+
+def test_final_status_not_overwritten(exchange) -> None:
+    tracker = FillTracker(
+        "user_X", KrakenClient("fills-key", PRIVATE_KEY), "kraken-dca"
+    )
+    txid = add_open_order(exchange, fake_pair_names(1)[0])
+    assert tracker.update_order(txid, {"status": "canceled"})
+    assert not tracker.update_order(txid, {"status": "open"})
+    # Unknown orders aren't created.
+    assert not tracker.update_order("OUNKNOWN", {"status": "open"})
+    item = tracker.table().get_item(Key={"txid": txid})["Item"]
+    assert item["status"] == "canceled"
+
+
+def test_query_orders_limit() -> None:
+    ka = KrakenClient("fills-key", PRIVATE_KEY)
+    with pytest.raises(ValueError) as e_info:
+        ka.query_orders([f"O{i}" for i in range(51)])
+    assert "QueryOrders accepts up to 50 txids." in str(e_info.value)
+
+
+def test_percentile() -> None:
+    values = [float(value) for value in range(1, 11)]
+    assert percentile(values, 50) == 5
+    assert percentile(values, 90) == 9
+    assert percentile(values, 99) == 10
+    assert percentile([3.0], 50) == 3
@@ -0,0 +1,134 @@
+"""history.py tests module."""
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+from krakendca.order import Order
+
+np = pytest.importorskip("numpy")
+history = pytest.importorskip("krakendca.history")
+OrderHistory = history.OrderHistory
+
+
+def create_orders():
+    start = datetime(2021, 4, 15, 21, 0)
+    orders = []
+    for index in range(6):
+        order = Order.buy_limit_order(
+            "user_X" if index % 3 else "user_Y",
+            start + timedelta(days=index),
+            "XETHZEUR" if index % 2 else "XXBTZEUR",
+            20,
+            2083.16 + index,
+            8,
+            4,
+        )
+        order.txid = f"O{index:05d}-TEST-000000"
+        orders.append(order)
+    return orders
+
+
+@pytest.fixture
+def orders_history() -> OrderHistory:
+    return OrderHistory.from_orders(create_orders())
+
+
+def test_from_orders(orders_history) -> None:
+    assert len(orders_history) == 6
+    assert orders_history.users == ["user_Y", "user_X"]
+    assert orders_history.pairs == ["XXBTZEUR", "XETHZEUR"]
+    assert orders_history.user_codes.tolist() == [0, 1, 1, 0, 1, 1]
+    assert orders_history.pair_codes.dtype == np.int32
+    assert orders_history.dates.dtype == np.dtype("datetime64[ns]")
+    assert orders_history.amounts["pair_price"][0] == 20831600000000
+    assert orders_history.amounts["volume"][0] == 957589
+    assert orders_history.txids[5] == "O00005-TEST-000000"
+
+
+def test_from_items(orders_history) -> None:
+    items = [order.to_item() for order in create_orders()]
+    from_items = OrderHistory.from_items(items)
+    assert from_items.dates.tolist() == orders_history.dates.tolist()
+    for key, values in orders_history.amounts.items():
+        assert from_items.amounts[key].tolist() == values.tolist()
+
+
+def test_filter(orders_history) -> None:
+    selected = orders_history.filter(user="user_X", pair="XETHZEUR")
+    assert selected.txids.tolist() == [
+        "O00001-TEST-000000",
+        "O00005-TEST-000000",
+    ]
+    selected = orders_history.filter(
+        start=datetime(2021, 4, 16, 21, 0), end=datetime(2021, 4, 18, 21, 0)
+    )
+    assert len(selected) == 2
+    assert selected.users is orders_history.users
+    assert len(orders_history.filter(user="user_Z")) == 0
+
+
+def test_cumsum(orders_history) -> None:
+    # Dates in reverse order, running totals follow the dates.
+    reversed_history = orders_history.take(np.arange(5, -1, -1))
+    volumes = reversed_history.amounts["volume"]
+    totals = reversed_history.cumsum("volume")
+    assert totals.tolist() == [
+        volumes[0] + volumes[2] + volumes[4],
+        volumes[1] + volumes[3] + volumes[5],
+        volumes[2] + volumes[4],
+        volumes[3] + volumes[5],
+        volumes[4],
+        volumes[5],
+    ]
+    by_user = orders_history.cumsum("price", by=("user", "pair"))
+    prices = orders_history.amounts["price"]
+    assert by_user.tolist() == [
+        prices[0],
+        prices[1],
+        prices[2],
+        prices[3],
+        prices[2] + prices[4],
+        prices[1] + prices[5],
+    ]
+    with pytest.raises(ValueError) as e_info:
+        orders_history.cumsum("price", by=("date",))
+    assert "Unknown group column: date." in str(e_info.value)
+
+
+def test_totals(orders_history) -> None:
+    totals = orders_history.filter(user="user_X").totals("total_price")
+    assert totals == {
+        "XXBTZEUR": Decimal("40.0000000000"),
+        "XETHZEUR": Decimal("40.0000000000"),
+    }
+    assert orders_history.amount("volume")[0] == 0.00957589
+
+
+def test_to_pandas(orders_history) -> None:
+    pytest.importorskip("pandas")
+    frame = orders_history.to_pandas()
+    assert frame["pair"].cat.categories.tolist() == ["XXBTZEUR", "XETHZEUR"]
+    assert frame["user_name"].tolist()[:2] == ["user_Y", "user_X"]
+    assert frame["volume"][0] == 0.00957589
+    assert frame["date"][0] == datetime(2021, 4, 15, 21, 0)
+    units = orders_history.to_pandas(float_amounts=False)
+    assert units["fee"].dtype == np.int64
+    assert units.attrs["decimals"]["volume"] == 8
+
+
+def test_to_arrow(orders_history) -> None:
+    pa = pytest.importorskip("pyarrow")
+    table = orders_history.to_arrow()
+    assert table.num_rows == 6
+    assert table.schema.field("pair").type == pa.dictionary(
+        pa.int32(), pa.string()
+    )
+    assert table.schema.field("volume").metadata == {b"decimals": b"8"}
+    assert table.column("volume").to_pylist()[0] == 957589
+    assert table.column("txid").to_pylist()[0] == "O00000-TEST-000000"
+    # Amount units buffer is shared with the history.
+    volume_buffer = table.column("volume").chunk(0).buffers()[1]
+    assert volume_buffer.address == (
+        orders_history.amounts["volume"].ctypes.data
+    )
@@ -1,4 +1,6 @@
 """krakendca.py tests module."""
+import time
+
 import vcr
 from _pytest.capture import CaptureFixture
 from freezegun import freeze_time
@@ -8,6 +10,7 @@ from moto import mock_dynamodb
 from krakendca.config import Config
 from krakendca.dca import DCA
 from krakendca.krakendca import KrakenDCA
+from tests.fake_kraken import FakeKraken, patch_urlopen
 from tests.test_dca import create_dynamodb_table
 
 
@@ -92,44 +95,67 @@ class TestKrakenDCA:
             quote_decimals=4,
         )
 
+    def fake_kdca(self) -> KrakenDCA:
+        # KrakenDCA of the exchange pairs, call under patch_urlopen.
+        kdca = KrakenDCA(self.config, self.ka)
+        kdca.initialize_pairs_dca()
+        return kdca
+
     @freeze_time("2021-09-12 19:50:08")
-    @vcr.use_cassette(
-        "tests/fixtures/vcr_cassettes/test_handle_pairs_dca.yaml",
-        filter_headers=["API-Key", "API-Sign"],
-    )
     def test_handle_pairs_dca(self, capfd: CaptureFixture) -> None:
-        with mock_dynamodb():
+        exchange = FakeKraken(
+            {"XETHZEUR": 2926.33, "XXBTZEUR": 38857.2},
+            time_function=lambda: time.time(),
+        )
+        with patch_urlopen(exchange), mock_dynamodb():
             create_dynamodb_table()
-            self.kdca.handle_pairs_dca()
+            self.fake_kdca().handle_pairs_dca()
         captured = capfd.readouterr()
-        assert "buy 0.00519042 ETHEUR @ limit 2882.44" in captured.out
-        assert "buy 0.00051336 XBTEUR @ limit 38857.2" in captured.out
+        assert "buy 0.00519042 XETHEUR @ limit 2882.44" in captured.out
+        assert "buy 0.00051336 XXBTEUR @ limit 38857.2" in captured.out
+        # The AddOrder requests carried the planned volumes and prices.
+        orders = sorted(
+            (order["vol"], order["descr"]["price"])
+            for account_orders in (
+                exchange.open_orders,
+                exchange.closed_orders,
+            )
+            for order in account_orders[self.ka.api_public_key].values()
+        )
+        assert orders == [
+            ("0.00051336", "38857.2"),
+            ("0.00519042", "2882.44"),
+        ]
+
+    def handle_eth_dca_max_price(self, exchange: FakeKraken) -> None:
+        with patch_urlopen(exchange):
+            kdca = self.fake_kdca()
+            kdca.dcas_list.pop()
+            kdca.dcas_list[0].max_price = 0
+            kdca.handle_pairs_dca()
 
     @freeze_time("2022-03-26 18:37:46")
-    @vcr.use_cassette(
-        "tests/fixtures/vcr_cassettes/test_handle_pars_dca_max_price.yaml",
-        filter_headers=["API-Key", "API-Sign"],
-    )
     def test_handle_pairs_dca_max_price(self, capfd: CaptureFixture) -> None:
-        self.kdca.dcas_list.pop()
-        self.kdca.dcas_list[0].max_price = 0
-        self.kdca.handle_pairs_dca()
+        exchange = FakeKraken(
+            {"XETHZEUR": 2840.60, "XXBTZEUR": 41000.0},
+            time_function=lambda: time.time(),
+        )
+        self.handle_eth_dca_max_price(exchange)
         captured = capfd.readouterr()
         assert (
             "No DCA for XETHZEUR: Limit price (2797.99) greater "
             "than maximum price (0)." in captured.out
         )
+        assert exchange.calls["AddOrder"] == 0
 
     @freeze_time("2022-03-26 18:37:46")
-    @vcr.use_cassette(
-        "tests/fixtures/vcr_cassettes/test_handle_pars_dca_max_price.yaml",
-        filter_headers=["API-Key", "API-Sign"],
-    )
     def test_handle_pairs_dca_limit_factor(
         self, capfd: CaptureFixture
     ) -> None:
-        self.kdca.dcas_list.pop()
-        self.kdca.dcas_list[0].max_price = 0
-        self.kdca.handle_pairs_dca()
+        exchange = FakeKraken(
+            {"XETHZEUR": 2840.60, "XXBTZEUR": 41000.0},
+            time_function=lambda: time.time(),
+        )
+        self.handle_eth_dca_max_price(exchange)
         captured = capfd.readouterr()
         assert "Factor adjusted limit price (0.9850): 2797.99." in captured.out
@@ -0,0 +1,101 @@
+"""metrics.py tests module."""
+import json
+
+import pytest
+
+from krakendca.metrics import Metrics, metric_labels
+
+
+@pytest.fixture
+def metrics() -> Metrics:
+    metrics = Metrics()
+    with metric_labels(account="user_X"):
+        with metric_labels(pair="XETHZEUR"):
+            metrics.record_call("kraken", "Ticker", 0.02)
+            metrics.record_call("kraken", "Ticker", 3, "EService:Busy")
+            metrics.record_retry("kraken", "Ticker")
+            metrics.record_hedge("kraken", "Ticker")
+            metrics.record_rate_limit_wait("kraken", "Ticker", 10)
+        metrics.record_call("kraken", "Balance", 0.1)
+    return metrics
+
+
+def test_labels(metrics: Metrics) -> None:
+    ticker = metrics.series[("kraken", "Ticker", "user_X", "XETHZEUR")]
+    assert ticker.calls == 2
+    assert ticker.errors == {"EService:Busy": 1}
+    assert ticker.retries == 1
+    assert ticker.rate_limit_wait == 10
+    assert ticker.samples == [0.02, 3]
+    balance = metrics.series[("kraken", "Balance", "user_X", "")]
+    assert balance.calls == 1
+
+
+def test_timed() -> None:
+    metrics = Metrics()
+    with metrics.timed("dynamodb", "PutItem"):
+        pass
+    with pytest.raises(KeyError):
+        with metrics.timed("dynamodb", "PutItem"):
+            raise KeyError
+    series = metrics.series[("dynamodb", "PutItem", "", "")]
+    assert series.calls == 2
+    assert series.errors == {"KeyError": 1}
+
+
+def test_to_emf(metrics: Metrics) -> None:
+    lines = metrics.to_emf(timestamp=1617721936)
+    assert len(lines) == 2
+    record = json.loads(lines[1])
+    assert record["_aws"]["Timestamp"] == 1617721936000
+    directive = record["_aws"]["CloudWatchMetrics"][0]
+    assert directive["Namespace"] == "KrakenDCA"
+    assert directive["Dimensions"] == [
+        ["service", "endpoint", "account", "pair"]
+    ]
+    assert record["pair"] == "XETHZEUR"
+    assert record["Calls"] == 2
+    assert record["Errors"] == 1
+    assert record["Hedges"] == 1
+    assert record["Latency"] == [20.0, 3000]
+    assert record["ErrorTypes"] == {"EService:Busy": 1}
+    balance_record = json.loads(lines[0])
+    assert "pair" not in balance_record
+    assert balance_record["_aws"]["CloudWatchMetrics"][0]["Dimensions"] == [
+        ["service", "endpoint", "account"]
+    ]
+
+
+def test_to_prometheus(metrics: Metrics) -> None:
+    text = metrics.to_prometheus()
+    labels = (
+        'service="kraken",endpoint="Ticker",account="user_X",'
+        'pair="XETHZEUR"'
+    )
+    assert f"krakendca_api_calls_total{{{labels}}} 2" in text
+    assert (
+        f'krakendca_api_errors_total{{{labels},error="EService:Busy"}} 1'
+        in text
+    )
+    assert f"krakendca_api_retries_total{{{labels}}} 1" in text
+    assert f"krakendca_api_hedges_total{{{labels}}} 1" in text
+    assert (
+        f'krakendca_api_latency_seconds_bucket{{{labels},le="0.025"}} 1'
+        in text
+    )
+    assert (
+        f'krakendca_api_latency_seconds_bucket{{{labels},le="+Inf"}} 2' in text
+    )
+    assert f"krakendca_api_latency_seconds_count{{{labels}}} 2" in text
+
+
+def test_emit(metrics: Metrics, monkeypatch, tmp_path, capfd) -> None:
+    prometheus_file = tmp_path / "metrics.prom"
+    monkeypatch.setenv("KRAKEN_DCA_METRICS", "emf, prometheus")
+    monkeypatch.setenv("KRAKEN_DCA_PROMETHEUS_FILE", str(prometheus_file))
+    metrics.emit()
+    assert len(capfd.readouterr().out.splitlines()) == 2
+    assert prometheus_file.read_text() == metrics.to_prometheus()
+    monkeypatch.delenv("KRAKEN_DCA_METRICS")
+    metrics.emit()
+    assert capfd.readouterr().out == ""
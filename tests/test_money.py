@@ -0,0 +1,112 @@
+"""money.py tests module."""
+from decimal import ROUND_FLOOR, ROUND_HALF_UP, Decimal
+
+import pytest
+
+from krakendca.money import (
+    Money,
+    divide_integers,
+    float_to_units,
+    float_units,
+    rescale_units,
+)
+
+
+def test_divide_integers() -> None:
+    assert divide_integers(7, 2, ROUND_FLOOR) == 3
+    assert divide_integers(-7, 2, ROUND_FLOOR) == -4
+    # Ties go to the even neighbour by default like Python round.
+    assert divide_integers(5, 2, "ROUND_HALF_EVEN") == 2
+    assert divide_integers(7, 2, "ROUND_HALF_EVEN") == 4
+    assert divide_integers(5, 2, ROUND_HALF_UP) == 3
+    assert divide_integers(8, -3, ROUND_FLOOR) == -3
+
+
+def test_from_float() -> None:
+    money = Money.from_float(2083.16)
+    assert money.units == 208316
+    assert money.decimals == 2
+    assert Money.from_float(20).decimals == 0
+    assert Money.from_float(0.1, 4) == Money(1000, 4)
+    # Exact binary value of 2.675 is below 2.675.
+    assert Money.from_float(2.675, 2) == Money(267, 2)
+    with pytest.raises(ValueError):
+        Money.from_float(float("nan"))
+
+
+def test_from_decimal() -> None:
+    assert Money.from_decimal(Decimal("19.9481")) == Money(199481, 4)
+    assert Money.from_decimal(Decimal("-1.5"), 0) == Money(-2, 0)
+    assert Money.from_decimal(Decimal("1E+2")) == Money(100, 0)
+
+
+def test_arithmetic() -> None:
+    price = Money(199481, 4)
+    fee = Money(519, 4)
+    assert price + fee == Money(20, 0)
+    assert price - fee == Money(198962, 4)
+    assert Money(15, 1) * Money(2, 0) == Money(3, 0)
+    assert 2 * Money(15, 1) == Money(3, 0)
+    assert -Money(1, 1) < Money(0, 0)
+    assert Money(10, 1) == 1
+    assert hash(Money(10, 1)) == hash(Money(1, 0)) == hash(1)
+    with pytest.raises(TypeError):
+        Money(1, 0) + 1.5
+
+
+def test_float_comparisons() -> None:
+    # Floats are compared with their exact binary value.
+    assert Money(1, 0) == 1.0
+    assert Money(15, 1) == 1.5
+    assert hash(Money(15, 1)) == hash(1.5)
+    assert Money(1, 1) != 0.1
+    assert Money(1, 1) < 0.1
+    assert Money(2, 1) > 0.1
+    assert Money(1, 0) <= 1.0 and Money(1, 0) >= 1.0
+    assert not Money(1, 0) > float("nan")
+    assert not Money(1, 0) < float("nan")
+    assert Money(1, 0) < float("inf")
+
+
+def test_rescale_and_divide() -> None:
+    assert Money(199489, 4).rescale(2) == Money(1995, 2)
+    assert Money(199489, 4).rescale(2, ROUND_FLOOR) == Money(1994, 2)
+    assert Money(1, 0).rescale(3) == Money(1000, 3)
+    quotient = Money(20, 0).divide(Money(180282, 2), 8, ROUND_FLOOR)
+    assert quotient == Money(1109373, 8)
+    with pytest.raises(ZeroDivisionError):
+        Money(1, 0).divide(Money(0, 2), 2)
+
+
+def test_conversions() -> None:
+    money = Money(-5, 3)
+    assert float(money) == -0.005
+    assert str(money) == "-0.005"
+    assert str(Money(20, 0)) == "20"
+    assert money.to_decimal() == Decimal("-0.005")
+    assert repr(money) == "Money('-0.005')"
+    with pytest.raises(AttributeError):
+        money.units = 1
+
+
+def test_scaled_units() -> None:
+    assert float_units(2083.16) == (208316, 2)
+    assert float_units(20.0) == (20, 0)
+    assert float_units(-0.5) == (-5, 1)
+    assert float_units(1e-05) == (1, 5)
+    assert float_units(15) == (15, 0)
+    assert float_to_units(0.1, 4) == 1000
+    assert float_to_units(2.675, 2) == 267
+    assert float_to_units(1.999, 2, ROUND_FLOOR) == 199
+    # Exact integer products are not floored through the float product.
+    assert float_to_units(0.29, 2, ROUND_FLOOR) == 28
+    assert float_to_units(1e20, 2) == 10**22
+    with pytest.raises(ValueError):
+        float_to_units(float("inf"), 2)
+    # Ties go to the even neighbour.
+    assert rescale_units(199450, 4, 2) == 1994
+    assert rescale_units(199550, 4, 2) == 1996
+    assert rescale_units(-199450, 4, 2) == -1994
+    assert rescale_units(199451, 4, 2) == 1995
+    assert rescale_units(199489, 4, 2, ROUND_FLOOR) == 1994
+    assert rescale_units(1, 0, 3) == 1000
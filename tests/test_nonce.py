@@ -0,0 +1,94 @@
+"""nonce.py tests module."""
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from krakendca import nonce
+from krakendca.nonce import NonceManager, nonce_manager
+
+
+def create_nonces(managers: list, count: int) -> list:
+    results = [[] for _ in managers]
+
+    def create(index: int) -> None:
+        for _ in range(count):
+            results[index].append(managers[index].next_nonce())
+
+    threads = [
+        threading.Thread(target=create, args=(index,))
+        for index in range(len(managers))
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_next_nonce() -> None:
+    manager = NonceManager()
+    with patch.object(NonceManager, "now", return_value=1631476207843):
+        assert manager.next_nonce() == 1631476207843
+        assert manager.next_nonce() == 1631476207844
+    assert manager.next_nonce() > 1631476207844
+
+
+def test_next_nonce_threads() -> None:
+    manager = NonceManager()
+    results = create_nonces([manager] * 8, 500)
+    nonces = [value for result in results for value in result]
+    assert len(set(nonces)) == 8 * 500
+    for result in results:
+        assert result == sorted(result)
+
+
+@pytest.mark.skipif(nonce.fcntl is None, reason="No file locks.")
+def test_next_nonce_file(tmp_path) -> None:
+    # Managers of different processes only share the nonce file.
+    nonce_file = str(tmp_path / "nonces" / "key.nonce")
+    managers = [NonceManager(nonce_file) for _ in range(4)]
+    results = create_nonces(managers, 200)
+    nonces = [value for result in results for value in result]
+    assert len(set(nonces)) == 4 * 200
+    with open(nonce_file) as stream:
+        assert int(stream.read()) == max(nonces)
+
+
+def test_rebuild() -> None:
+    manager = NonceManager()
+    manager.last_nonce = 10
+    manager.rebuild()
+    assert manager.last_nonce >= NonceManager.now() - 1000
+    # Next nonces start after a rejected nonce ahead of the clock.
+    rejected_nonce = NonceManager.now() + 60000
+    manager.rebuild(rejected_nonce)
+    assert manager.last_nonce == rejected_nonce
+    assert manager.next_nonce() == rejected_nonce + 1
+
+
+@pytest.mark.skipif(nonce.fcntl is None, reason="No file locks.")
+def test_rebuild_file(tmp_path) -> None:
+    nonce_file = tmp_path / "key.nonce"
+    manager = NonceManager(str(nonce_file))
+    other_manager = NonceManager(str(nonce_file))
+    manager.next_nonce()
+    # Another process used nonces ahead of the clock.
+    with patch.object(
+        NonceManager, "now", return_value=NonceManager.now() + 60000
+    ):
+        shared_nonce = other_manager.next_nonce()
+    manager.rebuild(manager.last_nonce)
+    assert manager.last_nonce == shared_nonce
+    assert int(nonce_file.read_text()) == shared_nonce
+    assert manager.next_nonce() == shared_nonce + 1
+
+
+def test_nonce_manager(tmp_path, monkeypatch) -> None:
+    monkeypatch.setenv("KRAKEN_DCA_NONCE_DIR", str(tmp_path))
+    monkeypatch.setattr(nonce, "_managers", {})
+    manager = nonce_manager("user-key")
+    assert nonce_manager("user-key") is manager
+    assert nonce_manager("other-key") is not manager
+    assert manager.nonce_file.parent == tmp_path
+    assert manager.nonce_file.suffix == ".nonce"
@@ -0,0 +1,111 @@
+"""ohlc.py tests module."""
+import json
+
+import pytest
+
+from krakendca.ohlc import BAR_SIZE, OHLCBar, OHLCStore
+
+KRAKEN_BARS = [
+    [1617721920, "2083.16", "2084.00", "2080.10", "2081.00", "2082.0",
+     "1.5", 12],
+    [1617721980, "2081.00", "2085.00", "2081.00", "2084.50", "2083.1",
+     "0.7", 5],
+    [1617722040, "2084.50", "2084.50", "2079.99", "2080.00", "2082.2",
+     "2.1", 20],
+]  # fmt: skip
+
+
+@pytest.fixture
+def store(tmp_path) -> OHLCStore:
+    return OHLCStore(tmp_path / "ohlc")
+
+
+def test_append_and_read(store: OHLCStore) -> None:
+    assert store.last_time("XETHZEUR") is None
+    assert store.append("XETHZEUR", KRAKEN_BARS) == 3
+    assert store.count("XETHZEUR") == 3
+    assert store.path("XETHZEUR").stat().st_size == 3 * BAR_SIZE
+    assert store.last_time("XETHZEUR") == 1617722040
+    with store.read("XETHZEUR") as bars:
+        assert len(bars) == 3
+        assert bars[0] == OHLCBar.from_kraken(KRAKEN_BARS[0])
+        assert bars[-1].close == 2080.0
+        assert [bar.count for bar in bars] == [12, 5, 20]
+        with pytest.raises(IndexError):
+            bars[3]
+
+
+def test_append_incremental(store: OHLCStore) -> None:
+    store.append("XETHZEUR", KRAKEN_BARS[:2])
+    # Overlapping fetch: old bar skipped, uncommitted last bar replaced.
+    updated_bar = list(KRAKEN_BARS[1])
+    updated_bar[4] = "2090.00"
+    assert store.append("XETHZEUR", [KRAKEN_BARS[0], updated_bar]) == 1
+    assert store.append("XETHZEUR", KRAKEN_BARS[2:] * 2) == 2
+    with store.read("XETHZEUR") as bars:
+        assert len(bars) == 3
+        assert bars[1].close == 2090.0
+
+
+def test_append_after_partial_write(store: OHLCStore) -> None:
+    store.append("XETHZEUR", KRAKEN_BARS[:2])
+    # Interrupted write of the third bar.
+    with open(store.path("XETHZEUR"), "ab") as bars_file:
+        bars_file.write(b"\x00" * (BAR_SIZE // 2))
+    assert store.count("XETHZEUR") == 2
+    assert store.last_time("XETHZEUR") == 1617721980
+    assert store.append("XETHZEUR", KRAKEN_BARS[2:]) == 1
+    assert store.path("XETHZEUR").stat().st_size == 3 * BAR_SIZE
+    with store.read("XETHZEUR") as bars:
+        assert [bar.time for bar in bars] == [
+            int(bar[0]) for bar in KRAKEN_BARS
+        ]
+
+
+def test_between(store: OHLCStore) -> None:
+    store.append("XETHZEUR", KRAKEN_BARS)
+    with store.read("XETHZEUR") as bars:
+        assert [b.time for b in bars.between(1617721980)] == [
+            1617721980,
+            1617722040,
+        ]
+        assert [b.time for b in bars.between(end=1617721980)] == [1617721920]
+        assert len(bars.between(1617721930, 1617722040)) == 1
+        assert len(bars.between(1617730000)) == 0
+        assert len(bars.between(1617722040, 1617721920)) == 0
+    with store.read("XXBTZEUR") as bars:
+        assert len(bars) == 0
+        assert len(bars.between(0, 1)) == 0
+        assert list(bars) == []
+
+
+def test_import_kraken_json(store: OHLCStore, tmp_path) -> None:
+    json_file = tmp_path / "ohlc.json"
+    json_file.write_text(
+        json.dumps(
+            {
+                "error": [],
+                "result": {"XETHZEUR": KRAKEN_BARS, "last": 1617722040},
+            }
+        )
+    )
+    assert store.import_kraken_json(json_file) == {"XETHZEUR": 3}
+    assert store.count("XETHZEUR") == 3
+
+
+def test_import_csv(store: OHLCStore, tmp_path) -> None:
+    csv_file = tmp_path / "ohlc.csv"
+    csv_file.write_text(
+        "count,time,open,high,low,close,vwap,volume\n"
+        "12,1617721920,2083.16,2084,2080.1,2081,2082,1.5\n"
+    )
+    assert store.import_csv(csv_file, "XETHZEUR") == 1
+    raw_csv_file = tmp_path / "raw.csv"
+    raw_csv_file.write_text(
+        "\n".join(",".join(map(str, bar)) for bar in KRAKEN_BARS[1:])
+    )
+    assert store.import_csv(raw_csv_file, "XETHZEUR") == 2
+    with store.read("XETHZEUR") as bars:
+        assert bars[0].count == 12
+        assert bars[0].open == 2083.16
+        assert len(bars) == 3
@@ -1,11 +1,12 @@
 """order.py tests module."""
 from datetime import datetime
+from decimal import Decimal
 
 import pytest
 import vcr
 from krakenapi import KrakenApi
 
-from krakendca.order import Order
+from krakendca.order import CSV_FIELDS, Order
 
 
 class TestOrder:
@@ -122,3 +123,61 @@ class TestOrder:
         order_fee = Order.estimate_order_fee(0.01105373, 1802.82, 2)
         assert type(order_fee) == float
         assert order_fee == 0.05
+
+    def test_to_item(self) -> None:
+        order = Order.buy_limit_order(
+            "user_X",
+            date=datetime.strptime("2021-04-15 21:33:28", "%Y-%m-%d %H:%M:%S"),
+            pair="XETHZEUR",
+            amount=20,
+            pair_price=2083.16,
+            lot_decimals=8,
+            quote_decimals=4,
+        )
+        order.txid = "OCYS4K-OILOE-36HPAE"
+        item = order.to_item()
+        assert item["date"] == "2021-04-15 21:33:28"
+        assert item["pair_price"] == Decimal("2083.16")
+        assert item["volume"] == Decimal("0.00957589")
+        assert item["price"] == Decimal("19.9481")
+        assert item["fee"] == Decimal("0.0519")
+        assert item["total_price"] == Decimal("20.0000")
+        assert item["txid"] == "OCYS4K-OILOE-36HPAE"
+        assert "description" not in item
+        assert "lot_decimals" not in item
+
+    def test_codecs_round_trip(self) -> None:
+        order = Order.buy_limit_order(
+            "user_X",
+            date=datetime(2021, 4, 15, 21, 33, 28),
+            pair="XETHZEUR",
+            amount=20,
+            pair_price=2083.16,
+            lot_decimals=8,
+            quote_decimals=4,
+            limit_factor=0.985,
+        )
+        order.txid = "OCYS4K-OILOE-36HPAE"
+        order.description = "buy 0.00957589 ETHEUR @ limit 2083.16"
+        item = order.to_item()
+        assert item["limit_factor"] == Decimal("0.985")
+        assert Order.from_item(item).to_item() == item
+        # Fill status attributes of the item are ignored.
+        assert Order.from_item(dict(item, status="closed")).to_item() == item
+        row = order.to_row()
+        assert row["volume"] == "0.00957589"
+        assert row["total_price"] == "20.0000"
+        assert list(row) == list(CSV_FIELDS)
+        assert Order.from_row(row).to_row() == row
+        assert Order.from_dict(order.to_dict()).to_dict() == order.to_dict()
+        # Orders not sent have no TXID.
+        self.order.limit_factor = None
+        row = self.order.to_row()
+        assert row["txid"] == row["limit_factor"] == ""
+        assert not hasattr(Order.from_row(row), "txid")
+        assert "txid" not in Order.from_item(self.order.to_item()).to_dict()
+
+    def test_slots(self) -> None:
+        assert not hasattr(self.order, "__dict__")
+        with pytest.raises(AttributeError):
+            self.order.unknown = 1
@@ -1,4 +1,6 @@
 """pair.py tests module."""
+import json
+
 import pytest
 import vcr
 from krakenapi import KrakenApi
@@ -145,3 +147,11 @@ class TestPair:
                 Pair.get_pair_ask_price(self.ka, "XETHZEUR")
         error_message = "Kraken API error -> EQuery:Unknown asset pair"
         assert error_message in str(e_info.value)
+
+    def test_to_dict(self) -> None:
+        pair = Pair(
+            "XETHZEUR", "XETHEUR", "XETH", "ZEUR", 2, 8, 4, 0.005, "ETH/EUR"
+        )
+        assert Pair.from_dict(pair.to_dict()).to_dict() == pair.to_dict()
+        assert json.loads(json.dumps(pair.to_dict()))["ws_name"] == "ETH/EUR"
+        assert not hasattr(pair, "__dict__")
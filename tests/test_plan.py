@@ -0,0 +1,315 @@
+"""plan.py tests module."""
+from datetime import datetime
+from decimal import Decimal
+from unittest.mock import patch
+
+import boto3
+import pytest
+from krakenapi import KrakenApi
+from moto import mock_dynamodb
+
+from krakendca import plan
+from krakendca.api import KrakenClient
+from krakendca.dca import DCA
+from krakendca.plan import (
+    DCAPlan,
+    MarketSnapshot,
+    PlannedOrder,
+    execute_plan,
+    plan_dcas,
+)
+from krakendca.pair import Pair
+from krakendca.utils import datetime_as_utc_unix
+from tests.fake_kraken import (
+    FakeKraken,
+    FakeKrakenServer,
+    fake_pair_names,
+    patch_kraken_url,
+    patch_urlopen,
+    uniform_latency,
+)
+from tests.test_dca import create_dynamodb_table
+
+PRIVATE_KEY = "a3Jha2VuLWRjYS10ZXN0"
+
+
+def create_dcas(ka: KrakenApi) -> list:
+    eth = Pair("XETHZEUR", "XETHEUR", "XETH", "ZEUR", 2, 8, 4, 0.005)
+    btc = Pair("XXBTZEUR", "XXBTEUR", "XXBT", "ZEUR", 1, 8, 4, 0.0001)
+    dot = Pair("DOTZEUR", "DOTEUR", "DOT", "ZEUR", 4, 8, 4, 0.1)
+    return [
+        DCA(ka, 1, eth, 20, "user_X"),
+        DCA(ka, 3, btc, 20, "user_X", max_price=30000),
+        DCA(ka, 1, dot, 30, "user_X"),
+    ]
+
+
+def closed_order(pair: str, opentm: float) -> dict:
+    return {"opentm": opentm, "descr": {"pair": pair}}
+
+
+def test_plan_dcas() -> None:
+    dcas = create_dcas(KrakenApi())
+    date = datetime(2021, 9, 12, 19, 50, 8)
+    yesterday = datetime_as_utc_unix(datetime(2021, 9, 11))
+    snapshot = MarketSnapshot(
+        date,
+        {"ZEUR": "45.0"},
+        {},
+        {"O1": closed_order("XETHEUR", yesterday)},
+        {"XETHZEUR": 2882.44, "XXBTZEUR": 38857.2, "DOTZEUR": 30.1},
+    )
+    plan = plan_dcas("user_X", dcas, snapshot)
+    eth, btc, dot = plan.items
+    # Yesterday order is outside of the 1 day delay window.
+    assert eth.order.volume == 0.00692056
+    assert eth.order.date == date
+    assert btc.skip_reason == (
+        "No DCA for XXBTZEUR: Limit price (38857.2) greater "
+        "than maximum price (30000.0)."
+    )
+    # The ETH order total price is deducted from the 45 ZEUR balance.
+    assert dot.error == "Insufficient funds to buy 30.0 ZEUR of DOT"
+    assert plan.orders == [eth.order]
+
+
+def test_plan_already_ordered() -> None:
+    dcas = create_dcas(KrakenApi())[:2]
+    two_days_ago = datetime_as_utc_unix(datetime(2021, 9, 10, 12))
+    snapshot = MarketSnapshot(
+        datetime(2021, 9, 12, 19, 50, 8),
+        {"ZEUR": "100.0"},
+        {"O2": closed_order("XETHEUR", two_days_ago)},
+        {"O1": closed_order("XXBTEUR", two_days_ago)},
+        {"XETHZEUR": 2882.44, "XXBTZEUR": 28857.2},
+    )
+    eth, btc = plan_dcas("user_X", dcas, snapshot).items
+    for item in (eth, btc):
+        assert item.skip_reason == (
+            f"No DCA for {item.pair}: Already placed an order today."
+        )
+
+
+def test_plan_json() -> None:
+    dcas = create_dcas(KrakenApi())
+    snapshot = MarketSnapshot(
+        datetime(2021, 9, 12, 19, 50, 8),
+        {"ZEUR": "40.0"},
+        {},
+        {},
+        {"XETHZEUR": 2882.44, "XXBTZEUR": 38857.2, "DOTZEUR": 30.1},
+    )
+    plan = plan_dcas("user_X", dcas, snapshot)
+    plan.orders[0].txid = "OUHXFN-RTP6W-ART4VP"
+    plan.orders[0].description = "buy 0.00692056 ETHEUR @ limit 2882.44"
+    loaded = DCAPlan.from_json(plan.to_json())
+    assert loaded.user_name == "user_X"
+    assert loaded.date == plan.date
+    assert [item.to_dict() for item in loaded.items] == [
+        item.to_dict() for item in plan.items
+    ]
+    assert loaded.orders[0].to_item() == (plan.orders[0].to_item())
+
+
+def test_snapshot_fetch() -> None:
+    exchange = FakeKraken({"XETHZEUR": 2882.44, "XXBTZEUR": 38857.2})
+    ka = KrakenApi("user-key", PRIVATE_KEY)
+    dcas = create_dcas(ka)[:2]
+    with patch_urlopen(exchange):
+        for _ in range(120):
+            ka.create_order("XETHZEUR", "buy", "limit", 2882.44, 0.001, "")
+        snapshot = MarketSnapshot.fetch(ka, dcas)
+    assert len(snapshot.closed_orders) == 120
+    assert snapshot.ask_prices == {"XETHZEUR": 2882.44, "XXBTZEUR": 38857.2}
+    assert float(snapshot.balance["XETH"]) == pytest.approx(0.12)
+    assert exchange.calls["ClosedOrders"] == 3
+    assert exchange.calls["Ticker"] == 1
+
+
+def test_execute_plan() -> None:
+    exchange = FakeKraken({"XETHZEUR": 2882.44, "XXBTZEUR": 38857.2})
+    ka = KrakenApi("user-key", PRIVATE_KEY)
+    eth, btc, dot = create_dcas(ka)
+    btc.max_price = -1
+    with patch_urlopen(exchange), mock_dynamodb():
+        create_dynamodb_table()
+        snapshot = MarketSnapshot.fetch(ka, [eth, btc])
+        plan = plan_dcas("user_X", [eth, btc], snapshot)
+        plan.items.append(PlannedOrder("DOTZEUR", error="Planned error"))
+        with pytest.raises(ValueError) as e_info:
+            execute_plan(plan, [eth, btc, dot])
+        assert str(e_info.value) == "Planned error"
+        table = boto3.resource("dynamodb", region_name="us-east-1").Table(
+            "kraken-dca"
+        )
+        items = table.scan()["Items"]
+    assert exchange.calls["AddOrder"] == 2
+    assert sorted(item["txid"] for item in items) == sorted(
+        order.txid for order in plan.orders
+    )
+    # The next snapshot sees the orders of the day.
+    with patch_urlopen(exchange):
+        snapshot = MarketSnapshot.fetch(ka, [eth, btc])
+    plan = plan_dcas("user_X", [eth, btc], snapshot)
+    assert plan.orders == []
+
+
+def fake_dcas(ka: KrakenApi, names: list) -> list:
+    return [
+        DCA(
+            ka,
+            1,
+            Pair(name, name[:4] + "EUR", name[:4], "ZEUR", 2, 8, 4, 0),
+            20,
+            "user_X",
+        )
+        for name in names
+    ]
+
+
+def test_execute_plan_concurrent(capfd) -> None:
+    names = fake_pair_names(12)
+    exchange = FakeKraken(
+        {name: 100 + index for index, name in enumerate(names)},
+        check_nonces=True,
+        nonce_window=1000,
+    )
+    latency = {"AddOrder": uniform_latency(0.001, 0.03, seed=1)}
+    ka = KrakenClient("concurrent-key", PRIVATE_KEY)
+    dcas = fake_dcas(ka, names)
+    in_flight = []
+    submit_order = plan.submit_order
+
+    def counted_submit_order(dca: DCA, order) -> None:
+        in_flight.append(1)
+        try:
+            assert len(in_flight) <= 4
+            submit_order(dca, order)
+        finally:
+            in_flight.pop()
+
+    with FakeKrakenServer(exchange, latency) as server, patch_kraken_url(
+        server.url
+    ), mock_dynamodb(), patch.object(
+        plan, "submit_order", counted_submit_order
+    ):
+        create_dynamodb_table()
+        snapshot = MarketSnapshot.fetch(ka, dcas)
+        dca_plan = plan_dcas("user_X", dcas, snapshot)
+        capfd.readouterr()
+        execute_plan(dca_plan, dcas, max_concurrent_orders=4)
+        table = boto3.resource("dynamodb", region_name="us-east-1").Table(
+            "kraken-dca"
+        )
+        items = {item["txid"]: item for item in table.scan()["Items"]}
+    orders = dca_plan.orders
+    assert len({order.txid for order in orders}) == len(names)
+    for order in orders:
+        # Each order holds the answer of its own AddOrder call.
+        assert order.description == (
+            f"buy {order.volume} {order.pair[:4]}EUR "
+            f"@ limit {order.pair_price}"
+        )
+        assert items[order.txid]["pair"] == order.pair
+        assert exchange.open_orders["concurrent-key"].get(
+            order.txid
+        ) or exchange.closed_orders["concurrent-key"].get(order.txid)
+    txids = [
+        line.split()[1]
+        for line in capfd.readouterr().out.splitlines()
+        if line.startswith("TXID:")
+    ]
+    assert txids == [order.txid for order in orders]
+
+
+def test_execute_plan_submission_error() -> None:
+    names = fake_pair_names(3)
+    exchange = FakeKraken({name: 100 for name in names})
+    ka = KrakenClient("error-key", PRIVATE_KEY)
+    dcas = fake_dcas(ka, names)
+    with FakeKrakenServer(exchange) as server, patch_kraken_url(
+        server.url
+    ), mock_dynamodb():
+        create_dynamodb_table()
+        snapshot = MarketSnapshot.fetch(ka, dcas)
+        dca_plan = plan_dcas("user_X", dcas, snapshot)
+        server.inject_error("AddOrder", "EOrder:Insufficient funds")
+        with pytest.raises(ValueError) as e_info:
+            execute_plan(dca_plan, dcas, max_concurrent_orders=1)
+        table = boto3.resource("dynamodb", region_name="us-east-1").Table(
+            "kraken-dca"
+        )
+        items = table.scan()["Items"]
+    assert "EOrder:Insufficient funds" in str(e_info.value)
+    # Orders after the failed one are not sent.
+    assert exchange.order_count == 0
+    assert items == []
+
+
+def test_execute_plan_ladder() -> None:
+    name = fake_pair_names(1)[0]
+    exchange = FakeKraken({name: 100})
+    ka = KrakenClient("ladder-key", PRIVATE_KEY)
+    pair = Pair(name, name[:4] + "EUR", name[:4], "ZEUR", 2, 8, 4, 0)
+    dca = DCA(ka, 1, pair, 30, "user_X", ladder=[0, 0.01, 0.025])
+    with FakeKrakenServer(exchange) as server, patch_kraken_url(
+        server.url
+    ), mock_dynamodb():
+        create_dynamodb_table()
+        snapshot = MarketSnapshot.fetch(ka, [dca])
+        dca_plan = plan_dcas("user_X", [dca], snapshot)
+        loaded = DCAPlan.from_json(dca_plan.to_json())
+        assert [order.to_dict() for order in loaded.orders] == [
+            order.to_dict() for order in dca_plan.orders
+        ]
+        execute_plan(dca_plan, [dca])
+        table = boto3.resource("dynamodb", region_name="us-east-1").Table(
+            "kraken-dca"
+        )
+        items = {item["txid"]: item for item in table.scan()["Items"]}
+    # One AddOrderBatch call, one item per rung.
+    assert exchange.calls["AddOrderBatch"] == 1
+    assert exchange.calls["AddOrder"] == 0
+    rungs = dca_plan.items[0].ladder
+    assert [rung.pair_price for rung in rungs] == [100, 99, 97.5]
+    assert [rung.limit_factor for rung in rungs] == [1, 0.99, 0.975]
+    assert [rung.volume for rung in rungs] == [
+        0.09974067,
+        0.10074815,
+        0.10229812,
+    ]
+    assert sum(rung.total_price for rung in rungs) <= 30
+    assert sorted(items) == sorted(rung.txid for rung in rungs)
+    assert [items[rung.txid]["limit_factor"] for rung in rungs] == [
+        Decimal("1"),
+        Decimal("0.99"),
+        Decimal("0.975"),
+    ]
+    # The rung at the ask price is filled, the others stay open.
+    assert len(exchange.closed_orders["ladder-key"]) == 1
+    assert len(exchange.open_orders["ladder-key"]) == 2
+
+
+def test_execute_plan_ladder_rejected_rung() -> None:
+    name = fake_pair_names(1)[0]
+    exchange = FakeKraken({name: 100})
+    ka = KrakenClient("ladder-key", PRIVATE_KEY)
+    pair = Pair(name, name[:4] + "EUR", name[:4], "ZEUR", 2, 8, 4, 0)
+    dca = DCA(ka, 1, pair, 20, "user_X", ladder=[0, 0.01])
+    with patch_urlopen(exchange), mock_dynamodb():
+        create_dynamodb_table()
+        snapshot = MarketSnapshot.fetch(ka, [dca])
+        dca_plan = plan_dcas("user_X", [dca], snapshot)
+        # Funds left for the first rung only.
+        exchange.balances["ladder-key"]["ZEUR"] = 15
+        with pytest.raises(ValueError) as e_info:
+            execute_plan(dca_plan, [dca])
+        table = boto3.resource("dynamodb", region_name="us-east-1").Table(
+            "kraken-dca"
+        )
+        items = table.scan()["Items"]
+    assert "Insufficient funds" in str(e_info.value)
+    # The accepted rung is saved.
+    first, second = dca_plan.items[0].ladder
+    assert [item["txid"] for item in items] == [first.txid]
+    assert not hasattr(second, "txid")
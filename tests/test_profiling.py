@@ -0,0 +1,101 @@
+"""profiling.py tests module."""
+import pstats
+
+import boto3
+import pytest
+from moto import mock_s3
+
+from krakendca import profiling
+from krakendca.profiling import profiled, profiling_enabled
+
+
+@pytest.fixture(autouse=True)
+def profile_environment(monkeypatch):
+    monkeypatch.setenv("KRAKEN_DCA_PROFILE", "1")
+    monkeypatch.delenv("KRAKEN_DCA_PROFILE_EVERY", raising=False)
+    monkeypatch.delenv("KRAKEN_DCA_PROFILE_TOP", raising=False)
+    profiling._invocations.clear()
+
+
+def allocate() -> list:
+    return [str(number) for number in range(10000)]
+
+
+def test_profiling_enabled(monkeypatch) -> None:
+    assert profiling_enabled("main")
+    monkeypatch.setenv("KRAKEN_DCA_PROFILE_EVERY", "3")
+    assert [profiling_enabled("sampled") for _ in range(6)] == [
+        True,
+        False,
+        False,
+        True,
+        False,
+        False,
+    ]
+    monkeypatch.setenv("KRAKEN_DCA_PROFILE", "0")
+    assert not profiling_enabled("main")
+
+
+def test_malformed_environment(monkeypatch, tmp_path, capfd) -> None:
+    monkeypatch.setenv("KRAKEN_DCA_PROFILE_EVERY", "every other")
+    monkeypatch.setenv("KRAKEN_DCA_PROFILE_TOP", "-3")
+    assert [profiling_enabled("main") for _ in range(2)] == [True, True]
+    with profiled("handler_main", output=str(tmp_path)):
+        allocate()
+    report = next(tmp_path.glob("*-report.txt")).read_text()
+    assert "Top 25 allocation sites:" in report
+    out = capfd.readouterr().out
+    assert "Ignoring KRAKEN_DCA_PROFILE_EVERY='every other'" in out
+    assert "Ignoring KRAKEN_DCA_PROFILE_TOP='-3'" in out
+
+
+def test_profiled_local(tmp_path, capfd) -> None:
+    with profiled("handler_main", output=str(tmp_path)):
+        allocate()
+    files = sorted(path.name for path in tmp_path.iterdir())[::-1]
+    assert len(files) == 2
+    assert files[0].startswith("handler_main-")
+    assert files[0].endswith(".pstats")
+    assert files[1].endswith("-report.txt")
+    stats = pstats.Stats(str(tmp_path / files[0]))
+    assert any(function[2] == "allocate" for function in stats.stats)
+    report = (tmp_path / files[1]).read_text()
+    assert "cumulative" in report
+    assert "Top 25 allocation sites:" in report
+    assert "test_profiling.py" in report
+    assert f"Profile of handler_main saved to {tmp_path}." in (
+        capfd.readouterr().out
+    )
+
+
+def test_profiled_disabled(monkeypatch, tmp_path) -> None:
+    monkeypatch.delenv("KRAKEN_DCA_PROFILE")
+    with profiled("handler_main", output=str(tmp_path)):
+        allocate()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_profiled_s3(monkeypatch) -> None:
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    with mock_s3():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket="profiles")
+        with profiled("handler_main", output="s3://profiles/kraken-dca/"):
+            allocate()
+        keys = [
+            item["Key"]
+            for item in client.list_objects_v2(Bucket="profiles")["Contents"]
+        ]
+    assert len(keys) == 2
+    assert all(key.startswith("kraken-dca/handler_main-") for key in keys)
+
+
+def test_profiled_output_error(capfd) -> None:
+    with mock_s3():
+        with profiled("handler_main", output="s3://missing-bucket"):
+            allocate()
+    assert "Profiling output of handler_main not saved" in (
+        capfd.readouterr().out
+    )
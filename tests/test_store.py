@@ -0,0 +1,177 @@
+"""store.py tests module."""
+import time
+from datetime import datetime, timedelta
+
+import pytest
+import yaml
+from moto import mock_dynamodb
+
+from krakendca.api import KrakenClient
+from krakendca.config import Config
+from krakendca.krakendca import KrakenDCA
+
+from krakendca.order import Order
+from krakendca.store import (
+    CSVOrderStore,
+    DynamoOrderStore,
+    NDJSONOrderStore,
+    OrderStore,
+    SQLiteOrderStore,
+)
+from tests.fake_kraken import FakeKraken, fake_pair_names, patch_urlopen
+from tests.test_dca import create_dynamodb_table
+
+PRIVATE_KEY = "a3Jha2VuLWRjYS10ZXN0"
+
+
+def create_orders(n_orders: int = 12):
+    start = datetime(2021, 4, 15, 21, 0)
+    orders = []
+    for index in range(n_orders):
+        order = Order.buy_limit_order(
+            "user_X" if index % 3 else "user_Y",
+            start + timedelta(days=index),
+            "XETHZEUR" if index % 2 else "XXBTZEUR",
+            20,
+            2083.16 + index,
+            8,
+            4,
+            0.985,
+        )
+        order.txid = f"O{index:05d}-TEST-000000"
+        order.description = f"buy {order.volume} @ limit {order.pair_price}"
+        orders.append(order)
+    return orders
+
+
+@pytest.fixture(params=["dynamodb", "sqlite", "csv", "ndjson"])
+def store(request, tmp_path):
+    if request.param != "dynamodb":
+        path = str(tmp_path / "orders" / f"orders.{request.param}")
+        options = {"backend": request.param, "path": path, "batch_size": 5}
+        yield OrderStore.from_config(options)
+        return
+    with mock_dynamodb():
+        create_dynamodb_table()
+        yield OrderStore.from_config({"batch_size": 5})
+
+
+def test_from_config(tmp_path) -> None:
+    store = OrderStore.from_config(None)
+    assert isinstance(store, DynamoOrderStore)
+    assert (store.table_name, store.region) == ("kraken-dca", "us-east-1")
+    assert str(store) == "Dynamo DB"
+    store = OrderStore.from_config(
+        {"table": "orders", "region": "eu-west-1", "batch_size": 10}
+    )
+    assert (store.table_name, store.region) == ("orders", "eu-west-1")
+    assert store.batch_size == 10
+    for backend, store_class in (
+        ("sqlite", SQLiteOrderStore),
+        ("csv", CSVOrderStore),
+        ("ndjson", NDJSONOrderStore),
+    ):
+        store = OrderStore.from_config({"backend": backend, "path": "o"})
+        assert isinstance(store, store_class)
+    with pytest.raises(ValueError) as e_info:
+        OrderStore.from_config({"backend": "mysql"})
+    assert "order_store backend must be one of" in str(e_info.value)
+
+
+def test_save_and_read_orders(store) -> None:
+    orders = create_orders()
+    assert list(store.read_orders()) == []
+    store.save_orders(orders[:1])
+    store.save_orders(orders[1:])
+    read = sorted(store.read_orders(), key=lambda order: order.txid)
+    assert [order.to_item() for order in read] == [
+        order.to_item() for order in orders
+    ]
+    read = store.read_orders(
+        user="user_X",
+        pair="XETHZEUR",
+        start=datetime(2021, 4, 17),
+        end=datetime(2021, 4, 25, 21, 0),
+    )
+    assert sorted(order.txid for order in read) == [
+        "O00005-TEST-000000",
+        "O00007-TEST-000000",
+    ]
+    assert list(store.read_orders(pair="XXRPZEUR")) == []
+
+
+def test_add_and_flush(store) -> None:
+    orders = create_orders()
+    assert store.add(orders[:4]) is None
+    # The fifth order fills a batch, written in the background.
+    flush = store.add(orders[4:5])
+    flush.result()
+    assert len(list(store.read_orders())) == 5
+    assert store.add(orders[5:7]) is None
+    store.close()
+    assert store.pending == []
+    assert len(list(store.read_orders())) == 7
+
+
+def test_append_only_files(tmp_path) -> None:
+    orders = create_orders(3)
+    path = tmp_path / "orders.csv"
+    CSVOrderStore(str(path)).save_orders(orders[:2])
+    CSVOrderStore(str(path)).save_orders(orders[2:])
+    lines = path.read_text().splitlines()
+    # One header, then one line per order.
+    assert len(lines) == 4
+    assert lines[0].startswith("user_name,date,pair,")
+    path = tmp_path / "orders.ndjson"
+    NDJSONOrderStore(str(path)).save_orders(orders)
+    assert len(path.read_text().splitlines()) == 3
+
+
+def test_sqlite_replaces_orders(tmp_path) -> None:
+    store = SQLiteOrderStore(str(tmp_path / "orders.sqlite"))
+    orders = create_orders(2)
+    store.save_orders(orders)
+    orders[0].description = "buy updated"
+    store.save_orders(orders[:1])
+    read = list(store.read_orders())
+    assert [order.txid for order in read] == [order.txid for order in orders]
+    assert read[0].description == "buy updated"
+    assert str(store) == f"SQLite {tmp_path / 'orders.sqlite'}"
+
+
+def test_kraken_dca_order_store(tmp_path, capfd) -> None:
+    # Orders are saved without AWS with a local order store.
+    exchange = FakeKraken(
+        {pair: 100.0 for pair in fake_pair_names(2)},
+        time_function=lambda: time.time(),
+    )
+    path = tmp_path / "orders.sqlite"
+    config_file = tmp_path / "config.yaml"
+    config_file.write_text(
+        yaml.safe_dump(
+            {
+                "api": {
+                    "user_name": "user_X",
+                    "public_key": "store-key",
+                    "private_key": PRIVATE_KEY,
+                },
+                "order_store": {"backend": "sqlite", "path": str(path)},
+                "dca_pairs": [
+                    {"pair": pair, "delay": 1, "amount": 20}
+                    for pair in fake_pair_names(2)
+                ],
+            }
+        )
+    )
+    with patch_urlopen(exchange):
+        ka = KrakenClient("store-key", PRIVATE_KEY)
+        kdca = KrakenDCA(Config(config_file), ka)
+        kdca.initialize_pairs_dca()
+        plan = kdca.handle_pairs_dca()
+    store = SQLiteOrderStore(str(path))
+    assert sorted(order.txid for order in store.read_orders()) == sorted(
+        order.txid for order in plan.orders
+    )
+    assert f"Order information saved to SQLite {path}." in (
+        capfd.readouterr().out
+    )
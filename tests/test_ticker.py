@@ -0,0 +1,172 @@
+"""ticker.py tests module."""
+import json
+from unittest.mock import patch
+
+import pytest
+from krakenapi import KrakenApi
+
+from krakendca import ticker
+from krakendca.pair import Pair
+from krakendca.plan import MarketSnapshot
+from krakendca.ticker import TickerFeed
+from tests.fake_kraken import (
+    FakeKraken,
+    FakeKrakenWebSocket,
+    fake_pair_names,
+    patch_urlopen,
+)
+
+pytest.importorskip("websocket")
+
+
+def create_pairs(exchange: FakeKraken) -> list:
+    return [
+        Pair.get_pair_from_kraken(KrakenApi(), exchange.asset_pairs, name)
+        for name in exchange.prices
+    ]
+
+
+@pytest.fixture
+def exchange():
+    exchange = FakeKraken(
+        {name: 100.0 + index for index, name in enumerate(fake_pair_names(3))}
+    )
+    with patch_urlopen(exchange):
+        yield exchange
+
+
+@pytest.fixture
+def feed(exchange):
+    with FakeKrakenWebSocket(exchange) as server:
+        feed = TickerFeed(server.url)
+        feed.server = server
+        feed.start()
+        yield feed
+        feed.stop()
+
+
+def test_subscribe(exchange, feed) -> None:
+    pairs = create_pairs(exchange)
+    feed.subscribe((pair.name, pair.ws_name) for pair in pairs)
+    names = [pair.name for pair in pairs]
+    assert feed.wait_for_prices(names, timeout=5)
+    assert feed.server.subscriptions == [[pair.ws_name for pair in pairs]]
+    assert [feed.ask_price(name) for name in names] == [100.0, 101.0, 102.0]
+    assert feed.quotes[names[0]].bid == pytest.approx(99.9)
+    # Price updates are pushed.
+    exchange.prices[names[0]] = 90.0
+    feed.server.publish(names[0])
+    for _ in range(500):
+        if feed.ask_price(names[0]) == 90.0:
+            break
+        feed.stopped.wait(0.01)
+    assert feed.ask_price(names[0]) == 90.0
+    # Subscriptions aren't sent twice.
+    feed.subscribe((pair.name, pair.ws_name) for pair in pairs)
+    assert len(feed.server.subscriptions) == 1
+
+
+def test_freshness(exchange, feed) -> None:
+    name = fake_pair_names(1)[0]
+    feed.subscribe([(name, exchange.asset_pairs[name]["wsname"])])
+    assert feed.wait_for_prices([name], timeout=5)
+    feed.max_age = 0.5
+    feed.quotes[name].received -= 1
+    assert feed.ask_price(name) is None
+    assert not feed.wait_for_prices([name], timeout=0)
+
+
+def test_reconnect(exchange, feed, capfd) -> None:
+    name = fake_pair_names(1)[0]
+    with patch.object(ticker, "RECONNECT_WAIT", 0.01):
+        feed.subscribe([(name, exchange.asset_pairs[name]["wsname"])])
+        assert feed.wait_for_prices([name], timeout=5)
+        feed.quotes.clear()
+        feed.server.disconnect()
+        # Pairs are subscribed again on the new connection.
+        assert feed.wait_for_prices([name], timeout=5)
+    assert len(feed.server.subscriptions) == 2
+    assert "Ticker feed error" in capfd.readouterr().out
+
+
+def test_handle_message(capfd) -> None:
+    feed = TickerFeed()
+    feed.ws_names = {"XXBTZEUR": "XBT/EUR"}
+    feed.handle_message(json.dumps({"event": "heartbeat"}))
+    feed.handle_message(
+        json.dumps(
+            [
+                42,
+                {"a": ["38857.2", 1, "1.0"], "b": ["38850.1", 2, "2.0"]},
+                "ticker",
+                "XBT/EUR",
+            ]
+        )
+    )
+    feed.handle_message(
+        json.dumps(
+            {
+                "event": "subscriptionStatus",
+                "status": "error",
+                "errorMessage": "Currency pair not supported XBT/ABC",
+            }
+        )
+    )
+    assert feed.ask_price("XXBTZEUR") == 38857.2
+    assert feed.quotes["XXBTZEUR"].bid == 38850.1
+    captured = capfd.readouterr()
+    assert captured.out == (
+        "Ticker feed error: Currency pair not supported XBT/ABC.\n"
+    )
+
+
+def test_fetch_ask_prices(exchange, feed) -> None:
+    pairs = create_pairs(exchange)
+    feed.subscribe((pair.name, pair.ws_name) for pair in pairs[:2])
+    assert feed.wait_for_prices([pair.name for pair in pairs[:2]], 5)
+    ka = KrakenApi()
+    ask_prices = MarketSnapshot.fetch_ask_prices(ka, pairs, feed)
+    assert ask_prices == {
+        pair.name: exchange.prices[pair.name] for pair in pairs
+    }
+    # Only the pair without fresh price is requested from REST.
+    assert exchange.calls["Ticker"] == 1
+    feed.subscribe([(pairs[2].name, pairs[2].ws_name)])
+    assert feed.wait_for_prices([pairs[2].name], 5)
+    MarketSnapshot.fetch_ask_prices(ka, pairs, feed)
+    assert exchange.calls["Ticker"] == 1
+
+
+def test_fetch_ask_prices_message(exchange) -> None:
+    pair = create_pairs(exchange)[0]
+    feed = TickerFeed()
+    ka = KrakenApi()
+    assert MarketSnapshot.fetch_ask_prices(ka, [pair], feed) == {
+        pair.name: 100.0
+    }
+    assert exchange.calls["Ticker"] == 1
+    feed.ws_names[pair.name] = pair.ws_name
+    feed.handle_message(
+        json.dumps(
+            [
+                0,
+                {"a": ["99.5", 1, "1"], "b": ["99", 1, "1"]},
+                "ticker",
+                "A000/EUR",
+            ]
+        )
+    )
+    assert MarketSnapshot.fetch_ask_prices(ka, [pair], feed) == {
+        pair.name: 99.5
+    }
+    assert exchange.calls["Ticker"] == 1
+
+
+def test_from_environment(monkeypatch) -> None:
+    monkeypatch.delenv(ticker.TICKER_FEED_ENV, raising=False)
+    assert TickerFeed.from_environment() is None
+    monkeypatch.setenv(ticker.TICKER_FEED_ENV, "ws://127.0.0.1:1")
+    with patch.object(TickerFeed, "start") as start:
+        feed = TickerFeed.from_environment()
+    assert feed.url == "ws://127.0.0.1:1"
+    start.assert_called_once()
@@ -0,0 +1,130 @@
+"""tracing.py tests module."""
+import json
+
+import pytest
+import sentry_sdk
+from krakenapi import KrakenApi
+from moto import mock_dynamodb
+
+from krakendca import tracing
+from krakendca.config import Config
+from krakendca.krakendca import KrakenDCA
+from krakendca.metrics import metric_labels
+from tests.fake_kraken import FakeKraken, patch_urlopen
+from tests.test_dca import create_dynamodb_table
+
+
+@pytest.fixture
+def local_backend(tmp_path):
+    backend = tracing.configure_tracing("local")
+    backend.trace_file = str(tmp_path / "trace.jsonl")
+    yield backend
+    tracing.configure_tracing("off")
+
+
+def test_configure_tracing(monkeypatch) -> None:
+    monkeypatch.setenv("KRAKEN_DCA_TRACING", "local")
+    assert isinstance(tracing.configure_tracing(), tracing.LocalBackend)
+    monkeypatch.delenv("KRAKEN_DCA_TRACING")
+    assert isinstance(tracing.configure_tracing(), tracing.NoopBackend)
+    with pytest.raises(ValueError) as e_info:
+        tracing.configure_tracing("jaeger")
+    assert "Unknown tracing backend jaeger" in str(e_info.value)
+
+
+def test_local_backend(local_backend: tracing.LocalBackend) -> None:
+    with metric_labels(account="user_X"):
+        with tracing.span("dca.run"):
+            with tracing.span("dca.ticker", "XETHZEUR", pair="XETHZEUR"):
+                pass
+            with pytest.raises(ValueError):
+                with tracing.span("dca.order_submit"):
+                    raise ValueError("Too low volume")
+    tracing.flush()
+    with open(local_backend.trace_file) as stream:
+        spans = [json.loads(line) for line in stream]
+    assert [s["op"] for s in spans] == [
+        "dca.run",
+        "dca.ticker",
+        "dca.order_submit",
+    ]
+    root, ticker, submit = spans
+    assert root["parent_id"] is None
+    assert ticker["parent_id"] == submit["parent_id"] == root["span_id"]
+    assert ticker["tags"] == {"account": "user_X", "pair": "XETHZEUR"}
+    assert ticker["description"] == "XETHZEUR"
+    assert submit["error"] == "ValueError: Too low volume"
+    assert root["duration_s"] >= ticker["duration_s"]
+    # Spans are only written once.
+    tracing.flush()
+    with open(local_backend.trace_file) as stream:
+        assert len(stream.readlines()) == 3
+
+
+def test_dca_phases(local_backend: tracing.LocalBackend) -> None:
+    exchange = FakeKraken({"XETHZEUR": 2083.16, "XXBTZEUR": 38857.2})
+    ka = KrakenApi("user-key", "a3Jha2VuLWRjYS10ZXN0")
+    with patch_urlopen(exchange), mock_dynamodb():
+        create_dynamodb_table()
+        kdca = KrakenDCA(Config("tests/fixtures/config.yaml"), ka)
+        kdca.initialize_pairs_dca()
+        kdca.handle_pairs_dca()
+    spans = {s["op"]: s for s in local_backend.spans}
+    assert sorted(s["op"] for s in local_backend.spans) == [
+        "dca.execute",
+        "dca.order_submit",
+        "dca.order_submit",
+        "dca.persistence",
+        "dca.persistence",
+        "dca.plan",
+        "dca.snapshot",
+        "metadata.asset_pairs",
+        "metadata.pair",
+        "metadata.pair",
+    ]
+    # Orders are submitted and saved within the execution phase.
+    assert {
+        s["parent_id"]
+        for s in local_backend.spans
+        if s["op"] in ("dca.order_submit", "dca.persistence")
+    } == {spans["dca.execute"]["span_id"]}
+
+
+def test_sentry_backend() -> None:
+    envelopes = []
+
+    class Transport(sentry_sdk.transport.Transport):
+        def capture_event(self, event):
+            pass
+
+        def capture_envelope(self, envelope):
+            envelopes.append(envelope)
+
+    sentry_sdk.init(
+        dsn="https://key@o1.ingest.sentry.io/1",
+        traces_sample_rate=1.0,
+        transport=Transport,
+    )
+    try:
+        assert isinstance(tracing.configure_tracing(), tracing.SentryBackend)
+        with tracing.span("dca.run"):
+            with tracing.span("dca.ticker", pair="XETHZEUR"):
+                pass
+        sentry_sdk.flush()
+    finally:
+        sentry_sdk.init()
+        tracing.configure_tracing("off")
+    transaction = envelopes[0].get_transaction_event()
+    assert transaction["transaction"] == "dca.run"
+    assert transaction["spans"][0]["op"] == "dca.ticker"
+    assert transaction["spans"][0]["tags"] == {"pair": "XETHZEUR"}
+
+
+def test_opentelemetry_backend() -> None:
+    pytest.importorskip("opentelemetry")
+    assert isinstance(
+        tracing.configure_tracing("otel"), tracing.OpenTelemetryBackend
+    )
+    with tracing.span("dca.run", pair="XETHZEUR"):
+        pass
+    tracing.configure_tracing("off")